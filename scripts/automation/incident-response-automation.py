@@ -5,17 +5,27 @@ Implements security-first automated response patterns
 """
 
 import asyncio
+import ipaddress
 import json
 import logging
 import os
+import re
+import sqlite3
+import sys
 import subprocess
 import time
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Set, Tuple
 from pathlib import Path
 
+# Shared process control lives with the security scripts
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'security'))
+sys.path.append('/opt/scripts/security')
+from process_control import get_process_controller
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -149,8 +159,11 @@ class IsolateHostAction(ResponseAction):
 class KillProcessAction(ResponseAction):
     """Kill suspicious process"""
     
-    def __init__(self):
+    def __init__(self, timeout: float = 2.0, tree: bool = False, cgroup: bool = False):
         super().__init__("Kill Process")
+        self.timeout = timeout
+        self.tree = tree
+        self.cgroup = cgroup
     
     async def execute(self, incident: Incident) -> bool:
         if not incident.process_name:
@@ -158,23 +171,25 @@ class KillProcessAction(ResponseAction):
             return False
         
         try:
-            # Find process PIDs
-            find_cmd = f"pgrep -f {incident.process_name}"
-            result = subprocess.run(find_cmd, shell=True, capture_output=True, text=True)
+            # SIGTERM the matching processes (and their children with tree=True), SIGKILL survivors
+            result = await get_process_controller().kill_matching(
+                re.escape(incident.process_name),
+                timeout=self.timeout,
+                tree=self.tree,
+                cgroup=self.cgroup
+            )
             
-            if result.returncode != 0:
+            if not result.matched:
                 self.log_action(incident, False, "Process not found")
                 return False
             
-            pids = result.stdout.strip().split('\n')
-            
-            # Kill processes
-            for pid in pids:
-                if pid:
-                    kill_cmd = f"sudo kill -9 {pid}"
-                    subprocess.run(kill_cmd, shell=True)
+            if not result.success:
+                self.log_action(incident, False, f"Failed to kill PIDs: {result.failed}")
+                return False
             
-            self.log_action(incident, True, f"Killed process {incident.process_name} (PIDs: {', '.join(pids)})")
+            pids = ', '.join(str(pid) for pid in result.matched)
+            self.log_action(incident, True, f"Killed process {incident.process_name} (PIDs: {pids}, "
+                                            f"escalated to SIGKILL: {len(result.escalated)})")
             return True
             
         except Exception as e:
@@ -256,6 +271,7 @@ Severity: {incident.severity.name}
 Time: {incident.timestamp}
 Source IP: {incident.source_ip or 'N/A'}
 Target IP: {incident.target_ip or 'N/A'}
+Campaign: {incident.metadata.get('campaign_id', 'N/A')}
 Description: {incident.description}
 
 Actions Taken:
@@ -275,10 +291,595 @@ Actions Taken:
             return False
 
 
+class IncidentStore:
+    """SQLite incident store with batched writes and retention
+    
+    Runs in WAL mode so queries do not block the writer. Incidents are
+    buffered and inserted in one transaction once the batch is full or
+    flush_interval seconds after the first buffered incident.
+    """
+    
+    def __init__(self, db_path: str = "/var/lib/security/incidents.db",
+                 batch_size: int = 50, flush_interval: float = 2.0,
+                 retention_days: int = 90, max_incidents: Optional[int] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_incidents = max_incidents
+        self._pending: List[Tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._last_retention = 0.0
+        
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.init_database()
+        self.apply_retention()
+    
+    def init_database(self):
+        """Initialize database schema"""
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS incidents (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                severity INTEGER NOT NULL,
+                timestamp REAL NOT NULL,
+                source_ip TEXT,
+                target_ip TEXT,
+                process_name TEXT,
+                user TEXT,
+                description TEXT,
+                metadata TEXT,
+                actions_taken TEXT
+            )
+        ''')
+        
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_incident_type ON incidents(type, timestamp)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_incident_severity ON incidents(severity, timestamp)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_incident_timestamp ON incidents(timestamp)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_incident_source_ip ON incidents(source_ip, timestamp)')
+        self.conn.commit()
+    
+    def add(self, incident: Incident):
+        """Buffer an incident for the next batched insert"""
+        self._pending.append((
+            incident.id,
+            incident.type.value,
+            incident.severity.value,
+            incident.timestamp.timestamp(),
+            incident.source_ip,
+            incident.target_ip,
+            incident.process_name,
+            incident.user,
+            incident.description,
+            json.dumps(incident.metadata, default=str),
+            json.dumps(incident.actions_taken)
+        ))
+        
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No event loop to schedule a deferred flush on
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+    
+    def flush(self):
+        """Write all buffered incidents in a single transaction"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if self._pending:
+            rows, self._pending = self._pending, []
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO incidents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error storing {len(rows)} incidents: {str(e)}")
+        
+        # Retention runs at most hourly, piggybacking on writes
+        if time.monotonic() - self._last_retention > 3600:
+            self.apply_retention()
+    
+    def apply_retention(self) -> int:
+        """Delete incidents older than retention_days and beyond max_incidents"""
+        self._last_retention = time.monotonic()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).timestamp()
+        
+        with self.conn:
+            deleted = self.conn.execute('DELETE FROM incidents WHERE timestamp < ?', (cutoff,)).rowcount
+            if self.max_incidents:
+                deleted += self.conn.execute('''
+                    DELETE FROM incidents WHERE timestamp < (
+                        SELECT timestamp FROM incidents
+                        ORDER BY timestamp DESC LIMIT 1 OFFSET ?
+                    )
+                ''', (self.max_incidents - 1,)).rowcount
+        
+        if deleted:
+            logger.info(f"Incident retention removed {deleted} incidents")
+        return deleted
+    
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "severity": IncidentSeverity(row["severity"]).name,
+            "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat(),
+            "source_ip": row["source_ip"],
+            "target_ip": row["target_ip"],
+            "process_name": row["process_name"],
+            "user": row["user"],
+            "description": row["description"],
+            "metadata": json.loads(row["metadata"] or '{}'),
+            "actions_taken": json.loads(row["actions_taken"] or '[]')
+        }
+    
+    def _filters(self, incident_type: Optional[IncidentType], severity: Optional[IncidentSeverity],
+                 min_severity: Optional[IncidentSeverity], source_ip: Optional[str],
+                 since: Optional[datetime], until: Optional[datetime]) -> Tuple[str, List[Any]]:
+        clauses = []
+        params: List[Any] = []
+        
+        if incident_type:
+            clauses.append("type = ?")
+            params.append(incident_type.value)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity.value)
+        if min_severity:
+            # Lower enum values are more severe
+            clauses.append("severity <= ?")
+            params.append(min_severity.value)
+        if source_ip:
+            clauses.append("source_ip = ?")
+            params.append(source_ip)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since.timestamp())
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until.timestamp())
+        
+        return " AND ".join(clauses) or "1=1", params
+    
+    def get(self, incident_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single incident by ID"""
+        self.flush()
+        row = self.conn.execute('SELECT * FROM incidents WHERE id = ?', (incident_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+    
+    def query(self, incident_type: Optional[IncidentType] = None,
+              severity: Optional[IncidentSeverity] = None,
+              min_severity: Optional[IncidentSeverity] = None,
+              source_ip: Optional[str] = None,
+              since: Optional[datetime] = None,
+              until: Optional[datetime] = None,
+              limit: int = 100,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of incidents, newest first
+        
+        Pass the returned next_cursor back in to fetch the following page;
+        it is None on the last page.
+        """
+        self.flush()
+        where, params = self._filters(incident_type, severity, min_severity, source_ip, since, until)
+        
+        if cursor:
+            # Keyset pagination: continue strictly after the last row returned
+            last_timestamp, last_id = cursor.split(':', 1)
+            where += " AND (timestamp < ? OR (timestamp = ? AND id < ?))"
+            params.extend([float(last_timestamp), float(last_timestamp), last_id])
+        
+        rows = self.conn.execute(
+            f"SELECT * FROM incidents WHERE {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['timestamp']!r}:{rows[-1]['id']}"
+        
+        return {
+            "incidents": [self._row_to_dict(row) for row in rows],
+            "next_cursor": next_cursor
+        }
+    
+    def count(self, incident_type: Optional[IncidentType] = None,
+              severity: Optional[IncidentSeverity] = None,
+              min_severity: Optional[IncidentSeverity] = None,
+              source_ip: Optional[str] = None,
+              since: Optional[datetime] = None,
+              until: Optional[datetime] = None) -> int:
+        """Count incidents matching the filters"""
+        self.flush()
+        where, params = self._filters(incident_type, severity, min_severity, source_ip, since, until)
+        return self.conn.execute(f"SELECT COUNT(*) FROM incidents WHERE {where}", params).fetchone()[0]
+    
+    def close(self):
+        """Flush buffered incidents and close the database"""
+        self.flush()
+        self.conn.close()
+
+
+@dataclass
+class ScheduledIncident:
+    """Incident waiting in the scheduler queue"""
+    incident: Incident
+    enqueued: float
+    future: asyncio.Future
+
+
+class IncidentScheduler:
+    """Bounded worker pool that dispatches incidents by severity
+    
+    Each severity has its own FIFO queue. Workers always take the queue head
+    with the best effective priority, where waiting aging_interval seconds
+    raises an incident by one severity level so low severities cannot starve.
+    Queue depth and a wait time histogram by severity are exported through
+    the node_exporter textfile collector.
+    """
+    
+    # Upper bounds of the queue wait histogram buckets, in seconds
+    WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+    
+    def __init__(self, handler: Callable, workers: int = 4, aging_interval: float = 60.0,
+                 wait_samples: int = 1000,
+                 metrics_file: Optional[Path] = Path("/var/lib/prometheus/node_exporter/incident_queue.prom"),
+                 metrics_interval: float = 15.0):
+        self.handler = handler
+        self.worker_count = workers
+        self.aging_interval = aging_interval
+        self.queues: Dict[IncidentSeverity, deque] = {s: deque() for s in IncidentSeverity}
+        self.wait_times: Dict[IncidentSeverity, deque] = {
+            s: deque(maxlen=wait_samples) for s in IncidentSeverity
+        }
+        self.dispatched: Dict[IncidentSeverity, int] = {s: 0 for s in IncidentSeverity}
+        # Cumulative histogram since start: bucket counts and sum of waits
+        self.wait_buckets: Dict[IncidentSeverity, List[int]] = {
+            s: [0] * len(self.WAIT_BUCKETS) for s in IncidentSeverity
+        }
+        self.wait_sum: Dict[IncidentSeverity, float] = {s: 0.0 for s in IncidentSeverity}
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self._last_export = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+    
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self._workers:
+            return
+        self._condition = asyncio.Condition()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+    
+    async def submit(self, incident: Incident) -> asyncio.Future:
+        """Queue an incident; the returned future resolves when its response completes"""
+        self.start()
+        item = ScheduledIncident(incident, time.monotonic(), asyncio.get_running_loop().create_future())
+        async with self._condition:
+            self.queues[incident.severity].append(item)
+            self._condition.notify()
+        return item.future
+    
+    def _pending(self) -> bool:
+        return any(self.queues.values())
+    
+    def _next(self) -> ScheduledIncident:
+        """Pop the queue head with the best effective priority"""
+        now = time.monotonic()
+        best = None
+        best_priority = None
+        
+        for severity, queue in self.queues.items():
+            if not queue:
+                continue
+            priority = severity.value - (now - queue[0].enqueued) / self.aging_interval
+            if best_priority is None or priority < best_priority:
+                best, best_priority = severity, priority
+        
+        return self.queues[best].popleft()
+    
+    async def _worker(self, worker_id: int):
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(self._pending)
+                item = self._next()
+            
+            self._observe(item.incident.severity, time.monotonic() - item.enqueued)
+            
+            try:
+                result = await self.handler(item.incident)
+                if not item.future.done():
+                    item.future.set_result(result)
+            except asyncio.CancelledError:
+                item.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed on incident {item.incident.id}: {str(e)}")
+                if not item.future.done():
+                    item.future.set_exception(e)
+    
+    def _observe(self, severity: IncidentSeverity, wait: float):
+        self.wait_times[severity].append(wait)
+        self.dispatched[severity] += 1
+        self.wait_sum[severity] += wait
+        buckets = self.wait_buckets[severity]
+        for i, bound in enumerate(self.WAIT_BUCKETS):
+            if wait <= bound:
+                buckets[i] += 1
+        
+        if time.monotonic() - self._last_export >= self.metrics_interval:
+            self.write_metrics()
+    
+    def write_metrics(self):
+        """Export queue depth and wait times through the node_exporter textfile collector"""
+        self._last_export = time.monotonic()
+        if self.metrics_file is None or not self.metrics_file.parent.is_dir():
+            return
+        
+        lines = ["# HELP incident_queue_wait_seconds Time incidents waited for a worker",
+                 "# TYPE incident_queue_wait_seconds histogram"]
+        for severity in IncidentSeverity:
+            label = f'severity="{severity.name.lower()}"'
+            for bound, count in zip(self.WAIT_BUCKETS, self.wait_buckets[severity]):
+                lines.append(f'incident_queue_wait_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'incident_queue_wait_seconds_bucket{{{label},le="+Inf"}} {self.dispatched[severity]}')
+            lines.append(f"incident_queue_wait_seconds_sum{{{label}}} {self.wait_sum[severity]}")
+            lines.append(f"incident_queue_wait_seconds_count{{{label}}} {self.dispatched[severity]}")
+        
+        lines += ["# HELP incident_queue_depth Incidents waiting for a worker",
+                  "# TYPE incident_queue_depth gauge"]
+        for severity in IncidentSeverity:
+            lines.append(f'incident_queue_depth{{severity="{severity.name.lower()}"}} {len(self.queues[severity])}')
+        
+        # Write and rename so node_exporter never reads a partial file
+        try:
+            tmp = self.metrics_file.with_suffix('.prom.tmp')
+            tmp.write_text('\n'.join(lines) + '\n')
+            tmp.replace(self.metrics_file)
+        except OSError as e:
+            logger.warning(f"Could not write queue metrics: {str(e)}")
+    
+    def get_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth and wait time percentiles in seconds by severity"""
+        stats = {}
+        for severity in IncidentSeverity:
+            waits = sorted(self.wait_times[severity])
+            
+            def pct(p: float) -> float:
+                return waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+            
+            stats[severity.name] = {
+                "queued": len(self.queues[severity]),
+                "dispatched": self.dispatched[severity],
+                "wait_p50": pct(0.50),
+                "wait_p95": pct(0.95),
+                "wait_max": waits[-1] if waits else 0.0
+            }
+        return stats
+    
+    async def stop(self):
+        """Cancel workers; incidents still queued are cancelled"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        for queue in self.queues.values():
+            while queue:
+                queue.popleft().future.cancel()
+        self.write_metrics()
+
+
+@dataclass
+class Campaign:
+    """Related incidents attributed to one attacker"""
+    id: str
+    first_seen: float
+    last_seen: float
+    sequence: int = 0  # Creation order
+    incident_ids: List[str] = field(default_factory=list)
+    types: Set[str] = field(default_factory=set)
+    source_ips: Set[str] = field(default_factory=set)
+    users: Set[str] = field(default_factory=set)
+    severity: IncidentSeverity = IncidentSeverity.INFO
+    # Response actions already run on behalf of the whole campaign
+    actions_done: Set[Tuple[str, ...]] = field(default_factory=set)
+    
+    def add(self, incident: Incident, timestamp: float):
+        self.incident_ids.append(incident.id)
+        self.types.add(incident.type.value)
+        if incident.source_ip:
+            self.source_ips.add(incident.source_ip)
+        if incident.user:
+            self.users.add(incident.user)
+        if incident.severity.value < self.severity.value:
+            self.severity = incident.severity
+        self.first_seen = min(self.first_seen, timestamp)
+        self.last_seen = max(self.last_seen, timestamp)
+    
+    def merge(self, other: 'Campaign'):
+        # The first created campaign keeps its ID so IDs already reported stay valid
+        if other.sequence < self.sequence:
+            self.id, self.sequence = other.id, other.sequence
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        self.incident_ids.extend(other.incident_ids)
+        self.types |= other.types
+        self.source_ips |= other.source_ips
+        self.users |= other.users
+        self.actions_done |= other.actions_done
+        if other.severity.value < self.severity.value:
+            self.severity = other.severity
+
+
+class CampaignAggregator:
+    """Clusters incidents into campaigns with incremental union-find
+    
+    Incidents are linked when they share a source IP, source subnet or user
+    and their timestamps are within the window. Keys and campaigns with no
+    incident newer than the window expire, so a returning attacker starts a
+    new campaign.
+    """
+    
+    def __init__(self, window: float = 1800.0, ipv4_prefix: Optional[int] = 24,
+                 ipv6_prefix: Optional[int] = 64, ignore_users: Optional[Set[str]] = None):
+        self.window = window
+        self.ipv4_prefix = ipv4_prefix
+        self.ipv6_prefix = ipv6_prefix
+        self.ignore_users = ignore_users or set()
+        self.parent: Dict[str, str] = {}
+        self.size: Dict[str, int] = {}
+        self.campaigns: Dict[str, Campaign] = {}  # Keyed by union-find root
+        # Link key -> [incident ID, first seen, last seen] per cluster using the key
+        self.key_index: Dict[str, List[List[Any]]] = {}
+        self._last_expiry = 0.0
+        self._sequence = 0
+    
+    def _find(self, node: str) -> str:
+        while self.parent[node] != node:
+            # Path halving
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+    
+    def _union(self, a: str, b: str) -> str:
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        self.campaigns[root_a].merge(self.campaigns.pop(root_b))
+        return root_a
+    
+    def _link_keys(self, incident: Incident) -> List[str]:
+        keys = []
+        if incident.source_ip:
+            keys.append(f"ip:{incident.source_ip}")
+            try:
+                address = ipaddress.ip_address(incident.source_ip)
+                prefix = self.ipv4_prefix if address.version == 4 else self.ipv6_prefix
+                if prefix is not None:
+                    network = ipaddress.ip_network(f"{address}/{prefix}", strict=False)
+                    keys.append(f"net:{network}")
+            except ValueError:
+                pass
+        if incident.user and incident.user not in self.ignore_users:
+            keys.append(f"user:{incident.user}")
+        return keys
+    
+    def add(self, incident: Incident) -> Campaign:
+        """Attach an incident to its campaign, merging campaigns it links"""
+        timestamp = incident.timestamp.timestamp()
+        self._expire()
+        
+        node = incident.id
+        if node in self.parent:
+            return self.campaigns[self._find(node)]
+        
+        self.parent[node] = node
+        self.size[node] = 1
+        self._sequence += 1
+        self.campaigns[node] = Campaign(id=f"CMP-{incident.id}", first_seen=timestamp,
+                                        last_seen=timestamp, sequence=self._sequence)
+        
+        root = node
+        for key in self._link_keys(incident):
+            entries = self.key_index.setdefault(key, [])
+            linked = None
+            
+            # Incidents can arrive out of order, so compare against each
+            # cluster's whole time span rather than its latest incident
+            for entry in entries:
+                if entry[0] in self.parent and entry[1] - self.window <= timestamp <= entry[2] + self.window:
+                    root = self._union(entry[0], root)
+                    entry[1], entry[2] = min(entry[1], timestamp), max(entry[2], timestamp)
+                    linked = linked or entry
+            
+            if linked is None:
+                entries.append([node, timestamp, timestamp])
+            elif len(entries) > 1:
+                # Collapse entries whose clusters were merged
+                by_root: Dict[str, List[Any]] = {}
+                for entry in entries:
+                    if entry[0] not in self.parent:
+                        continue
+                    kept = by_root.setdefault(self._find(entry[0]), entry)
+                    kept[1], kept[2] = min(kept[1], entry[1]), max(kept[2], entry[2])
+                self.key_index[key] = list(by_root.values())
+        
+        campaign = self.campaigns[root]
+        campaign.add(incident, timestamp)
+        return campaign
+    
+    def campaign_for(self, incident_id: str) -> Optional[Campaign]:
+        """Current campaign of an incident, if it has not expired"""
+        if incident_id not in self.parent:
+            return None
+        return self.campaigns[self._find(incident_id)]
+    
+    def _expire(self):
+        """Drop campaigns and link keys idle for longer than the window"""
+        # Wall clock rather than incident time: the scheduler may hand
+        # incidents over out of order
+        now = time.time()
+        if now - self._last_expiry < self.window / 10:
+            return
+        self._last_expiry = now
+        cutoff = now - self.window
+        
+        for root in [r for r, c in self.campaigns.items() if c.last_seen < cutoff]:
+            campaign = self.campaigns.pop(root)
+            self.size.pop(root, None)
+            for incident_id in campaign.incident_ids:
+                self.parent.pop(incident_id, None)
+        
+        for key in list(self.key_index):
+            entries = [e for e in self.key_index[key] if e[2] >= cutoff and e[0] in self.parent]
+            if entries:
+                self.key_index[key] = entries
+            else:
+                del self.key_index[key]
+
+
 class IncidentResponseOrchestrator:
     """Orchestrates incident response based on playbooks"""
     
-    def __init__(self):
+    # Maximum concurrent executions per action across all incidents
+    DEFAULT_ACTION_LIMITS = {
+        "isolate_host": 1,
+        "collect_forensics": 2
+    }
+    
+    # How often each action runs within a campaign: once per campaign, once
+    # per source IP, or for every incident
+    CAMPAIGN_ACTION_SCOPE = {
+        "collect_forensics": "campaign",
+        "isolate_host": "campaign",
+        "block_ip": "source_ip",
+        "kill_process": "incident",
+        "notify": "incident"
+    }
+    
+    def __init__(self, store: Optional[IncidentStore] = None, history_size: int = 1000,
+                 workers: int = 4, action_limits: Optional[Dict[str, int]] = None,
+                 campaigns: Optional[CampaignAggregator] = None):
         self.playbooks = self._load_playbooks()
         self.actions = {
             "block_ip": BlockIPAction(),
@@ -287,7 +888,14 @@ class IncidentResponseOrchestrator:
             "collect_forensics": CollectForensicsAction(),
             "notify": NotificationAction(),
         }
-        self.incident_history: List[Incident] = []
+        # Recent incidents only; the full history lives in the incident store
+        self.incident_history: deque = deque(maxlen=history_size)
+        self.store = store or IncidentStore()
+        
+        limits = dict(self.DEFAULT_ACTION_LIMITS, **(action_limits or {}))
+        self.action_semaphores = {name: asyncio.Semaphore(limit) for name, limit in limits.items()}
+        self.scheduler = IncidentScheduler(self.respond_to_incident, workers=workers)
+        self.campaigns = campaigns or CampaignAggregator()
     
     def _load_playbooks(self) -> Dict[IncidentType, List[str]]:
         """Load response playbooks for each incident type"""
@@ -345,13 +953,19 @@ class IncidentResponseOrchestrator:
         # Get playbook for incident type
         playbook = self.playbooks.get(incident.type, ["collect_forensics", "notify"])
         
+        campaign = self.campaigns.add(incident)
+        incident.metadata['campaign_id'] = campaign.id
+        if len(campaign.incident_ids) > 1:
+            logger.info(f"Incident {incident.id} joins campaign {campaign.id} "
+                        f"({len(campaign.incident_ids)} incidents)")
+        
         # Execute actions based on severity
         if incident.severity == IncidentSeverity.CRITICAL:
             # Execute all actions immediately in parallel for critical incidents
             tasks = []
             for action_name in playbook:
                 if action_name in self.actions:
-                    tasks.append(self.actions[action_name].execute(incident))
+                    tasks.append(self._run_campaign_action(action_name, incident))
             
             results = await asyncio.gather(*tasks, return_exceptions=True)
             
@@ -360,37 +974,67 @@ class IncidentResponseOrchestrator:
             for action_name in playbook:
                 if action_name in self.actions:
                     try:
-                        await self.actions[action_name].execute(incident)
+                        await self._run_campaign_action(action_name, incident)
                     except Exception as e:
                         logger.error(f"Error executing {action_name}: {str(e)}")
         
         # Save incident to history
         self.incident_history.append(incident)
-        self._save_incident_report(incident)
-    
-    def _save_incident_report(self, incident: Incident):
-        """Save detailed incident report"""
-        report_dir = "/var/log/incident_reports"
-        os.makedirs(report_dir, exist_ok=True)
-        
-        report_file = os.path.join(report_dir, f"incident_{incident.id}.json")
-        
-        report_data = {
-            "id": incident.id,
-            "type": incident.type.value,
-            "severity": incident.severity.name,
-            "timestamp": incident.timestamp.isoformat(),
-            "source_ip": incident.source_ip,
-            "target_ip": incident.target_ip,
-            "process_name": incident.process_name,
-            "user": incident.user,
-            "description": incident.description,
-            "metadata": incident.metadata,
-            "actions_taken": incident.actions_taken
-        }
+        self.store.add(incident)
+    
+    def _campaign_action_key(self, action_name: str, incident: Incident) -> Optional[Tuple[str, ...]]:
+        scope = self.CAMPAIGN_ACTION_SCOPE.get(action_name, "incident")
+        if scope == "campaign":
+            return (action_name,)
+        if scope == "source_ip" and incident.source_ip:
+            return (action_name, incident.source_ip)
+        return None
+    
+    async def _run_campaign_action(self, action_name: str, incident: Incident) -> bool:
+        """Execute an action unless the incident's campaign already covered it"""
+        key = self._campaign_action_key(action_name, incident)
+        campaign = self.campaigns.campaign_for(incident.id)
+        
+        if key is not None and campaign is not None:
+            if key in campaign.actions_done:
+                incident.actions_taken.append(
+                    f"{self.actions[action_name].name}: SKIPPED - covered by campaign {campaign.id}"
+                )
+                return True
+            # Claim before running so concurrent incidents do not repeat it
+            campaign.actions_done.add(key)
         
-        with open(report_file, "w") as f:
-            json.dump(report_data, f, indent=2)
+        success = False
+        try:
+            success = await self._run_action(action_name, incident)
+            return success
+        finally:
+            if key is not None and not success:
+                # Let a later incident in the campaign retry the action
+                campaign = self.campaigns.campaign_for(incident.id)
+                if campaign is not None:
+                    campaign.actions_done.discard(key)
+    
+    async def _run_action(self, action_name: str, incident: Incident) -> bool:
+        """Execute an action within its concurrency limit"""
+        semaphore = self.action_semaphores.get(action_name)
+        if semaphore is None:
+            return await self.actions[action_name].execute(incident)
+        async with semaphore:
+            return await self.actions[action_name].execute(incident)
+    
+    async def submit_incident(self, incident: Incident) -> asyncio.Future:
+        """Queue an incident for the scheduler's worker pool"""
+        return await self.scheduler.submit(incident)
+    
+    async def shutdown(self):
+        """Stop the scheduler and flush the incident store"""
+        await self.scheduler.stop()
+        self.store.close()
+    
+    def get_incident_report(self, incident_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored report for an incident"""
+        return self.store.get(incident_id)
 
 
 async def simulate_incident_response():
@@ -422,30 +1066,44 @@ async def simulate_incident_response():
         )
     ]
     
-    # Process incidents
+    # Process incidents through the scheduler
+    pending = []
     for incident in test_incidents:
         print(f"\n{'='*50}")
-        print(f"Processing incident: {incident.id}")
+        print(f"Queueing incident: {incident.id}")
         print(f"Type: {incident.type.value}")
         print(f"Severity: {incident.severity.name}")
         print(f"{'='*50}")
         
-        await orchestrator.respond_to_incident(incident)
-        
-        # Wait between incidents
-        await asyncio.sleep(2)
+        pending.append(await orchestrator.submit_incident(incident))
+    
+    await asyncio.gather(*pending, return_exceptions=True)
     
     # Print summary
     print(f"\n{'='*50}")
     print("INCIDENT RESPONSE SUMMARY")
     print(f"{'='*50}")
     print(f"Total incidents processed: {len(orchestrator.incident_history)}")
+    print(f"Incidents in store (last 24h): {orchestrator.store.count(since=datetime.now() - timedelta(days=1))}")
     for incident in orchestrator.incident_history:
         print(f"\nIncident {incident.id}:")
         print(f"  Type: {incident.type.value}")
         print(f"  Actions taken: {len(incident.actions_taken)}")
         for action in incident.actions_taken:
             print(f"    - {action}")
+    
+    print(f"\nActive campaigns: {len(orchestrator.campaigns.campaigns)}")
+    for campaign in orchestrator.campaigns.campaigns.values():
+        print(f"  {campaign.id}: {len(campaign.incident_ids)} incidents, "
+              f"types {', '.join(sorted(campaign.types))}")
+    
+    print("\nQueue wait times by severity:")
+    for severity, stats in orchestrator.scheduler.get_queue_stats().items():
+        if stats["dispatched"]:
+            print(f"  {severity}: p50 {stats['wait_p50']:.3f}s, p95 {stats['wait_p95']:.3f}s, "
+                  f"max {stats['wait_max']:.3f}s")
+    
+    await orchestrator.shutdown()
 
 
 if __name__ == "__main__":
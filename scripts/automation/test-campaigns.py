@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for campaign aggregation
+Feeds incidents out of order and across expiry windows into the aggregator
+"""
+
+import importlib.util
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# The orchestrator is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'incident_response_automation', Path(__file__).resolve().parent / 'incident-response-automation.py'
+)
+automation = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(automation)
+
+
+def make_incident(name: str, offset: float, source_ip: Optional[str] = None,
+                  user: Optional[str] = None) -> 'automation.Incident':
+    return automation.Incident(id=name, type=automation.IncidentType.BRUTE_FORCE,
+                               severity=automation.IncidentSeverity.MEDIUM, source_ip=source_ip,
+                               user=user, description=name,
+                               timestamp=datetime.fromtimestamp(time.time() + offset))
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+def test_out_of_order() -> bool:
+    """A late incident bridging two campaigns merges them under the older ID"""
+    print("\n🧩 Testing out-of-order merges...")
+    aggregator = automation.CampaignAggregator(window=3600)
+    early = aggregator.add(make_incident('A', -3500, '203.0.113.5'))
+    late = aggregator.add(make_incident('C', 200, '203.0.113.5'))
+    ok = check("Incidents further apart than the window start separate campaigns",
+               early.id == 'CMP-A' and late.id == 'CMP-C')
+    
+    # B arrives last but falls between A and C
+    merged = aggregator.add(make_incident('B', -1500, '203.0.113.5'))
+    ok &= check("Bridging incident merges both campaigns", len(aggregator.campaigns) == 1 and
+                sorted(merged.incident_ids) == ['A', 'B', 'C'])
+    ok &= check("Earliest created campaign keeps its ID", merged.id == 'CMP-A' and
+                aggregator.campaign_for('C') is merged)
+    ok &= check("Link key entries collapsed", len(aggregator.key_index['ip:203.0.113.5']) == 1)
+    
+    neighbour = aggregator.add(make_incident('D', 0, '203.0.113.77'))
+    by_user = aggregator.add(make_incident('E', 0, '198.51.100.9', user='alice'))
+    linked = aggregator.add(make_incident('F', 10, '192.0.2.1', user='alice'))
+    ok &= check("Same /24 and same user link incidents",
+                neighbour is merged and linked is by_user and by_user is not merged)
+    return ok
+
+
+def test_ignored_users() -> bool:
+    """Shared service accounts do not link unrelated sources"""
+    print("\n🧩 Testing ignored users...")
+    aggregator = automation.CampaignAggregator(window=3600, ignore_users={'root'})
+    first = aggregator.add(make_incident('A', 0, '198.51.100.9', user='root'))
+    second = aggregator.add(make_incident('B', 0, '192.0.2.1', user='root'))
+    return check("Ignored user keeps campaigns apart", first is not second)
+
+
+def test_expiry() -> bool:
+    """Idle campaigns and keys expire, so a returning attacker starts afresh"""
+    print("\n🧩 Testing campaign expiry...")
+    aggregator = automation.CampaignAggregator(window=1.0)
+    first = aggregator.add(make_incident('A', 0, '203.0.113.5'))
+    again = aggregator.add(make_incident('B', 0.5, '203.0.113.5'))
+    ok = check("Incidents within the window share a campaign", again is first)
+    
+    time.sleep(2.0)
+    returning = aggregator.add(make_incident('C', 0, '203.0.113.5'))
+    ok &= check("Returning attacker starts a new campaign", returning is not first and returning.id == 'CMP-C')
+    ok &= check("Expired incidents and keys dropped",
+                aggregator.campaign_for('A') is None and len(aggregator.campaigns) == 1 and
+                [e[0] for e in aggregator.key_index['ip:203.0.113.5']] == ['C'] and
+                set(aggregator.parent) == {'C'})
+    return ok
+
+
+def main():
+    """Run all campaign tests"""
+    results = [test_out_of_order(), test_ignored_users(), test_expiry()]
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} campaign tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for incident scheduling
+Checks severity aging, per-action concurrency limits and the queue metrics export
+"""
+
+import asyncio
+import importlib.util
+import sys
+import tempfile
+from pathlib import Path
+
+from prometheus_client.parser import text_string_to_metric_families
+
+# The orchestrator is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'incident_response_automation', Path(__file__).resolve().parent / 'incident-response-automation.py'
+)
+automation = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(automation)
+
+Severity = automation.IncidentSeverity
+
+
+def make_incident(name: str, severity: 'automation.IncidentSeverity') -> 'automation.Incident':
+    return automation.Incident(id=name, type=automation.IncidentType.PORT_SCAN, severity=severity,
+                               description=name)
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+async def dispatch_order(aging_interval: float, metrics_file: Path) -> list:
+    """Order a single worker takes an old LOW and a fresh HIGH incident in"""
+    order = []
+    release = asyncio.Event()
+    
+    async def handler(incident):
+        if incident.id == 'blocker':
+            await release.wait()
+        order.append(incident.id)
+    
+    scheduler = automation.IncidentScheduler(handler, workers=1, aging_interval=aging_interval,
+                                             metrics_file=metrics_file)
+    futures = [await scheduler.submit(make_incident('blocker', Severity.CRITICAL))]
+    await asyncio.sleep(0.01)
+    futures.append(await scheduler.submit(make_incident('low', Severity.LOW)))
+    await asyncio.sleep(0.2)
+    futures.append(await scheduler.submit(make_incident('high', Severity.HIGH)))
+    release.set()
+    await asyncio.gather(*futures)
+    await scheduler.stop()
+    return order
+
+
+async def test_aging(tmp: Path) -> bool:
+    """Waiting raises an incident's effective severity"""
+    print("\n⏳ Testing severity aging...")
+    ok = check("Without aging a fresh HIGH goes first",
+               await dispatch_order(60.0, tmp / 'queue.prom') == ['blocker', 'high', 'low'])
+    # 0.2s at 0.05s per level lifts LOW (4) past HIGH (2)
+    ok &= check("An aged LOW overtakes a fresh HIGH",
+                await dispatch_order(0.05, tmp / 'queue.prom') == ['blocker', 'low', 'high'])
+    return ok
+
+
+async def test_metrics(tmp: Path) -> bool:
+    """Queue wait histogram and depth are exported per severity"""
+    print("\n📈 Testing queue metrics export...")
+    metrics_file = tmp / 'queue.prom'
+    scheduler = automation.IncidentScheduler(lambda incident: asyncio.sleep(0.01), workers=2,
+                                             metrics_file=metrics_file, metrics_interval=0)
+    futures = [await scheduler.submit(make_incident(f"INC{i}", Severity.HIGH if i % 3 else Severity.LOW))
+               for i in range(12)]
+    await asyncio.gather(*futures)
+    await scheduler.stop()
+    
+    samples = {}
+    for family in text_string_to_metric_families(metrics_file.read_text()):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    
+    def value(name: str, **labels) -> float:
+        return samples.get((name, tuple(sorted(labels.items()))))
+    
+    ok = check("Wait counts by severity",
+               value('incident_queue_wait_seconds_count', severity='high') == 8 and
+               value('incident_queue_wait_seconds_count', severity='low') == 4)
+    ok &= check("+Inf bucket matches the count",
+                value('incident_queue_wait_seconds_bucket', severity='high', le='+Inf') == 8)
+    ok &= check("Queues drained", all(value('incident_queue_depth', severity=s.name.lower()) == 0
+                                      for s in Severity))
+    ok &= check("No temporary file left behind", not metrics_file.with_suffix('.prom.tmp').exists())
+    return ok
+
+
+async def test_action_limits(tmp: Path) -> bool:
+    """Per-action semaphores cap concurrent executions across incidents"""
+    print("\n🚦 Testing per-action concurrency limits...")
+    running = {}
+    peak = {}
+    
+    class SlowAction(automation.ResponseAction):
+        async def execute(self, incident) -> bool:
+            running[self.name] = running.get(self.name, 0) + 1
+            peak[self.name] = max(peak.get(self.name, 0), running[self.name])
+            await asyncio.sleep(0.05)
+            running[self.name] -= 1
+            return True
+    
+    store = automation.IncidentStore(str(tmp / 'incidents.db'))
+    orchestrator = automation.IncidentResponseOrchestrator(store=store, action_limits={'notify': 3})
+    orchestrator.actions = {name: SlowAction(name) for name in
+                            ('isolate_host', 'collect_forensics', 'notify', 'block_ip')}
+    
+    incidents = [make_incident(f"INC{i}", Severity.HIGH) for i in range(6)]
+    await asyncio.gather(*(orchestrator._run_action(name, incident)
+                           for name in orchestrator.actions for incident in incidents))
+    await orchestrator.shutdown()
+    
+    ok = check(f"isolate_host runs alone (peak {peak['isolate_host']})", peak['isolate_host'] == 1)
+    ok &= check(f"collect_forensics limited to 2 (peak {peak['collect_forensics']})",
+                peak['collect_forensics'] == 2)
+    ok &= check(f"Configured notify limit of 3 applied (peak {peak['notify']})", peak['notify'] == 3)
+    ok &= check(f"Unlimited block_ip runs for every incident (peak {peak['block_ip']})", peak['block_ip'] == 6)
+    return ok
+
+
+async def main():
+    """Run all scheduler tests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [await test_aging(Path(tmp)),
+                   await test_metrics(Path(tmp)),
+                   await test_action_limits(Path(tmp))]
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} scheduler tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
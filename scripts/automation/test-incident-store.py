@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent incident store
+Fills a temporary store and checks batching, cursor paging and retention
+"""
+
+import asyncio
+import importlib.util
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# The orchestrator is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'incident_response_automation', Path(__file__).resolve().parent / 'incident-response-automation.py'
+)
+automation = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(automation)
+
+SEVERITIES = list(automation.IncidentSeverity)
+
+
+def make_incident(i: int, timestamp: datetime) -> 'automation.Incident':
+    return automation.Incident(
+        id=f"INC{i:05d}",
+        type=automation.IncidentType.PORT_SCAN if i % 2 else automation.IncidentType.BRUTE_FORCE,
+        severity=SEVERITIES[i % len(SEVERITIES)],
+        source_ip=f"10.0.{i % 4}.{i % 250}",
+        description=f"incident {i}",
+        timestamp=timestamp
+    )
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+def pages(store, **filters) -> list:
+    """IDs of every page of a query, following next_cursor"""
+    ids, cursor = [], None
+    while True:
+        page = store.query(limit=40, cursor=cursor, **filters)
+        ids.extend(incident['id'] for incident in page['incidents'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+async def test_paging(db_path: Path) -> bool:
+    """Cursor paging over timestamp ties, with and without filters"""
+    print("\n📒 Testing batched writes and cursor paging...")
+    store = automation.IncidentStore(str(db_path), batch_size=50, flush_interval=60)
+    now = datetime.now().replace(microsecond=0)
+    # Ten incidents per second, so every page boundary falls inside a timestamp tie
+    incidents = [make_incident(i, now - timedelta(seconds=i // 10)) for i in range(250)]
+    for incident in incidents:
+        store.add(incident)
+    ok = check(f"Batches of 50 written, {len(store._pending)} buffered", len(store._pending) == 0)
+    
+    ids = pages(store)
+    expected = [i.id for i in sorted(incidents, key=lambda i: (i.timestamp, i.id), reverse=True)]
+    ok &= check(f"Pages cover every incident once, newest first ({len(ids)} rows)", ids == expected)
+    
+    high = pages(store, min_severity=automation.IncidentSeverity.HIGH)
+    ok &= check(f"Filtered paging returns only matches ({len(high)} rows)",
+                high == [i for i in expected if int(i[3:]) % len(SEVERITIES) < 2])
+    
+    extra = make_incident(999, now + timedelta(seconds=1))
+    store.add(extra)
+    ok &= check("Reads flush buffered incidents", store.get(extra.id) is not None and
+                store.count() == 251)
+    store.close()
+    
+    reopened = automation.IncidentStore(str(db_path))
+    ok &= check("Incidents persist across restarts", reopened.count() == 251)
+    reopened.close()
+    return ok
+
+
+async def test_retention(db_path: Path) -> bool:
+    """Age and count limits prune the oldest incidents"""
+    print("\n📒 Testing retention...")
+    store = automation.IncidentStore(str(db_path), batch_size=1000, retention_days=30)
+    now = datetime.now()
+    for i in range(100):
+        store.add(make_incident(i, now - timedelta(days=i)))
+    store.flush()
+    deleted = store.apply_retention()
+    ok = check(f"Incidents older than 30 days pruned ({deleted} deleted)",
+               deleted == 70 and store.count() == 30)
+    
+    store.max_incidents = 10
+    store.apply_retention()
+    newest = [incident['id'] for incident in store.query(limit=100)['incidents']]
+    ok &= check("max_incidents keeps the newest", newest == [f"INC{i:05d}" for i in range(10)])
+    store.close()
+    return ok
+
+
+async def main():
+    """Run all incident store tests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [await test_paging(Path(tmp) / 'paging.db'),
+                   await test_retention(Path(tmp) / 'retention.db')]
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} incident store tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,19 +4,40 @@ Security Metrics Collector
 Collects and exports security metrics for Prometheus
 """
 
+import os
+import re
+import sys
 import time
 import json
-import asyncio
-import docker
-import psutil
+import struct
+import ctypes
+import mmap
+import ipaddress
+import threading
+import sqlite3
 import subprocess
+import socket
+import hmac
+import zlib
+import asyncio
+from collections import Counter as TallyCounter
+from contextlib import closing
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
-from prometheus_client import Counter, Gauge, Histogram, Info, CollectorRegistry, write_to_textfile
-from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+from urllib.parse import urlsplit, parse_qs
+from prometheus_client import (Counter, Gauge, Histogram, Info, CollectorRegistry, write_to_textfile,
+                               generate_latest, CONTENT_TYPE_LATEST)
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, Metric
 import logging
 
+# Shared Docker client lives with the security scripts
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'security'))
+sys.path.append('/opt/scripts/security')
+from docker_api_client import AsyncDockerClient, get_shared_client, container_name
+from socket_stats import get_socket_counter
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -77,6 +98,20 @@ ssh_login_attempts = Counter(
     registry=registry
 )
 
+ssh_login_attempts_recent = Gauge(
+    'ssh_login_attempts_recent',
+    'SSH login attempts within a rolling window',
+    ['result', 'window'],
+    registry=registry
+)
+
+ssh_failed_login_distinct = Gauge(
+    'ssh_failed_login_distinct',
+    'Distinct source IPs or users with failed SSH logins within a rolling window',
+    ['kind', 'window'],
+    registry=registry
+)
+
 ssh_active_sessions = Gauge(
     'ssh_active_sessions',
     'Number of active SSH sessions',
@@ -98,9 +133,17 @@ security_score = Gauge(
     registry=registry
 )
 
-patch_compliance = Gauge(
-    'security_patch_compliance',
-    'Percentage of systems with latest patches',
+security_score_component = Gauge(
+    'system_security_score_component',
+    'Points each component contributes to the security score',
+    ['component'],
+    registry=registry
+)
+
+security_score_input = Gauge(
+    'system_security_score_input',
+    'Current input value of each security score component',
+    ['component'],
     registry=registry
 )
 
@@ -112,26 +155,1165 @@ incident_response_time = Histogram(
     registry=registry
 )
 
+# Collector framework metrics
+collector_duration = Histogram(
+    'security_collector_duration_seconds',
+    'Time taken by each metrics collector',
+    ['collector'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=registry
+)
 
-class SecurityMetricsCollector:
-    """Collects various security metrics"""
+collector_staleness = Gauge(
+    'security_collector_staleness_seconds',
+    'Seconds since the collector last completed successfully',
+    ['collector'],
+    registry=registry
+)
+
+collector_failures = Counter(
+    'security_collector_failures_total',
+    'Collector runs that failed or timed out',
+    ['collector', 'reason'],
+    registry=registry
+)
+
+# Series lifecycle metrics
+metric_series = Gauge(
+    'security_metric_series',
+    'Live label sets per guarded metric',
+    ['metric'],
+    registry=registry
+)
+
+metric_series_overflow = Counter(
+    'security_metric_series_overflow_total',
+    'Updates redirected to the overflow series by the cardinality limit',
+    ['metric'],
+    registry=registry
+)
+
+metric_series_removed = Counter(
+    'security_metric_series_removed_total',
+    'Label sets removed after not being refreshed',
+    ['metric'],
+    registry=registry
+)
+
+
+class SeriesTracker:
+    """Lifecycle and cardinality limit for the label sets of one metric
+    
+    Label sets not refreshed within ttl_cycles collection cycles are removed
+    from the registry. Once max_series label sets are live, new ones are
+    redirected to an overflow series whose high-cardinality labels read
+    "__overflow__".
+    """
+    
+    OVERFLOW = '__overflow__'
+    
+    def __init__(self, name: str, metric, labelnames: List[str], max_series: int,
+                 overflow_labels: List[str], ttl_cycles: int = 3):
+        self.name = name
+        self.metric = metric
+        self.labelnames = labelnames
+        self.max_series = max_series
+        self.overflow_labels = set(overflow_labels)
+        self.ttl_cycles = ttl_cycles
+        self.cycle = 0
+        self.last_seen: Dict[tuple, int] = {}
+    
+    def begin_cycle(self):
+        self.cycle += 1
+    
+    def labels(self, **labels):
+        """Metric child for a label set, marked as refreshed this cycle"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        if key not in self.last_seen and len(self.last_seen) >= self.max_series:
+            metric_series_overflow.labels(metric=self.name).inc()
+            key = tuple(self.OVERFLOW if name in self.overflow_labels else value
+                        for name, value in zip(self.labelnames, key))
+        
+        self.last_seen[key] = self.cycle
+        return self.metric.labels(*key)
+    
+    def end_cycle(self):
+        """Remove label sets that missed the last ttl_cycles cycles"""
+        cutoff = self.cycle - self.ttl_cycles
+        expired = [key for key, cycle in self.last_seen.items() if cycle <= cutoff]
+        for key in expired:
+            del self.last_seen[key]
+            try:
+                self.metric.remove(*key)
+            except KeyError:
+                pass
+        
+        if expired:
+            metric_series_removed.labels(metric=self.name).inc(len(expired))
+        metric_series.labels(metric=self.name).set(len(self.last_seen))
+
+
+@dataclass
+class CollectorSpec:
+    """A metrics collector with its own schedule"""
+    name: str
+    func: Callable[[], Awaitable[None]]
+    interval: float
+    timeout: float
+    last_started: Optional[float] = None
+    last_success: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+
+
+class RollingEventWindow:
+    """Per-type event counts over a sliding window of fixed-size time buckets"""
+    
+    def __init__(self, window: int = 3600, bucket: int = 60):
+        self.window = window
+        self.bucket = bucket
+        self.buckets: Dict[int, TallyCounter] = {}
+        self.totals: TallyCounter = TallyCounter()
+    
+    def add(self, event_type: str, timestamp: float, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        if not now - self.window < timestamp <= now:
+            return
+        start = int(timestamp // self.bucket) * self.bucket
+        self.buckets.setdefault(start, TallyCounter())[event_type] += 1
+        self.totals[event_type] += 1
+    
+    def counts(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Counts per type within the window, evicting expired buckets"""
+        now = now if now is not None else time.time()
+        for start in [b for b in self.buckets if b + self.bucket <= now - self.window]:
+            self.totals.subtract(self.buckets.pop(start))
+        return {event_type: count for event_type, count in self.totals.items() if count > 0}
+    
+    def to_state(self) -> Dict[str, Dict[str, int]]:
+        return {str(start): dict(counts) for start, counts in self.buckets.items()}
+    
+    def load_state(self, state: Dict[str, Dict[str, int]]):
+        self.buckets = {int(start): TallyCounter(counts) for start, counts in state.items()}
+        self.totals = TallyCounter()
+        for counts in self.buckets.values():
+            self.totals.update(counts)
+
+
+class LogTail:
+    """Reads complete lines appended to a log file since a persisted cursor
+    
+    A changed inode means the log was rotated: the rest of the old file
+    is drained from its rotated name when present, then the new file is
+    read from the start. A file shorter than the cursor was truncated.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.cursor = {'inode': None, 'offset': 0}
+    
+    def read_lines(self) -> List[str]:
+        """Complete lines appended since the cursor, advancing it"""
+        lines: List[str] = []
+        if not self.path.exists():
+            return lines
+        
+        inode = self.path.stat().st_ino
+        if self.cursor['inode'] not in (None, inode):
+            rotated = self.path.with_name(self.path.name + '.1')
+            if rotated.exists() and rotated.stat().st_ino == self.cursor['inode']:
+                lines.extend(self._read_from(rotated, self.cursor['offset'])[0])
+            self.cursor = {'inode': inode, 'offset': 0}
+        
+        if self.path.stat().st_size < self.cursor['offset']:
+            self.cursor['offset'] = 0
+        
+        new_lines, offset = self._read_from(self.path, self.cursor['offset'])
+        lines.extend(new_lines)
+        self.cursor = {'inode': inode, 'offset': offset}
+        return lines
+    
+    @staticmethod
+    def _read_from(path: Path, offset: int):
+        """Read complete lines after offset; returns (lines, new offset)"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        
+        # A trailing partial line is left for the next run
+        end = data.rfind(b'\n') + 1
+        lines = [line for line in data[:end].decode(errors='replace').split('\n') if line.strip()]
+        return lines, offset + end
+
+
+class AuthLogAggregator:
+    """Incremental SSH login counts from the auth log
+    
+    Only lines appended since the persisted cursor are parsed, so the log
+    is never rescanned. Each update returns the new attempts per result and
+    source class for the cumulative login counter, and rolling windows keep
+    recent attempts per result plus failures per source IP and per user.
+    """
+    
+    LINE = re.compile(r'sshd\[\d+\]: (Failed|Accepted) \S+ for (?:invalid user )?(\S*) from (\S+) port')
+    # name -> (window, bucket) in seconds
+    WINDOWS = {'5m': (300, 10), '1h': (3600, 60)}
+    KINDS = ('result', 'source_ip', 'user')
+    
+    def __init__(self, path: Path = Path("/var/log/auth.log"),
+                 state_file: Path = Path("/var/lib/security/metrics/auth_cursor.json")):
+        self.tail = LogTail(path)
+        self.state_file = state_file
+        self.windows = {
+            (name, kind): RollingEventWindow(window, bucket)
+            for name, (window, bucket) in self.WINDOWS.items()
+            for kind in self.KINDS
+        }
+        # Updates run in a worker thread while other collectors read counts
+        self.lock = threading.Lock()
+        self._load_state()
+    
+    def update(self) -> TallyCounter:
+        """Parse lines appended since the last update; returns new (result, source) counts"""
+        with self.lock:
+            lines = self.tail.read_lines()
+            attempts = TallyCounter()
+            now = time.time()
+            
+            for line in lines:
+                match = self.LINE.search(line)
+                if not match:
+                    continue
+                result = 'success' if match.group(1) == 'Accepted' else 'failed'
+                user, source_ip = match.group(2), match.group(3)
+                attempts[(result, self._source_class(source_ip))] += 1
+                
+                timestamp = self._parse_time(line, now)
+                for name in self.WINDOWS:
+                    self.windows[(name, 'result')].add(result, timestamp, now)
+                    if result == 'failed':
+                        self.windows[(name, 'source_ip')].add(source_ip, timestamp, now)
+                        self.windows[(name, 'user')].add(user, timestamp, now)
+            
+            if lines:
+                self._save_state()
+            return attempts
+    
+    def counts(self, kind: str = 'result', window: str = '1h') -> Dict[str, int]:
+        """Counts within a window; source_ip and user count failed attempts"""
+        with self.lock:
+            return self.windows[(window, kind)].counts()
+    
+    def top(self, kind: str, window: str = '1h', limit: int = 10) -> List[Tuple[str, int]]:
+        """Most frequent source IPs or users with failed attempts in a window"""
+        counts = self.counts(kind, window)
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+    
+    @staticmethod
+    def _source_class(source_ip: str) -> str:
+        try:
+            address = ipaddress.ip_address(source_ip)
+        except ValueError:
+            return 'unknown'
+        return 'internal' if address.is_private or address.is_loopback else 'external'
+    
+    @staticmethod
+    def _parse_time(line: str, now: float) -> float:
+        """Timestamp of a syslog (traditional or RFC 3339) line, or now"""
+        try:
+            if line[:1].isdigit():
+                return datetime.fromisoformat(line.split(' ', 1)[0]).timestamp()
+            # Traditional syslog has no year; a date ahead of now is from last year
+            current = datetime.fromtimestamp(now)
+            parsed = datetime.strptime(line[:15], '%b %d %H:%M:%S').replace(year=current.year)
+            if parsed.timestamp() > now + 86400:
+                parsed = parsed.replace(year=current.year - 1)
+            return parsed.timestamp()
+        except ValueError:
+            return now
+    
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.tail.cursor = {'inode': state['inode'], 'offset': state['offset']}
+            for key, window in self.windows.items():
+                window.load_state(state.get('windows', {}).get('/'.join(key), {}))
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    
+    def _save_state(self):
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.state_file.with_suffix('.tmp')
+            windows = {'/'.join(key): window.to_state() for key, window in self.windows.items()}
+            with open(tmp_file, 'w') as f:
+                json.dump(dict(self.tail.cursor, windows=windows), f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not persist auth log cursor: {str(e)}")
+
+
+class DirectoryWatch:
+    """Non-blocking inotify watch on a directory, read without an event loop
+    
+    Events queue up in the kernel and are drained on demand. Returns None
+    from events() after a queue overflow, meaning the caller must rescan.
+    """
+    
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct('iIII')
+    
+    def __init__(self, path: Path):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        
+        mask = (self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE |
+                self.IN_DELETE_SELF | self.IN_MOVE_SELF)
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {path}")
+    
+    def events(self) -> Optional[List[tuple]]:
+        """Pending (mask, name) events, or None if the watch lost events or its directory"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = self._EVENT.unpack_from(data, offset)
+                name = data[offset + self._EVENT.size:offset + self._EVENT.size + length].rstrip(b'\0')
+                offset += self._EVENT.size + length
+                if mask & (self.IN_Q_OVERFLOW | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                    return None
+                events.append((mask, os.fsdecode(name)))
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class ScanResultIndex:
+    """Latest scan summary per container, kept current incrementally
+    
+    The scan directory is listed once; afterwards inotify events update
+    the index and only the newest scan file of a container is ever parsed.
+    Without inotify the directory is relisted when its mtime changes.
+    """
+    
+    FILENAME = re.compile(r'^scan_(.+)_(\d{8}_\d{6})\.json$')
+    
+    def __init__(self, scan_dir: Path):
+        self.scan_dir = scan_dir
+        self.files: Dict[str, Dict[str, str]] = {}  # container -> {filename: timestamp}
+        self.summaries: Dict[str, tuple] = {}  # container -> (filename, summary)
+        self.watch: Optional[DirectoryWatch] = None
+        self.dir_mtime: Optional[float] = None
+        self.files_parsed = 0
+    
+    def get(self, container_name: str) -> Dict[str, Any]:
+        """Latest scan summary for a container, or {} if it has none"""
+        self.refresh()
+        filename = self._latest(container_name)
+        if filename is None:
+            return {}
+        
+        cached = self.summaries.get(container_name)
+        if cached is None or cached[0] != filename:
+            cached = (filename, self._load_summary(self.scan_dir / filename))
+            self.summaries[container_name] = cached
+        return cached[1]
+    
+    def refresh(self):
+        """Apply directory changes since the last call"""
+        if self.watch is not None:
+            events = self.watch.events()
+            if events is None:
+                self.watch.close()
+                self.watch = None
+                self._rebuild()
+            else:
+                for mask, name in events:
+                    if mask & (DirectoryWatch.IN_DELETE | DirectoryWatch.IN_MOVED_FROM):
+                        self._remove(name)
+                    else:
+                        self._add(name)
+                        self._invalidate(name)
+            return
+        
+        try:
+            mtime = self.scan_dir.stat().st_mtime
+        except FileNotFoundError:
+            self.files.clear()
+            self.summaries.clear()
+            self.dir_mtime = None
+            return
+        
+        if mtime != self.dir_mtime:
+            self._rebuild()
+    
+    def _rebuild(self):
+        # Start watching before listing so no file slips between the two
+        try:
+            self.watch = DirectoryWatch(self.scan_dir)
+        except (OSError, AttributeError) as e:
+            if self.dir_mtime is None:
+                logger.debug(f"inotify unavailable for {self.scan_dir}, polling: {str(e)}")
+            self.watch = None
+        
+        try:
+            self.dir_mtime = self.scan_dir.stat().st_mtime
+            names = os.listdir(self.scan_dir)
+        except FileNotFoundError:
+            names = []
+        
+        self.files.clear()
+        self.summaries.clear()
+        for name in names:
+            self._add(name)
+    
+    def _add(self, name: str):
+        match = self.FILENAME.match(name)
+        if match:
+            self.files.setdefault(match.group(1), {})[name] = match.group(2)
+    
+    def _remove(self, name: str):
+        match = self.FILENAME.match(name)
+        if match:
+            files = self.files.get(match.group(1), {})
+            files.pop(name, None)
+            if not files:
+                self.files.pop(match.group(1), None)
+                self.summaries.pop(match.group(1), None)
+    
+    def _invalidate(self, name: str):
+        # A rewritten file must be parsed again
+        match = self.FILENAME.match(name)
+        if match and self.summaries.get(match.group(1), (None,))[0] == name:
+            del self.summaries[match.group(1)]
+    
+    def _latest(self, container_name: str) -> Optional[str]:
+        files = self.files.get(container_name)
+        if not files:
+            return None
+        return max(files, key=files.get)
+    
+    def _load_summary(self, path: Path) -> Dict[str, Any]:
+        self.files_parsed += 1
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        # Extract vulnerability counts
+        vuln_counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
+        for finding in data.get('findings', []):
+            severity = finding.get('severity', 'low')
+            vuln_counts[severity] = vuln_counts.get(severity, 0) + 1
+        
+        return {
+            'risk_score': data.get('risk_score', 0),
+            'vulnerability_counts': vuln_counts
+        }
+
+
+class MetricsHistory:
+    """Multi-resolution ring buffers of metric values in a memory-mapped file
+    
+    Every recorded value is folded into each resolution tier (10s for an
+    hour, 1m for a day, 1h for a week), so coarser tiers downsample
+    automatically. A slot holds (bucket number, sum, count) as doubles; a
+    stale bucket number marks a slot from an earlier lap of the ring.
+    Series keys live in a JSON index next to the data file, rewritten
+    before a newly assigned slot is written to.
+    
+    A series not recorded for the span of the longest tier has no data left
+    and gives up its slot. When every slot is taken, the series idle longest
+    is evicted if it has not been recorded for the span of the finest tier,
+    so departed containers make room for live ones.
+    """
+    
+    RESOLUTIONS: Tuple[Tuple[int, int], ...] = ((10, 360), (60, 1440), (3600, 168))
+    MAGIC = 0x53454348  # Header: magic, version, max_series, slots per series
+    VERSION = 1
+    FLUSH_INTERVAL = 60
+    
+    def __init__(self, path: Path = Path("/var/lib/security/metrics/history.bin"),
+                 max_series: int = 1024):
+        self.path = path
+        self.index_path = path.with_suffix('.index.json')
+        self.max_series = max_series
+        self.tier_offsets = []
+        offset = 0
+        for _, slots in self.RESOLUTIONS:
+            self.tier_offsets.append(offset)
+            offset += slots * 3
+        self.stride = offset  # Doubles per series
+        self.header = 4
+        self.series: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._last_recorded: Dict[int, float] = {}  # slot -> timestamp of its newest value
+        self._index_dirty = False
+        self._last_flush = time.monotonic()
+        self._full_logged = False
+        self._open()
+    
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = (self.header + self.max_series * self.stride) * 8
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o640)
+        try:
+            layout = (self.MAGIC, self.VERSION, self.max_series, self.stride)
+            existing = os.pread(fd, 32, 0)
+            fresh = len(existing) < 32 or struct.unpack('4d', existing) != layout
+            if fresh:
+                # New file or a different layout: start over (sparse until written)
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        
+        self._data = memoryview(self._mm).cast('d')
+        if fresh:
+            self._data[0:4] = memoryview(struct.pack('4d', *layout)).cast('d')
+            self.series = {}
+            self._index_dirty = True
+        else:
+            try:
+                with open(self.index_path, 'r') as f:
+                    self.series = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.series = {}
+        
+        # Newest finest-tier bucket of each series says when it was last recorded
+        resolution, slots = self.RESOLUTIONS[0]
+        for slot in self.series.values():
+            base = self.header + slot * self.stride + self.tier_offsets[0]
+            self._last_recorded[slot] = max(self._data[base:base + slots * 3:3]) * resolution
+        used = set(self.series.values())
+        self._free = [slot for slot in range(self.max_series - 1, -1, -1) if slot not in used]
+    
+    @staticmethod
+    def series_key(name: str, labels: Dict[str, str]) -> str:
+        return json.dumps([name, labels], sort_keys=True, separators=(',', ':'))
+    
+    def _release_idle(self, now: float):
+        """Free slots of series aged out of every tier, else of the stalest departed series"""
+        resolution, slots = self.RESOLUTIONS[-1]
+        cutoff = now - resolution * slots
+        expired = [key for key, slot in self.series.items() if self._last_recorded.get(slot, 0) < cutoff]
+        if not expired and self.series:
+            # Full of recent series: evict the stalest one if it has departed
+            key = min(self.series, key=lambda k: self._last_recorded.get(self.series[k], 0))
+            resolution, slots = self.RESOLUTIONS[0]
+            if self._last_recorded.get(self.series[key], 0) < now - resolution * slots:
+                expired = [key]
+        for key in expired:
+            slot = self.series.pop(key)
+            self._last_recorded.pop(slot, None)
+            self._free.append(slot)
+        if expired:
+            self._index_dirty = True
+            self._full_logged = False
+    
+    def _assign(self, key: str, now: float) -> Optional[int]:
+        """Give a new series a zeroed slot; the index must be written before it is used"""
+        if not self._free:
+            self._release_idle(now)
+        if not self._free:
+            if not self._full_logged:
+                logger.warning(f"Metrics history full ({self.max_series} series); new series not recorded")
+                self._full_logged = True
+            return None
+        slot = self._free.pop()
+        base = self.header + slot * self.stride
+        self._data[base:base + self.stride] = memoryview(bytes(self.stride * 8)).cast('d')
+        self.series[key] = slot
+        self._last_recorded[slot] = now
+        self._index_dirty = True
+        return slot
+    
+    def record(self, name: str, labels: Dict[str, str], value: float, timestamp: Optional[float] = None):
+        """Fold a value into every resolution tier of its series"""
+        if value != value:  # NaN
+            return
+        timestamp = timestamp if timestamp is not None else time.time()
+        key = self.series_key(name, labels)
+        slot = self.series.get(key)
+        if slot is None:
+            slot = self._assign(key, timestamp)
+            if slot is None:
+                return
+            self._write_index()
+        self._fold(slot, value, timestamp)
+    
+    def _fold(self, slot: int, value: float, timestamp: float):
+        data = self._data
+        base = self.header + slot * self.stride
+        self._last_recorded[slot] = max(self._last_recorded.get(slot, 0), timestamp)
+        for (resolution, slots), tier_offset in zip(self.RESOLUTIONS, self.tier_offsets):
+            bucket = int(timestamp // resolution)
+            position = base + tier_offset + (bucket % slots) * 3
+            if data[position] != bucket:
+                data[position] = bucket
+                data[position + 1] = 0.0
+                data[position + 2] = 0.0
+            data[position + 1] += value
+            data[position + 2] += 1
+    
+    def record_registry(self, registry: CollectorRegistry, timestamp: Optional[float] = None):
+        """Record the current gauge and counter samples of a registry"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        samples = [
+            (self.series_key(sample.name, sample.labels), sample.value)
+            for family in registry.collect() if family.type in ('gauge', 'counter')
+            for sample in family.samples
+            if not sample.name.endswith('_created') and sample.value == sample.value
+        ]
+        new = []
+        for key, value in samples:
+            slot = self.series.get(key)
+            if slot is None:
+                new.append((key, value))
+            else:
+                self._fold(slot, value, timestamp)
+        
+        # Known series are refreshed before any is evicted; the index is written once per pass
+        for key, _ in new:
+            if key not in self.series:
+                self._assign(key, timestamp)
+        if self._index_dirty:
+            self._write_index()
+        for key, value in new:
+            slot = self.series.get(key)
+            if slot is not None:
+                self._fold(slot, value, timestamp)
+        
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+    
+    def query(self, name: str, labels: Optional[Dict[str, str]] = None,
+              start: Optional[float] = None, end: Optional[float] = None,
+              resolution: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Mean values per bucket for every series of a metric matching labels
+        
+        Uses the finest tier that still covers start unless a resolution
+        is given. Buckets without data are omitted.
+        """
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - 3600
+        
+        tier = len(self.RESOLUTIONS) - 1
+        for i, (res, slots) in enumerate(self.RESOLUTIONS):
+            if (resolution is not None and res >= resolution) or \
+                    (resolution is None and time.time() - start <= res * (slots + 1)):
+                tier = i
+                break
+        res, slots = self.RESOLUTIONS[tier]
+        
+        results = []
+        for key, slot in self.series.items():
+            series_name, series_labels = json.loads(key)
+            if series_name != name or any(series_labels.get(k) != v for k, v in (labels or {}).items()):
+                continue
+            
+            base = self.header + slot * self.stride + self.tier_offsets[tier]
+            points = []
+            first = max(int(start // res), int(end // res) - slots + 1)
+            for bucket in range(first, int(end // res) + 1):
+                position = base + (bucket % slots) * 3
+                if self._data[position] == bucket and self._data[position + 2] > 0:
+                    points.append([bucket * res, self._data[position + 1] / self._data[position + 2]])
+            
+            results.append({'labels': series_labels, 'resolution': res, 'points': points})
+        return results
+    
+    def flush(self):
+        """Sync buffers and the series index to disk"""
+        self._mm.flush()
+        if self._index_dirty:
+            self._write_index()
+        self._last_flush = time.monotonic()
+    
+    def _write_index(self):
+        tmp_file = self.index_path.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.series, f)
+        os.replace(tmp_file, self.index_path)
+        self._index_dirty = False
+    
+    def close(self):
+        self.flush()
+        self._data.release()
+        self._mm.close()
+
+
+@dataclass
+class PatchStatus:
+    """Cached result of a patch compliance evaluation"""
+    backend: str
+    compliance: float
+    total: int
+    outdated: List[str]
+    reboot_required: bool
+    fingerprint: str
+    evaluated_at: float
+    checked_at: float
+
+
+class NixOSPatchSource:
+    """Patch state of a NixOS system from local store metadata
+    
+    The running system closure (/run/current-system) is compared with the
+    newest system generation in the profile. A package is outdated when the
+    newest generation ships it at a different version. Closures come from
+    the Nix database, so no evaluation or network access is needed; root
+    can point at a fixture tree holding nix/store, nix/var/nix and run.
+    """
+    
+    name = 'nixos'
+    TIMEOUT = 120
+    GENERATION = re.compile(r'^system-(\d+)-link$')
+    # Nix splits names from versions at the first dash followed by a digit
+    VERSION_SPLIT = re.compile(r'-(?=\d)')
+    
+    def __init__(self, root: Path = Path('/')):
+        self.root = root
+        self.current_link = root / 'run/current-system'
+        self.booted_link = root / 'run/booted-system'
+        self.profiles = root / 'nix/var/nix/profiles'
+        self.db_file = root / 'nix/var/nix/db/db.sqlite'
+    
+    def available(self) -> bool:
+        return self.current_link.is_symlink()
+    
+    def _in_root(self, store_path: str) -> Path:
+        return self.root / store_path.lstrip('/')
+    
+    def latest_generation(self) -> Optional[str]:
+        """Store path of the highest-numbered system generation"""
+        generations = []
+        for entry in self.profiles.iterdir():
+            match = self.GENERATION.match(entry.name)
+            if match and entry.is_symlink():
+                generations.append((int(match.group(1)), entry))
+        if not generations:
+            return None
+        return os.readlink(max(generations)[1])
+    
+    def fingerprint(self) -> str:
+        """Changes whenever the running, booted or newest system changes"""
+        booted = os.readlink(self.booted_link) if self.booted_link.is_symlink() else ''
+        return '|'.join((os.readlink(self.current_link), booted, self.latest_generation() or ''))
+    
+    def closure(self, store_path: str) -> List[str]:
+        """Store paths in the runtime closure of a store path"""
+        if self.db_file.exists():
+            # Nix keeps the database in WAL mode; a read-only connection never blocks it
+            with closing(sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)) as db:
+                rows = db.execute('''
+                    WITH RECURSIVE closure(id) AS (
+                        SELECT id FROM ValidPaths WHERE path = ?
+                        UNION
+                        SELECT refs.reference FROM Refs refs JOIN closure ON refs.referrer = closure.id
+                    )
+                    SELECT path FROM ValidPaths JOIN closure USING (id)
+                ''', (store_path,)).fetchall()
+            return [row[0] for row in rows]
+        
+        output = subprocess.run(['nix-store', '--query', '--requisites', store_path],
+                                capture_output=True, text=True, check=True, timeout=self.TIMEOUT).stdout
+        return output.split()
+    
+    @classmethod
+    def packages(cls, paths: List[str]) -> Dict[str, set]:
+        """Versions per package name; unversioned paths (configs, units) are skipped"""
+        packages: Dict[str, set] = {}
+        for path in paths:
+            base = path.rsplit('/', 1)[-1].split('-', 1)[-1]
+            if base.endswith('.drv'):
+                continue
+            parts = cls.VERSION_SPLIT.split(base, 1)
+            if len(parts) == 2:
+                packages.setdefault(parts[0], set()).add(parts[1])
+        return packages
+    
+    def _kernel(self, system_path: str) -> Optional[str]:
+        kernel = self._in_root(system_path) / 'kernel'
+        return os.readlink(kernel) if kernel.is_symlink() else None
+    
+    def evaluate(self) -> Dict[str, Any]:
+        current = os.readlink(self.current_link)
+        latest = self.latest_generation() or current
+        
+        # The top-level system path itself is versioned by build date; skip it
+        current_packages = self.packages([p for p in self.closure(current) if p != current])
+        outdated = []
+        if latest != current:
+            latest_packages = self.packages([p for p in self.closure(latest) if p != latest])
+            outdated = sorted(
+                name for name, versions in current_packages.items()
+                if name in latest_packages and latest_packages[name] != versions
+            )
+        
+        reboot_required = False
+        if self.booted_link.is_symlink():
+            booted = os.readlink(self.booted_link)
+            reboot_required = booted != current and self._kernel(booted) != self._kernel(current)
+        
+        total = len(current_packages)
+        return {
+            'compliance': round((total - len(outdated)) / total * 100, 2) if total else 100.0,
+            'total': total,
+            'outdated': outdated,
+            'reboot_required': reboot_required
+        }
+
+
+class AptPatchSource:
+    """Patch state of a Debian-based system from apt and dpkg"""
+    
+    name = 'apt'
+    TIMEOUT = 120
+    
+    def __init__(self, root: Path = Path('/')):
+        self.dpkg_status = root / 'var/lib/dpkg/status'
+        self.apt_lists = root / 'var/lib/apt/lists'
+        self.reboot_flag = root / 'var/run/reboot-required'
+    
+    def available(self) -> bool:
+        return self.dpkg_status.exists()
+    
+    def fingerprint(self) -> str:
+        """Changes when packages are installed or package lists are updated"""
+        lists = self.apt_lists.stat().st_mtime if self.apt_lists.exists() else 0
+        return f"{self.dpkg_status.stat().st_mtime}|{lists}"
+    
+    def evaluate(self) -> Dict[str, Any]:
+        output = subprocess.run(['apt', 'list', '--upgradable'],
+                                capture_output=True, text=True, timeout=self.TIMEOUT).stdout
+        outdated = sorted(line.split('/', 1)[0] for line in output.split('\n') if '/' in line)
+        
+        output = subprocess.run(['dpkg-query', '-W', '-f', '${db:Status-Abbrev}\n'],
+                                capture_output=True, text=True, timeout=self.TIMEOUT).stdout
+        total = len([line for line in output.split('\n') if line.startswith('ii')])
+        
+        return {
+            'compliance': round((total - len(outdated)) / total * 100, 2) if total else 100.0,
+            'total': total,
+            'outdated': outdated,
+            'reboot_required': self.reboot_flag.exists()
+        }
+
+
+class PatchComplianceEvaluator:
+    """Evaluates patch compliance in a worker thread and caches the result
+    
+    Each refresh first computes a cheap fingerprint of the package state;
+    the full evaluation only reruns when it changes or the cached result is
+    older than max_age. The cache survives restarts, so the age reported is
+    the time since the state was last confirmed.
+    """
+    
+    def __init__(self, root: Path = Path('/'),
+                 cache_file: Optional[Path] = Path("/var/lib/security/metrics/patch_compliance.json"),
+                 max_age: float = 86400):
+        self.cache_file = cache_file
+        self.max_age = max_age
+        # NixOS systems may also carry a dpkg database (e.g. from containers); check it first
+        self.source = next(
+            (source for source in (NixOSPatchSource(root), AptPatchSource(root)) if source.available()),
+            None
+        )
+        self.status: Optional[PatchStatus] = None
+        self._load_cache()
+    
+    def age(self) -> float:
+        """Seconds since the cached result was last confirmed; -1 if there is none"""
+        return time.time() - self.status.checked_at if self.status else -1
+    
+    def _refresh(self, force: bool) -> Optional[PatchStatus]:
+        if self.source is None:
+            return None
+        
+        now = time.time()
+        fingerprint = self.source.fingerprint()
+        if (not force and self.status and self.status.backend == self.source.name and
+                self.status.fingerprint == fingerprint and now - self.status.evaluated_at < self.max_age):
+            self.status.checked_at = now
+        else:
+            self.status = PatchStatus(backend=self.source.name, fingerprint=fingerprint,
+                                      evaluated_at=now, checked_at=now, **self.source.evaluate())
+        self._save_cache()
+        return self.status
+    
+    async def refresh(self, force: bool = False) -> Optional[PatchStatus]:
+        """Re-evaluate if the package state changed; None if no backend applies"""
+        return await asyncio.to_thread(self._refresh, force)
+    
+    def _load_cache(self):
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                self.status = PatchStatus(**json.load(f))
+        except (FileNotFoundError, ValueError, TypeError):
+            pass
+    
+    def _save_cache(self):
+        if self.cache_file is None:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(asdict(self.status), f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not persist patch compliance cache: {str(e)}")
+
+
+class PatchMetrics:
+    """Custom collector for the patch compliance gauges
+    
+    Nothing is exported until the evaluator has a result, so hosts without a
+    supported package backend report no series rather than 0% compliance.
+    """
     
     def __init__(self):
-        self.docker_client = docker.from_env()
+        self.evaluator: Optional[PatchComplianceEvaluator] = None
+    
+    def collect(self):
+        status = self.evaluator.status if self.evaluator else None
+        if status is None:
+            return
+        yield GaugeMetricFamily('security_patch_compliance', 'Percentage of systems with latest patches',
+                                value=status.compliance)
+        yield GaugeMetricFamily('security_patch_compliance_age_seconds',
+                                'Seconds since the patch compliance result was last confirmed',
+                                value=self.evaluator.age())
+        yield GaugeMetricFamily('security_patch_outdated_packages',
+                                'Installed packages with a newer version available', value=len(status.outdated))
+        yield GaugeMetricFamily('security_patch_reboot_required',
+                                'Whether a reboot is needed to run the installed kernel (1) or not (0)',
+                                value=1 if status.reboot_required else 0)
+
+
+patch_metrics = PatchMetrics()
+registry.register(patch_metrics)
+
+
+class SecurityScoreEngine:
+    """Security score kept up to date from component inputs
+    
+    Collectors publish their inputs as they refresh; the score is only
+    recomputed when an input changes. Each component's raw input and the
+    points it contributes are exported alongside the score.
+    """
+    
+    # component -> (rule, points for an input value)
+    RULES: Dict[str, Tuple[str, Callable[[float], float]]] = {
+        'container_risk': ('-5 per container with risk score above 75', lambda v: -5 * v),
+        'critical_vulns': ('-10 per critical vulnerability', lambda v: -10 * v),
+        'failed_ssh': ('-10 for more than 10 failed SSH logins in the last hour',
+                       lambda v: -10 if v > 10 else 0),
+        'patch_compliance': ('-15 for patch compliance below 90%', lambda v: -15 if v < 90 else 0),
+        'file_integrity': ('-5 per critical file modified in the last hour', lambda v: -5 * v)
+    }
+    
+    def __init__(self, base: float = 100):
+        self.base = base
+        self.inputs: Dict[str, float] = {}
+        self.points: Dict[str, float] = {}
+        self.score: Optional[float] = None
+        self.recomputations = 0
+    
+    def update(self, component: str, value: float) -> bool:
+        """Publish a component input; returns whether the score was recomputed"""
+        if self.inputs.get(component) == value:
+            return False
+        
+        self.inputs[component] = value
+        self.points[component] = self.RULES[component][1](value)
+        security_score_input.labels(component=component).set(value)
+        security_score_component.labels(component=component).set(self.points[component])
+        
+        previous = self.score
+        self.score = max(0, min(100, self.base + sum(self.points.values())))
+        self.recomputations += 1
+        security_score.set(self.score)
+        if previous is not None and previous != self.score:
+            logger.info(f"Security score {previous} -> {self.score} ({component}={value})")
+        return True
+    
+    def explain(self) -> Dict[str, Dict[str, Any]]:
+        """Input, contributed points and rule of each reported component"""
+        return {
+            component: {'input': value, 'points': self.points[component], 'rule': self.RULES[component][0]}
+            for component, value in self.inputs.items()
+        }
+
+
+class SecurityMetricsCollector:
+    """Collects various security metrics
+    
+    Each collector runs as its own task with a refresh interval and timeout,
+    so a slow command only delays its own metrics. Values from collectors
+    that have not refreshed are served as-is with a staleness gauge.
+    """
+    
+    # name -> (refresh interval, timeout) in seconds
+    DEFAULT_SCHEDULE = {
+        'security_events': (15, 10),
+        'containers': (60, 30),
+        'network': (30, 20),
+        'ssh': (15, 10),
+        'file_integrity': (60, 10),
+        'patch_compliance': (900, 300),
+        'security_score': (15, 5)
+    }
+    
+    # name -> max live label sets
+    DEFAULT_SERIES_LIMITS = {
+        'container_risk_score': 500,
+        'container_vulnerabilities_total': 2000,
+        'security_file_changes_total': 200
+    }
+    
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None,
+                 schedule: Optional[Dict[str, tuple]] = None,
+                 series_limits: Optional[Dict[str, int]] = None,
+                 series_ttl_cycles: int = 3,
+                 history_file: Optional[Path] = Path("/var/lib/security/metrics/history.bin")):
+        self.docker_api = docker_api or get_shared_client()
         self.metrics_file = Path("/var/lib/prometheus/node_exporter/security_metrics.prom")
         self.events_log = Path("/var/log/security/events.json")
         self.last_event_check = datetime.now()
         
-    async def collect_all_metrics(self):
-        """Collect all security metrics"""
+        # Read position in the events log, persisted across restarts
+        self.events_cursor_file = Path("/var/lib/security/metrics/events_cursor.json")
+        self.events_tail = LogTail(self.events_log)
+        self.active_window = RollingEventWindow()
+        self.active_types = set()
+        self._load_events_cursor()
+        
+        self.score_engine = SecurityScoreEngine()
+        self.patch_status: Optional[float] = None
+        self.patch_evaluator = PatchComplianceEvaluator()
+        patch_metrics.evaluator = self.patch_evaluator
+        if self.patch_evaluator.status is not None:
+            self._set_patch_metrics(self.patch_evaluator.status)
+        self.scan_index = ScanResultIndex(Path("/var/log/security/container-scans"))
+        self.socket_counter = get_socket_counter()
+        self.auth_log = AuthLogAggregator()
+        self.network_states = set()
+        # iptables DROP rules seen by the last network collection; None until the first
+        self.blocked_ips_seen: Optional[int] = None
+        
+        self.history: Optional[MetricsHistory] = None
+        if history_file is not None:
+            try:
+                self.history = MetricsHistory(history_file)
+            except OSError as e:
+                logger.warning(f"Metrics history disabled: {str(e)}")
+        
+        limits = dict(self.DEFAULT_SERIES_LIMITS, **(series_limits or {}))
+        self.risk_series = SeriesTracker(
+            'container_risk_score', container_risk_score, ['container_name', 'image'],
+            limits['container_risk_score'], ['container_name', 'image'], series_ttl_cycles
+        )
+        self.vulnerability_series = SeriesTracker(
+            'container_vulnerabilities_total', container_vulnerabilities, ['container_name', 'severity'],
+            limits['container_vulnerabilities_total'], ['container_name'], series_ttl_cycles
+        )
+        # Counter series only appear on changes, so they are kept much longer
+        self.file_change_series = SeriesTracker(
+            'security_file_changes_total', file_changes, ['file_path', 'change_type'],
+            limits['security_file_changes_total'], ['file_path'], series_ttl_cycles * 20
+        )
+        self.started = time.monotonic()
+        self.collectors: Dict[str, CollectorSpec] = {}
+        
+        schedule = dict(self.DEFAULT_SCHEDULE, **(schedule or {}))
+        for name, func in [
+            ('security_events', self.collect_security_events),
+            ('containers', self.collect_container_metrics),
+            ('network', self.collect_network_metrics),
+            ('ssh', self.collect_ssh_metrics),
+            ('file_integrity', self.collect_file_integrity_metrics),
+            ('patch_compliance', self.collect_patch_compliance),
+            ('security_score', self.calculate_security_score)
+        ]:
+            interval, timeout = schedule[name]
+            self.collectors[name] = CollectorSpec(name, func, interval, timeout)
+    
+    async def _run_collector(self, spec: CollectorSpec):
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(spec.func(), spec.timeout)
+            spec.last_success = time.monotonic()
+        except asyncio.TimeoutError:
+            collector_failures.labels(collector=spec.name, reason='timeout').inc()
+            logger.warning(f"Collector {spec.name} timed out after {spec.timeout}s")
+        except Exception as e:
+            collector_failures.labels(collector=spec.name, reason='error').inc()
+            logger.error(f"Collector {spec.name} failed: {str(e)}")
+        finally:
+            collector_duration.labels(collector=spec.name).observe(time.monotonic() - start)
+            spec.task = None
+    
+    async def run_due_collectors(self, wait: Optional[float] = None):
+        """Start every collector whose interval has elapsed
+        
+        Waits up to `wait` seconds (None waits for all) for running collectors;
+        the rest keep running in the background and refresh on completion.
+        """
+        now = time.monotonic()
+        for spec in self.collectors.values():
+            if spec.task is None and (spec.last_started is None or now - spec.last_started >= spec.interval):
+                spec.last_started = now
+                spec.task = asyncio.create_task(self._run_collector(spec))
+        
+        running = [spec.task for spec in self.collectors.values() if spec.task is not None]
+        if running:
+            await asyncio.wait(running, timeout=wait)
+        
+        now = time.monotonic()
+        for spec in self.collectors.values():
+            collector_staleness.labels(collector=spec.name).set(now - (spec.last_success or self.started))
+        
+        if self.history is not None:
+            self.history.record_registry(registry)
+    
+    def close(self):
+        """Persist state that is otherwise synced periodically"""
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+    
+    def min_interval(self) -> float:
+        return min(spec.interval for spec in self.collectors.values())
+    
+    async def collect_all_metrics(self, wait: Optional[float] = 10.0):
+        """Refresh due collectors and write the current metrics"""
         try:
-            # Collect different metric types
-            await self.collect_security_events()
-            await self.collect_container_metrics()
-            await self.collect_network_metrics()
-            await self.collect_ssh_metrics()
-            await self.collect_file_integrity_metrics()
-            await self.calculate_security_score()
+            await self.run_due_collectors(wait)
             
             # Write metrics to file for node_exporter
             self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
@@ -143,95 +1325,129 @@ class SecurityMetricsCollector:
             logger.error(f"Error collecting metrics: {str(e)}")
     
     async def collect_security_events(self):
-        """Collect security event metrics"""
-        if not self.events_log.exists():
+        """Collect security event metrics from lines appended since the last run"""
+        try:
+            lines = self.events_tail.read_lines()
+        except Exception as e:
+            logger.error(f"Error reading events log: {str(e)}")
             return
         
         # Count events by type and severity
-        event_counts = {}
-        active_count = {}
+        event_counts = TallyCounter()
+        now = time.time()
         
-        try:
-            with open(self.events_log, 'r') as f:
-                for line in f:
-                    try:
-                        event = json.loads(line.strip())
-                        event_type = event.get('type', 'unknown')
-                        severity = event.get('severity', 'info')
-                        
-                        # Count total events
-                        key = (event_type, severity)
-                        event_counts[key] = event_counts.get(key, 0) + 1
-                        
-                        # Count active incidents (last hour)
-                        event_time = datetime.fromisoformat(event.get('timestamp', ''))
-                        if datetime.now() - event_time < timedelta(hours=1):
-                            active_count[event_type] = active_count.get(event_type, 0) + 1
-                    
-                    except:
-                        continue
-            
-            # Update metrics
-            for (event_type, severity), count in event_counts.items():
-                security_events_total.labels(
-                    event_type=event_type,
-                    severity=severity
-                ).inc(count)
-            
-            for incident_type, count in active_count.items():
-                active_incidents.labels(incident_type=incident_type).set(count)
+        for line in lines:
+            try:
+                event = json.loads(line)
+                event_type = event.get('type', 'unknown')
+                severity = event.get('severity', 'info')
+                event_counts[(event_type, severity)] += 1
                 
-        except Exception as e:
-            logger.error(f"Error reading events log: {str(e)}")
+                # Track active incidents (last hour)
+                event_time = datetime.fromisoformat(event.get('timestamp', '')).timestamp()
+                self.active_window.add(event_type, event_time, now)
+            except (ValueError, TypeError, AttributeError):
+                continue
+        
+        # Update metrics
+        for (event_type, severity), count in event_counts.items():
+            security_events_total.labels(
+                event_type=event_type,
+                severity=severity
+            ).inc(count)
+        
+        active = self.active_window.counts(now)
+        for incident_type in self.active_types | set(active):
+            active_incidents.labels(incident_type=incident_type).set(active.get(incident_type, 0))
+        self.active_types |= set(active)
+        
+        if lines:
+            self._save_events_cursor()
+    
+    def _load_events_cursor(self):
+        try:
+            with open(self.events_cursor_file, 'r') as f:
+                state = json.load(f)
+            self.events_tail.cursor = {'inode': state['inode'], 'offset': state['offset']}
+            self.active_window.load_state(state.get('active_window', {}))
+            self.active_types = set(self.active_window.totals)
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    
+    def _save_events_cursor(self):
+        try:
+            self.events_cursor_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.events_cursor_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(dict(self.events_tail.cursor, active_window=self.active_window.to_state()), f)
+            os.replace(tmp_file, self.events_cursor_file)
+        except OSError as e:
+            logger.warning(f"Could not persist events cursor: {str(e)}")
     
     async def collect_container_metrics(self):
         """Collect container security metrics"""
         try:
-            containers = self.docker_client.containers.list()
+            containers = await self.docker_api.list_containers()
+            self.risk_series.begin_cycle()
+            self.vulnerability_series.begin_cycle()
+            high_risk_containers = 0
+            critical_vulns = 0
             
             for container in containers:
+                name = container_name(container)
+                
                 # Get container scan results if available
-                scan_results = await self._get_container_scan_results(container.name)
+                scan_results = await self._get_container_scan_results(name)
                 
                 if scan_results:
+                    if scan_results.get('risk_score', 0) > 75:
+                        high_risk_containers += 1
+                    critical_vulns += scan_results.get('vulnerability_counts', {}).get('critical', 0)
+                    
                     # Risk score
-                    container_risk_score.labels(
-                        container_name=container.name,
-                        image=container.image.tags[0] if container.image.tags else 'unknown'
+                    self.risk_series.labels(
+                        container_name=name,
+                        image=container.get('Image') or 'unknown'
                     ).set(scan_results.get('risk_score', 0))
                     
                     # Vulnerabilities by severity
                     vuln_counts = scan_results.get('vulnerability_counts', {})
                     for severity, count in vuln_counts.items():
-                        container_vulnerabilities.labels(
-                            container_name=container.name,
+                        self.vulnerability_series.labels(
+                            container_name=name,
                             severity=severity
                         ).set(count)
-                
+            
+            # Drop series of containers that are gone
+            self.risk_series.end_cycle()
+            self.vulnerability_series.end_cycle()
+            
+            self.score_engine.update('container_risk', high_risk_containers)
+            self.score_engine.update('critical_vulns', critical_vulns)
+        
         except Exception as e:
             logger.error(f"Error collecting container metrics: {str(e)}")
     
     async def collect_network_metrics(self):
         """Collect network security metrics"""
         try:
-            # Get network connections
-            connections = psutil.net_connections()
-            
-            # Count by state and protocol
-            conn_counts = {}
-            for conn in connections:
-                if conn.status != 'NONE':
-                    key = (conn.status, 'tcp' if conn.type == 1 else 'udp')
-                    conn_counts[key] = conn_counts.get(key, 0) + 1
+            # Socket counts by state from sock_diag (or /proc/net), without
+            # walking every process's file descriptors
+            conn_counts = await asyncio.to_thread(self.socket_counter.counts)
             
-            # Update metrics
+            # Update metrics; states that emptied since the last run drop to zero
+            for state, protocol in self.network_states - conn_counts.keys():
+                network_connections.labels(state=state, protocol=protocol).set(0)
             for (state, protocol), count in conn_counts.items():
                 network_connections.labels(state=state, protocol=protocol).set(count)
+            self.network_states = set(conn_counts)
             
-            # Count blocked IPs from iptables
+            # Count newly blocked IPs: the counter grows by rules added since the last run
             blocked_count = await self._count_blocked_ips()
             if blocked_count is not None:
-                blocked_ips_total.labels(reason='firewall').inc(blocked_count)
+                if self.blocked_ips_seen is not None and blocked_count > self.blocked_ips_seen:
+                    blocked_ips_total.labels(reason='firewall').inc(blocked_count - self.blocked_ips_seen)
+                self.blocked_ips_seen = blocked_count
                 
         except Exception as e:
             logger.error(f"Error collecting network metrics: {str(e)}")
@@ -239,35 +1455,21 @@ class SecurityMetricsCollector:
     async def collect_ssh_metrics(self):
         """Collect SSH security metrics"""
         try:
-            # Parse auth log for SSH attempts
-            auth_log = Path("/var/log/auth.log")
-            if auth_log.exists():
-                # Count recent login attempts
-                failed_attempts = 0
-                successful_attempts = 0
-                
-                # Get last 1000 lines
-                result = subprocess.run(
-                    ['tail', '-n', '1000', str(auth_log)],
-                    capture_output=True,
-                    text=True
-                )
-                
-                for line in result.stdout.split('\n'):
-                    if 'sshd' in line:
-                        if 'Failed password' in line:
-                            failed_attempts += 1
-                            # Extract source IP if possible
-                            # ssh_login_attempts.labels(result='failed', source='external').inc()
-                        elif 'Accepted' in line:
-                            successful_attempts += 1
-                            # ssh_login_attempts.labels(result='success', source='external').inc()
-                
-                # Simple increment for now
-                if failed_attempts > 0:
-                    ssh_login_attempts.labels(result='failed', source='external').inc(failed_attempts)
-                if successful_attempts > 0:
-                    ssh_login_attempts.labels(result='success', source='external').inc(successful_attempts)
+            # New attempts since the last run, from the shared auth log aggregator
+            attempts = await asyncio.to_thread(self.auth_log.update)
+            for (result, source), count in attempts.items():
+                ssh_login_attempts.labels(result=result, source=source).inc(count)
+            
+            self.score_engine.update('failed_ssh', self.auth_log.counts('result', '1h').get('failed', 0))
+            
+            for window in AuthLogAggregator.WINDOWS:
+                results = self.auth_log.counts('result', window)
+                for result in ('failed', 'success'):
+                    ssh_login_attempts_recent.labels(result=result, window=window).set(results.get(result, 0))
+                for kind in ('source_ip', 'user'):
+                    ssh_failed_login_distinct.labels(kind=kind, window=window).set(
+                        len(self.auth_log.counts(kind, window))
+                    )
             
             # Count active SSH sessions
             active_sessions = await self._count_ssh_sessions()
@@ -286,234 +1488,625 @@ class SecurityMetricsCollector:
                 '/etc/ssh/sshd_config',
                 '/etc/sudoers'
             ]
+            self.file_change_series.begin_cycle()
+            modified = 0
             
             for file_path in critical_files:
                 if Path(file_path).exists():
                     # Check if file was modified recently
                     mtime = Path(file_path).stat().st_mtime
                     if time.time() - mtime < 3600:  # Modified in last hour
-                        file_changes.labels(
+                        modified += 1
+                        self.file_change_series.labels(
                             file_path=file_path,
                             change_type='modified'
                         ).inc()
-                        
+            
+            self.file_change_series.end_cycle()
+            self.score_engine.update('file_integrity', modified)
+        
         except Exception as e:
             logger.error(f"Error collecting file integrity metrics: {str(e)}")
     
     async def calculate_security_score(self):
-        """Calculate overall security score"""
-        score = 100  # Start with perfect score
+        """Refresh time-dependent score inputs
         
+        Other inputs are published by their collectors as they refresh, so
+        this only ages the failed SSH window; the engine recomputes the
+        score when any input changes.
+        """
+        self.score_engine.update('failed_ssh', self.auth_log.counts('result', '1h').get('failed', 0))
+    
+    async def collect_patch_compliance(self):
+        """Collect patch compliance metrics from the cached evaluator"""
+        status = await self.patch_evaluator.refresh()
+        if status is not None:
+            self._set_patch_metrics(status)
+    
+    def _set_patch_metrics(self, status: PatchStatus):
+        self.patch_status = status.compliance
+        self.score_engine.update('patch_compliance', status.compliance)
+    
+    async def _run_command(self, *args: str) -> str:
+        """Run a command without blocking the event loop; returns stdout"""
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
         try:
-            # Deduct points for various issues
-            
-            # Check for high risk containers
-            containers = self.docker_client.containers.list()
-            high_risk_containers = 0
-            for container in containers:
-                scan_results = await self._get_container_scan_results(container.name)
-                if scan_results and scan_results.get('risk_score', 0) > 75:
-                    high_risk_containers += 1
-            
-            score -= high_risk_containers * 5  # -5 points per high risk container
-            
-            # Check for critical vulnerabilities
-            critical_vulns = await self._count_critical_vulnerabilities()
-            score -= critical_vulns * 10  # -10 points per critical vuln
-            
-            # Check for failed SSH attempts
-            failed_ssh = await self._count_recent_failed_ssh()
-            if failed_ssh > 10:
-                score -= 10  # -10 points for many failed attempts
-            
-            # Check patch compliance
-            patch_status = await self._check_patch_compliance()
-            if patch_status < 90:
-                score -= 15  # -15 points for poor patch compliance
-            
-            # Ensure score is between 0 and 100
-            score = max(0, min(100, score))
-            
-            security_score.set(score)
-            patch_compliance.set(patch_status)
-            
-        except Exception as e:
-            logger.error(f"Error calculating security score: {str(e)}")
+            stdout, _ = await process.communicate()
+        except asyncio.CancelledError:
+            # Collector timed out; do not leave the command running
+            process.kill()
+            raise
+        return stdout.decode(errors='replace')
     
     async def _get_container_scan_results(self, container_name: str) -> Dict[str, Any]:
         """Get latest scan results for container"""
-        scan_dir = Path("/var/log/security/container-scans")
-        if not scan_dir.exists():
-            return {}
-        
-        # Find most recent scan for this container
-        pattern = f"scan_{container_name}_*.json"
-        scan_files = list(scan_dir.glob(pattern))
-        
-        if not scan_files:
-            return {}
-        
-        # Get most recent file
-        latest_file = max(scan_files, key=lambda p: p.stat().st_mtime)
-        
-        try:
-            with open(latest_file, 'r') as f:
-                data = json.load(f)
-                
-            # Extract vulnerability counts
-            vuln_counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
-            for finding in data.get('findings', []):
-                severity = finding.get('severity', 'low')
-                vuln_counts[severity] = vuln_counts.get(severity, 0) + 1
-            
-            return {
-                'risk_score': data.get('risk_score', 0),
-                'vulnerability_counts': vuln_counts
-            }
-            
-        except:
-            return {}
+        return self.scan_index.get(container_name)
     
     async def _count_blocked_ips(self) -> int:
         """Count IPs blocked by iptables"""
         try:
-            result = subprocess.run(
-                ['sudo', 'iptables', '-L', 'INPUT', '-n', '-v'],
-                capture_output=True,
-                text=True
-            )
+            output = await self._run_command('sudo', 'iptables', '-L', 'INPUT', '-n', '-v')
             
             blocked = 0
-            for line in result.stdout.split('\n'):
+            for line in output.split('\n'):
                 if 'DROP' in line and not '0.0.0.0/0' in line:
                     blocked += 1
             
             return blocked
             
-        except:
+        except Exception:
             return 0
     
     async def _count_ssh_sessions(self) -> int:
         """Count active SSH sessions"""
         try:
-            result = subprocess.run(['who'], capture_output=True, text=True)
-            return len([line for line in result.stdout.split('\n') if 'pts/' in line])
-        except:
+            output = await self._run_command('who')
+            return len([line for line in output.split('\n') if 'pts/' in line])
+        except Exception:
             return 0
+
+
+def registry_to_dict(registry: CollectorRegistry) -> Dict[str, List[Dict[str, Any]]]:
+    """Metric samples keyed by sample name, read directly from the registry"""
+    metrics: Dict[str, List[Dict[str, Any]]] = {}
+    for family in registry.collect():
+        for sample in family.samples:
+            metrics.setdefault(sample.name, []).append({
+                'labels': sample.labels,
+                'value': sample.value
+            })
+    return metrics
+
+
+class MetricsExporter:
+    """Exports metrics in various formats"""
     
-    async def _count_critical_vulnerabilities(self) -> int:
-        """Count total critical vulnerabilities"""
-        # This would aggregate from various sources
-        return 0
+    def __init__(self, collector: Optional[SecurityMetricsCollector] = None):
+        self.collector = collector or SecurityMetricsCollector()
     
-    async def _count_recent_failed_ssh(self) -> int:
-        """Count recent failed SSH attempts"""
-        try:
-            result = subprocess.run(
-                ['grep', 'Failed password', '/var/log/auth.log'],
-                capture_output=True,
-                text=True
-            )
-            return len(result.stdout.split('\n'))
-        except:
-            return 0
+    async def export_prometheus(self, wait: Optional[float] = 10.0):
+        """Export metrics for Prometheus"""
+        await self.collector.collect_all_metrics(wait)
+    
+    async def export_json(self, collect: bool = True, wait: Optional[float] = 10.0) -> Dict[str, Any]:
+        """Export metrics as JSON"""
+        if collect:
+            await self.collector.collect_all_metrics(wait)
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'metrics': registry_to_dict(registry)
+        }
+
+
+@dataclass
+class MetricsSnapshot:
+    """Rendered metrics shared by every scrape within the cache TTL"""
+    created: float
+    text: bytes
+    json: bytes
+
+
+class MetricsHTTPServer:
+    """Pull-based exporter serving /metrics and /metrics.json
+    
+    A scrape refreshes due collectors at most once per TTL. Concurrent
+    scrapes share a single in-flight refresh, and both formats are rendered
+    from the same registry state. /score.json breaks the security score
+    down by component.
+    """
+    
+    def __init__(self, collector: SecurityMetricsCollector, host: str = '127.0.0.1',
+                 port: int = 9105, ttl: float = 15.0, wait: float = 5.0):
+        self.collector = collector
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.wait = wait
+        self._snapshot: Optional[MetricsSnapshot] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._server = None
+    
+    async def get_snapshot(self) -> MetricsSnapshot:
+        """Cached snapshot, refreshed once the TTL has passed"""
+        if self._snapshot and time.monotonic() - self._snapshot.created < self.ttl:
+            return self._snapshot
+        
+        if self._refresh is None:
+            self._refresh = asyncio.create_task(self._build_snapshot())
+            self._refresh.add_done_callback(self._clear_refresh)
+        return await asyncio.shield(self._refresh)
     
-    async def _check_patch_compliance(self) -> float:
-        """Check system patch compliance percentage"""
+    def _clear_refresh(self, task: asyncio.Task):
+        self._refresh = None
+    
+    async def _build_snapshot(self) -> MetricsSnapshot:
+        await self.collector.run_due_collectors(self.wait)
+        
+        # No awaits between the two renders, so both see the same values
+        data = {'timestamp': datetime.now().isoformat(), 'metrics': registry_to_dict(registry)}
+        self._snapshot = MetricsSnapshot(
+            created=time.monotonic(),
+            text=generate_latest(registry),
+            json=json.dumps(data).encode()
+        )
+        return self._snapshot
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         try:
-            # Check for available updates
-            result = subprocess.run(
-                ['apt', 'list', '--upgradable'],
-                capture_output=True,
-                text=True
-            )
-            
-            # Count upgradable packages
-            upgradable = len([line for line in result.stdout.split('\n') if '/' in line])
-            
-            # Get total installed packages
-            result = subprocess.run(
-                ['dpkg', '-l'],
-                capture_output=True,
-                text=True
-            )
-            
-            installed = len([line for line in result.stdout.split('\n') if line.startswith('ii')])
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            while (await asyncio.wait_for(reader.readline(), 10)) not in (b'\r\n', b'\n', b''):
+                pass
             
-            if installed > 0:
-                compliance = ((installed - upgradable) / installed) * 100
-                return round(compliance, 2)
+            parts = request_line.decode(errors='replace').split()
+            url = urlsplit(parts[1] if len(parts) >= 2 else '')
+            path = url.path
             
-            return 100.0
+            if len(parts) < 2 or parts[0] != 'GET':
+                status, content_type, body = '405 Method Not Allowed', 'text/plain', b'Method not allowed\n'
+            elif path == '/metrics':
+                snapshot = await self.get_snapshot()
+                status, content_type, body = '200 OK', CONTENT_TYPE_LATEST, snapshot.text
+            elif path == '/metrics.json':
+                snapshot = await self.get_snapshot()
+                status, content_type, body = '200 OK', 'application/json', snapshot.json
+            elif path == '/score.json':
+                engine = self.collector.score_engine
+                body = json.dumps({'score': engine.score, 'components': engine.explain()}).encode()
+                status, content_type = '200 OK', 'application/json'
+            elif path == '/history.json' and self.collector.history is not None:
+                try:
+                    status, content_type, body = '200 OK', 'application/json', self._history(url.query)
+                except ValueError as e:
+                    status, content_type, body = '400 Bad Request', 'text/plain', f"{e}\n".encode()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'Not found\n'
             
-        except:
-            return 100.0
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            logger.error(f"Error serving metrics: {str(e)}")
+        finally:
+            writer.close()
+    
+    def _history(self, query: str) -> bytes:
+        """Range query: name=<metric>&range=<seconds>[&resolution=<seconds>][&<label>=<value>...]"""
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        name = params.pop('name', '')
+        span = float(params.pop('range', 3600))
+        resolution = params.pop('resolution', None)
+        resolution = int(resolution) if resolution else None
+        if not 0 < span < float('inf'):
+            raise ValueError(f"range must be a positive number of seconds, got {span}")
+        
+        now = time.time()
+        series = self.collector.history.query(name, labels=params, start=now - span, end=now,
+                                              resolution=resolution)
+        return json.dumps({'name': name, 'series': series}).encode()
+    
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
 
 
-class MetricsExporter:
-    """Exports metrics in various formats"""
+class SnapshotEncoder:
+    """Delta-encodes registry samples for pushing to a fleet aggregator
+    
+    Series get small integer IDs; a push defines series the aggregator has
+    not seen, and carries only values that changed and IDs that disappeared
+    since the last acknowledged push. reset() makes the next push a full one.
+    """
     
     def __init__(self):
-        self.collector = SecurityMetricsCollector()
+        self.ids: Dict[tuple, int] = {}
+        self.next_id = 0
+        self.seq = 0
+        self.sent: Dict[int, float] = {}
+        self.defined = set()
+        self.families_sent = set()
     
-    async def export_prometheus(self):
-        """Export metrics for Prometheus"""
-        await self.collector.collect_all_metrics()
+    def reset(self):
+        self.sent = {}
+        self.defined = set()
+        self.families_sent = set()
     
-    async def export_json(self) -> Dict[str, Any]:
-        """Export metrics as JSON"""
-        # Collect fresh metrics
-        await self.collector.collect_all_metrics()
+    def encode(self, registry: CollectorRegistry) -> Dict[str, Any]:
+        """Payload for the next push; apply it with commit() once acknowledged"""
+        values: Dict[int, float] = {}
+        defs: Dict[int, list] = {}
+        families: Dict[str, list] = {}
         
-        # Read the prometheus file and convert to JSON
-        metrics = {}
+        for family in registry.collect():
+            for sample in family.samples:
+                if sample.name.endswith('_created'):
+                    continue
+                key = (family.name, sample.name, tuple(sorted(sample.labels.items())))
+                series_id = self.ids.get(key)
+                if series_id is None:
+                    series_id = self.ids[key] = self.next_id
+                    self.next_id += 1
+                values[series_id] = sample.value
+                if series_id not in self.defined:
+                    defs[series_id] = [family.name, sample.name, sample.labels]
+                if family.name not in self.families_sent:
+                    families[family.name] = [family.type, family.documentation]
         
-        if self.collector.metrics_file.exists():
-            with open(self.collector.metrics_file, 'r') as f:
-                for line in f:
-                    if line.startswith('#'):
-                        continue
-                    
-                    parts = line.strip().split(' ')
-                    if len(parts) >= 2:
-                        metric_name = parts[0].split('{')[0]
-                        value = parts[-1]
-                        
-                        if metric_name not in metrics:
-                            metrics[metric_name] = []
-                        
-                        metrics[metric_name].append({
-                            'labels': parts[0],
-                            'value': float(value)
-                        })
+        return {
+            'seq': self.seq + 1,
+            'base': self.seq,
+            'full': not self.sent,
+            'families': families,
+            'defs': defs,
+            'values': {i: v for i, v in values.items() if self.sent.get(i) != v},
+            'removed': [i for i in self.sent if i not in values],
+            # Kept locally for commit(); stripped before sending
+            '_current': values
+        }
+    
+    def commit(self, payload: Dict[str, Any]):
+        self.seq = payload['seq']
+        self.sent = payload['_current']
+        self.defined.update(payload['defs'])
+        self.families_sent.update(payload['families'])
+        for series_id in payload['removed']:
+            self.defined.discard(series_id)
+        # Forget IDs of removed series so the map stays bounded
+        removed = set(payload['removed'])
+        if removed:
+            self.ids = {key: i for key, i in self.ids.items() if i not in removed}
+
+
+class FleetPusher:
+    """Pushes delta-encoded snapshots to a fleet aggregator over HTTP
+    
+    The target is http://host:port or unix:/path/to/socket. When the
+    aggregator has lost track of this node (409) a full snapshot is sent.
+    The shared token, if any, is sent as a bearer credential.
+    """
+    
+    def __init__(self, target: str, node: str, timeout: float = 10.0, token: Optional[str] = None):
+        self.target = target
+        self.node = node
+        self.timeout = timeout
+        self.token = token
+        self.encoder = SnapshotEncoder()
+        self.bytes_sent = 0
+    
+    async def _post(self, body: bytes) -> int:
+        if self.target.startswith('unix:'):
+            reader, writer = await asyncio.open_unix_connection(self.target[5:])
+            host = 'localhost'
+        else:
+            url = urlsplit(self.target)
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            host = url.netloc
+        auth = f"Authorization: Bearer {self.token}\r\n" if self.token else ''
+        try:
+            writer.write(
+                f"POST /push HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Encoding: deflate\r\nContent-Length: {len(body)}\r\n{auth}"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            self.bytes_sent += len(body)
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+    
+    async def push(self, source: Optional[CollectorRegistry] = None) -> bool:
+        """Send changes since the last acknowledged push"""
+        try:
+            for _ in range(2):
+                payload = self.encoder.encode(source or registry)
+                wire = {k: v for k, v in payload.items() if k != '_current'}
+                body = zlib.compress(json.dumps(dict(wire, node=self.node)).encode())
+                status = await asyncio.wait_for(self._post(body), self.timeout)
+                if status == 200:
+                    self.encoder.commit(payload)
+                    return True
+                if status != 409:
+                    break
+                self.encoder.reset()
+            logger.warning(f"Fleet aggregator rejected push from {self.node}: HTTP {status}")
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            logger.warning(f"Could not push metrics to {self.target}: {str(e)}")
+        return False
+
+
+@dataclass
+class FleetNode:
+    """Series last pushed by one node"""
+    name: str
+    seq: int = 0
+    series: Dict[int, list] = field(default_factory=dict)  # id -> [family, sample, labels, value]
+    last_seen: float = 0.0
+    pushes: int = 0
+    bytes_received: int = 0
+
+
+class FleetAggregator:
+    """Merges node snapshots in memory and renders fleet-wide metrics
+    
+    Every node series is exported with a node label. Nodes that have not
+    pushed within stale_after are reported as down and left out of the
+    fleet score; after expire_after their series are dropped.
+    """
+    
+    def __init__(self, stale_after: float = 60, expire_after: float = 3600):
+        self.stale_after = stale_after
+        self.expire_after = expire_after
+        self.nodes: Dict[str, FleetNode] = {}
+        self.families: Dict[str, list] = {}
+        self.registry = CollectorRegistry(auto_describe=False)
+        self.registry.register(self)
+    
+    def apply(self, payload: Dict[str, Any], size: int = 0) -> bool:
+        """Merge a push; False if it is a delta against a state this node no longer has"""
+        name = payload['node']
+        node = self.nodes.get(name)
+        if not payload.get('full') and (node is None or node.seq != payload['base']):
+            return False
+        if node is None or payload.get('full'):
+            node = self.nodes[name] = FleetNode(name)
+        
+        self.families.update(payload.get('families', {}))
+        for series_id, (family, sample, labels) in payload.get('defs', {}).items():
+            node.series[int(series_id)] = [family, sample, labels, 0.0]
+        for series_id, value in payload.get('values', {}).items():
+            if int(series_id) in node.series:
+                node.series[int(series_id)][3] = value
+        for series_id in payload.get('removed', []):
+            node.series.pop(int(series_id), None)
+        
+        node.seq = payload['seq']
+        node.last_seen = time.time()
+        node.pushes += 1
+        node.bytes_received += size
+        return True
+    
+    def collect(self):
+        """Custom collector: node series plus fleet health and score"""
+        now = time.time()
+        for name in [n for n, node in self.nodes.items() if now - node.last_seen > self.expire_after]:
+            del self.nodes[name]
+        
+        merged: Dict[str, Metric] = {}
+        for node in self.nodes.values():
+            for family, sample, labels, value in node.series.values():
+                metric = merged.get(family)
+                if metric is None:
+                    typ, documentation = self.families.get(family, ('untyped', ''))
+                    metric = merged[family] = Metric(family, documentation, typ)
+                metric.add_sample(sample, dict(labels, node=node.name), value)
+        yield from merged.values()
+        
+        up = GaugeMetricFamily('fleet_node_up', 'Whether the node pushed within the staleness limit',
+                               labels=['node'])
+        staleness = GaugeMetricFamily('fleet_node_staleness_seconds', 'Seconds since the node last pushed',
+                                      labels=['node'])
+        scores = []
+        for node in self.nodes.values():
+            age = now - node.last_seen
+            fresh = age <= self.stale_after
+            up.add_metric([node.name], 1 if fresh else 0)
+            staleness.add_metric([node.name], age)
+            if fresh:
+                scores.extend(v for family, sample, _, v in node.series.values()
+                              if sample == 'system_security_score')
+        yield up
+        yield staleness
         
+        fleet_score = GaugeMetricFamily('fleet_security_score', 'Security score across fresh nodes',
+                                        labels=['stat'])
+        if scores:
+            fleet_score.add_metric(['min'], min(scores))
+            fleet_score.add_metric(['mean'], sum(scores) / len(scores))
+        yield fleet_score
+    
+    def summary(self) -> Dict[str, Any]:
+        now = time.time()
         return {
-            'timestamp': datetime.now().isoformat(),
-            'metrics': metrics
+            name: {
+                'seq': node.seq,
+                'series': len(node.series),
+                'staleness': now - node.last_seen,
+                'pushes': node.pushes,
+                'bytes_received': node.bytes_received
+            }
+            for name, node in self.nodes.items()
         }
 
 
-async def continuous_collection(interval: int = 60):
+class FleetAggregatorServer:
+    """HTTP endpoint for node pushes and fleet scrapes, on TCP or a unix socket
+    
+    POST /push accepts deflate-compressed snapshots; GET /metrics serves the
+    merged fleet and GET /fleet.json per-node push statistics.
+    
+    Pushes over TCP must carry the shared token; without one configured only
+    the unix socket, guarded by its file permissions, accepts pushes. When
+    allowed_nodes is set, pushes naming any other node are refused.
+    """
+    
+    MAX_BODY = 64 * 1024 * 1024
+    
+    def __init__(self, aggregator: FleetAggregator, host: str = '127.0.0.1', port: int = 9106,
+                 unix_path: Optional[str] = None, token: Optional[str] = None,
+                 allowed_nodes: Optional[List[str]] = None):
+        self.aggregator = aggregator
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.token = token
+        self.allowed_nodes = set(allowed_nodes) if allowed_nodes else None
+        self._servers = []
+    
+    def _authorized(self, headers: Dict[str, str], local: bool) -> bool:
+        if self.token is None:
+            return local
+        scheme, _, credential = headers.get('authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(credential.encode(), self.token.encode())
+    
+    def _decompress(self, body: bytes) -> bytes:
+        """Inflate a push without letting it expand past MAX_BODY"""
+        inflater = zlib.decompressobj()
+        data = inflater.decompress(body, self.MAX_BODY)
+        if inflater.unconsumed_tail:
+            raise ValueError(f"push expands beyond {self.MAX_BODY} bytes")
+        return data
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                 local: bool = False):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode(errors='replace').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            
+            parts = request_line.decode(errors='replace').split()
+            method, path = (parts[0], urlsplit(parts[1]).path) if len(parts) >= 2 else ('', '')
+            
+            if method == 'POST' and path == '/push':
+                length = int(headers.get('content-length', 0))
+                if not 0 <= length <= self.MAX_BODY:
+                    raise ValueError(f"push of {length} bytes exceeds limit")
+                if not self._authorized(headers, local):
+                    raise PermissionError('push not authorized')
+                body = await asyncio.wait_for(reader.readexactly(length), 30)
+                data = self._decompress(body) if headers.get('content-encoding') == 'deflate' else body
+                payload = json.loads(data)
+                if self.allowed_nodes is not None and payload.get('node') not in self.allowed_nodes:
+                    raise PermissionError(f"node {payload.get('node')!r} not allowed")
+                if self.aggregator.apply(payload, len(body)):
+                    status, content_type, body = '200 OK', 'application/json', b'{}'
+                else:
+                    status, content_type, body = '409 Conflict', 'application/json', b'{"full": true}'
+            elif method == 'GET' and path == '/metrics':
+                status, content_type, body = '200 OK', CONTENT_TYPE_LATEST, generate_latest(self.aggregator.registry)
+            elif method == 'GET' and path == '/fleet.json':
+                status, content_type, body = '200 OK', 'application/json', json.dumps(self.aggregator.summary()).encode()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'Not found\n'
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except PermissionError as e:
+            status, content_type, body = '403 Forbidden', 'text/plain', f"{e}\n".encode()
+        except (ValueError, KeyError, TypeError, AttributeError, zlib.error) as e:
+            status, content_type, body = '400 Bad Request', 'text/plain', f"{e}\n".encode()
+        
+        try:
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self):
+        if self.port:
+            self._servers.append(await asyncio.start_server(self._handle_connection, self.host, self.port))
+            logger.info(f"Fleet aggregator listening on http://{self.host}:{self.port}")
+        if self.unix_path:
+            self._servers.append(await asyncio.start_unix_server(
+                lambda reader, writer: self._handle_connection(reader, writer, local=True), self.unix_path
+            ))
+            logger.info(f"Fleet aggregator listening on unix:{self.unix_path}")
+    
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+
+async def run_aggregator(host: str, port: int, unix_path: Optional[str], stale_after: float,
+                         token: Optional[str] = None, allowed_nodes: Optional[List[str]] = None):
+    """Serve the fleet aggregator until cancelled"""
+    if token is None:
+        logger.warning("No fleet token configured; only pushes over the unix socket are accepted")
+    server = FleetAggregatorServer(FleetAggregator(stale_after=stale_after), host, port, unix_path,
+                                   token, allowed_nodes)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+async def continuous_collection(interval: int = 60, port: int = 0, host: str = '127.0.0.1',
+                                cache_ttl: float = 15.0, pusher: Optional[FleetPusher] = None):
     """Continuously collect metrics"""
     exporter = MetricsExporter()
     
+    if port:
+        server = MetricsHTTPServer(exporter.collector, host=host, port=port, ttl=cache_ttl)
+        await server.start()
+    
     while True:
         try:
             logger.info("Collecting security metrics...")
             await exporter.export_prometheus()
             
-            # Also export JSON for dashboards
-            json_metrics = await exporter.export_json()
+            # Also export JSON for dashboards from the values just collected
+            json_metrics = await exporter.export_json(collect=False)
             json_file = Path("/var/log/security/metrics/current.json")
             json_file.parent.mkdir(parents=True, exist_ok=True)
             
             with open(json_file, 'w') as f:
                 json.dump(json_metrics, f, indent=2)
             
+            if pusher is not None:
+                await pusher.push()
+            
         except Exception as e:
             logger.error(f"Error in continuous collection: {str(e)}")
         
-        await asyncio.sleep(interval)
+        # Collectors refresh on their own intervals; wake for the most frequent
+        await asyncio.sleep(min(interval, exporter.collector.min_interval()))
 
 
 def main():
@@ -525,22 +2118,51 @@ def main():
     parser.add_argument('--interval', type=int, default=60, help='Collection interval in seconds')
     parser.add_argument('--output', choices=['prometheus', 'json'], default='prometheus',
                        help='Output format')
+    parser.add_argument('--port', type=int, default=0,
+                        help='Serve /metrics and /metrics.json on this port (0 disables)')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address for the metrics endpoint or aggregator (0.0.0.0 for all interfaces)')
+    parser.add_argument('--cache-ttl', type=float, default=15.0,
+                        help='Seconds a scrape result is reused by later scrapes')
+    parser.add_argument('--push-to', metavar='URL',
+                        help='Push snapshots to a fleet aggregator (http://host:port or unix:/path)')
+    parser.add_argument('--node-name', default=socket.gethostname(),
+                        help='Node name reported to the fleet aggregator')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Run as fleet aggregator instead of collecting (default port 9106)')
+    parser.add_argument('--unix-socket', help='Also accept aggregator pushes on this unix socket')
+    parser.add_argument('--stale-after', type=float, default=60.0,
+                        help='Seconds without a push before a node is reported down')
+    parser.add_argument('--fleet-token-file', metavar='PATH',
+                        help='File holding the shared fleet push token (or set FLEET_TOKEN)')
+    parser.add_argument('--allow-node', action='append', metavar='NAME',
+                        help='Only accept aggregator pushes from this node (repeatable)')
     
     args = parser.parse_args()
     
-    if args.once:
+    token = os.environ.get('FLEET_TOKEN') or None
+    if args.fleet_token_file:
+        token = Path(args.fleet_token_file).read_text().strip() or None
+    
+    if args.aggregate:
+        asyncio.run(run_aggregator(args.host, args.port or 9106, args.unix_socket,
+                                   args.stale_after, token, args.allow_node))
+    elif args.once:
         # Single collection
         exporter = MetricsExporter()
         
         if args.output == 'prometheus':
-            asyncio.run(exporter.export_prometheus())
+            asyncio.run(exporter.export_prometheus(wait=None))
             print(f"Metrics written to {exporter.collector.metrics_file}")
         else:
-            metrics = asyncio.run(exporter.export_json())
+            metrics = asyncio.run(exporter.export_json(wait=None))
             print(json.dumps(metrics, indent=2))
+        
+        exporter.collector.close()
     else:
         # Continuous collection
-        asyncio.run(continuous_collection(args.interval))
+        pusher = FleetPusher(args.push_to, args.node_name, token=token) if args.push_to else None
+        asyncio.run(continuous_collection(args.interval, args.port, args.host, args.cache_ttl, pusher))
 
 
 if __name__ == "__main__":
@@ -94,18 +94,8 @@ scrape_configs:
 
   - job_name: 'security_metrics'
     static_configs:
-      - targets: ['localhost:9100']
+      - targets: ['localhost:9105']
     metrics_path: /metrics
-    params:
-      collect[]:
-        - textfile
-    relabel_configs:
-      - source_labels: [__address__]
-        target_label: __param_target
-      - source_labels: [__param_target]
-        target_label: instance
-      - target_label: __address__
-        replacement: localhost:9100
 EOF
     
     # Create textfile collector directory
@@ -172,6 +162,9 @@ setup_metrics_collection() {
     
     # Copy metrics collector script
     cp "$SCRIPT_DIR/security-metrics-collector.py" /usr/local/bin/
+    mkdir -p /opt/scripts/security
+    cp "$SCRIPT_DIR/../security/docker_api_client.py" /opt/scripts/security/
+    cp "$SCRIPT_DIR/../security/socket_stats.py" /opt/scripts/security/
     chmod +x /usr/local/bin/security-metrics-collector.py
     
     # Create systemd service
@@ -183,7 +176,7 @@ After=network.target docker.service
 [Service]
 Type=simple
 User=root
-ExecStart=/usr/bin/python3 /usr/local/bin/security-metrics-collector.py
+ExecStart=/usr/bin/python3 /usr/local/bin/security-metrics-collector.py --port 9105
 Restart=always
 RestartSec=10
 StandardOutput=journal
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Test script for fleet metrics aggregation
+Runs several local collector processes as nodes pushing to an aggregator
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+import zlib
+from pathlib import Path
+from typing import Optional
+
+# The collector is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'security_metrics_collector', Path(__file__).resolve().parent / 'security-metrics-collector.py'
+)
+collector = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(collector)
+
+TOKEN = 'test-fleet-token'
+
+
+async def run_node(name: str, target: str, token: Optional[str]):
+    """Node process: applies commands from stdin to its registry and pushes"""
+    pusher = collector.FleetPusher(target, name, token=token)
+    loop = asyncio.get_running_loop()
+    # A node's worth of series, most of which never change between pushes
+    for i in range(200):
+        collector.container_vulnerabilities.labels(container_name=f"{name}-c{i}", severity='high').set(i)
+    
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        command = line.split()
+        if not command or command[0] == 'exit':
+            return
+        if command[0] == 'score':
+            collector.security_score.set(float(command[1]))
+        elif command[0] == 'drop':
+            collector.container_vulnerabilities.remove(f"{name}-c0", 'high')
+        elif command[0] == 'push':
+            before = pusher.bytes_sent
+            ok = await pusher.push()
+            print(json.dumps({'ok': ok, 'bytes': pusher.bytes_sent - before}), flush=True)
+
+
+class NodeProcess:
+    """Handle on a node subprocess"""
+    
+    def __init__(self, name: str, target: str, token: Optional[str] = TOKEN):
+        self.name = name
+        self.target = target
+        self.token = token
+        self.process = None
+    
+    async def start(self):
+        token = ['--token', self.token] if self.token else []
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, '--node', self.name, '--target', self.target, *token,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+    
+    async def send(self, command: str):
+        self.process.stdin.write(f"{command}\n".encode())
+        await self.process.stdin.drain()
+    
+    async def push(self) -> dict:
+        await self.send('push')
+        return json.loads(await self.process.stdout.readline())
+    
+    async def stop(self):
+        await self.send('exit')
+        await self.process.wait()
+
+
+def scrape(port: int, path: str = '/metrics') -> str:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as response:
+        return response.read().decode()
+
+
+def sample(text: str, name: str, **labels) -> float:
+    selector = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    for line in text.splitlines():
+        if line.startswith(f"{name}{{") and all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    raise KeyError(f"{name}{{{selector}}}")
+
+
+def post(port: int, body: bytes, token: Optional[str] = TOKEN) -> int:
+    """Raw push to the aggregator; returns the HTTP status"""
+    headers = {'Content-Encoding': 'deflate'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/push", body, headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+async def test_fleet(port: int, unix_path: str) -> bool:
+    print("\n🛰  Testing fleet aggregation with 3 node processes...")
+    aggregator = collector.FleetAggregator(stale_after=60)
+    server = collector.FleetAggregatorServer(aggregator, '127.0.0.1', port, unix_path, TOKEN,
+                                             ['node-1', 'node-2', 'node-3', 'node-4'])
+    await server.start()
+    
+    nodes = [NodeProcess('node-1', f"http://127.0.0.1:{port}"),
+             NodeProcess('node-2', f"http://127.0.0.1:{port}"),
+             NodeProcess('node-3', f"unix:{unix_path}")]
+    for i, node in enumerate(nodes):
+        await node.start()
+        await node.send(f"score {90 - i * 10}")
+    try:
+        first = [await node.push() for node in nodes]
+        text = await asyncio.to_thread(scrape, port)
+        ok = check("All nodes pushed over TCP and unix socket", all(r['ok'] for r in first))
+        ok &= check("Node series carry a node label",
+                    sample(text, 'system_security_score', node='node-3') == 70)
+        ok &= check("Fleet score min/mean across nodes",
+                    sample(text, 'fleet_security_score', stat='min') == 70 and
+                    sample(text, 'fleet_security_score', stat='mean') == 80)
+        
+        push = zlib.compress(json.dumps({'node': 'node-1', 'seq': 0, 'full': True}).encode())
+        ok &= check("TCP pushes without the token are refused",
+                    await asyncio.to_thread(post, port, push, None) == 403 and
+                    await asyncio.to_thread(post, port, push, 'wrong-token') == 403)
+        unlisted = zlib.compress(json.dumps({'node': 'intruder', 'seq': 0, 'full': True}).encode())
+        ok &= check("Pushes from nodes outside the allow-list are refused",
+                    await asyncio.to_thread(post, port, unlisted) == 403 and 'node="intruder"' not in
+                    await asyncio.to_thread(scrape, port))
+        bomb = zlib.compress(b' ' * (collector.FleetAggregatorServer.MAX_BODY + 1), 9)
+        ok &= check(f"Pushes inflating past the limit are refused ({len(bomb)} B compressed)",
+                    await asyncio.to_thread(post, port, bomb) == 400)
+        
+        # Without a token only the unix socket is trusted
+        tokenless = collector.FleetAggregatorServer(collector.FleetAggregator(), '127.0.0.1', port + 1,
+                                                    f"{unix_path}.local")
+        await tokenless.start()
+        local, remote = (NodeProcess('node-4', f"unix:{unix_path}.local", None),
+                         NodeProcess('node-5', f"http://127.0.0.1:{port + 1}", None))
+        await local.start()
+        await remote.start()
+        try:
+            ok &= check("Tokenless aggregator accepts the unix socket but not TCP",
+                        (await local.push())['ok'] and not (await remote.push())['ok'])
+        finally:
+            await local.stop()
+            await remote.stop()
+            await tokenless.stop()
+        
+        await nodes[0].send('score 40')
+        await nodes[0].send('drop')
+        delta = await nodes[0].push()
+        text = await asyncio.to_thread(scrape, port)
+        ok &= check(f"Delta push is compact ({first[0]['bytes']} B full, {delta['bytes']} B delta)",
+                    delta['ok'] and delta['bytes'] * 5 < first[0]['bytes'])
+        ok &= check("Delta applied: new value and removed series",
+                    sample(text, 'system_security_score', node='node-1') == 40 and
+                    'container_name="node-1-c0"' not in text)
+        
+        # Aggregator restart: deltas are refused until the node resends in full
+        await server.stop()
+        aggregator = collector.FleetAggregator(stale_after=60)
+        server = collector.FleetAggregatorServer(aggregator, '127.0.0.1', port, unix_path, TOKEN)
+        await server.start()
+        resync = await nodes[1].push()
+        text = await asyncio.to_thread(scrape, port)
+        ok &= check("Node resyncs in full after aggregator restart",
+                    resync['ok'] and resync['bytes'] > delta['bytes'] and
+                    sample(text, 'system_security_score', node='node-2') == 80)
+        
+        aggregator.stale_after = 0
+        await asyncio.sleep(0.05)
+        text = await asyncio.to_thread(scrape, port)
+        ok &= check("Stale nodes reported down and left out of the fleet score",
+                    sample(text, 'fleet_node_up', node='node-2') == 0 and
+                    'fleet_security_score{' not in text)
+        return ok
+    finally:
+        for node in nodes:
+            await node.stop()
+        await server.stop()
+
+
+async def main():
+    """Run all fleet aggregation tests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = await test_fleet(19106, str(Path(tmp) / 'aggregator.sock'))
+    
+    print(f"\n{'✅ All' if ok else '❌ Some'} fleet aggregation tests passed")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fleet aggregation test')
+    parser.add_argument('--node', help='Run as a node process with this name')
+    parser.add_argument('--target', help='Aggregator URL for node processes')
+    parser.add_argument('--token', help='Fleet token for node processes')
+    args = parser.parse_args()
+    
+    if args.node:
+        asyncio.run(run_node(args.node, args.target, args.token))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for patch compliance evaluation
+Builds fixture Nix store trees and checks the NixOS evaluator offline
+"""
+
+import asyncio
+import importlib.util
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# The collector is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'security_metrics_collector', Path(__file__).resolve().parent / 'security-metrics-collector.py'
+)
+collector = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(collector)
+
+
+class FixtureSystem:
+    """Minimal NixOS tree: store paths, the Nix database and system profile links"""
+    
+    def __init__(self, root: Path):
+        self.root = root
+        self.hashes = 0
+        (root / 'nix/store').mkdir(parents=True)
+        (root / 'nix/var/nix/db').mkdir(parents=True)
+        (root / 'nix/var/nix/profiles').mkdir(parents=True)
+        (root / 'run').mkdir()
+        
+        self.db = sqlite3.connect(root / 'nix/var/nix/db/db.sqlite')
+        self.db.executescript('''
+            CREATE TABLE ValidPaths (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL,
+                                     hash TEXT NOT NULL, registrationTime INTEGER NOT NULL);
+            CREATE TABLE Refs (referrer INTEGER NOT NULL, reference INTEGER NOT NULL,
+                               PRIMARY KEY (referrer, reference));
+        ''')
+    
+    def add_path(self, name: str, references=()) -> str:
+        """Register a store path with its references"""
+        self.hashes += 1
+        path = f"/nix/store/{self.hashes:032d}-{name}"
+        (self.root / path.lstrip('/')).mkdir()
+        cursor = self.db.execute(
+            'INSERT INTO ValidPaths (path, hash, registrationTime) VALUES (?, ?, 0)', (path, 'sha256:0')
+        )
+        for reference in references:
+            self.db.execute('INSERT INTO Refs SELECT ?, id FROM ValidPaths WHERE path = ?',
+                            (cursor.lastrowid, reference))
+        self.db.commit()
+        return path
+    
+    def add_system(self, generation: int, packages: dict, kernel: str) -> str:
+        """Build a system closure and its profile generation link"""
+        paths = [self.add_path(f"{name}-{version}") for name, version in packages.items()]
+        paths.append(self.add_path('etc'))
+        kernel_path = self.add_path(f"linux-{kernel}")
+        system = self.add_path(f"nixos-system-host-24.05.{generation}", paths + [kernel_path])
+        os.symlink(kernel_path, self.root / system.lstrip('/') / 'kernel')
+        os.symlink(system, self.root / f"nix/var/nix/profiles/system-{generation}-link")
+        return system
+    
+    def switch(self, system: str, booted: bool = False):
+        """Point /run/current-system (and optionally /run/booted-system) at a system"""
+        links = ['run/current-system'] + (['run/booted-system'] if booted else [])
+        for link in links:
+            target = self.root / link
+            if target.is_symlink():
+                target.unlink()
+            os.symlink(system, target)
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+async def test_nixos(root: Path) -> bool:
+    """Running the newest generation, then falling behind it"""
+    print("\n🔍 Testing NixOS patch compliance...")
+    fixture = FixtureSystem(root)
+    packages = {'openssl': '3.0.13', 'openssh': '9.7p1', 'bash': '5.2p26', 'glibc': '2.39-52'}
+    gen1 = fixture.add_system(1, packages, kernel='6.6.30')
+    fixture.switch(gen1, booted=True)
+    
+    evaluator = collector.PatchComplianceEvaluator(root=root, cache_file=root / 'cache.json')
+    status = await evaluator.refresh()
+    ok = check("NixOS backend detected", evaluator.source.name == 'nixos')
+    ok &= check(f"Up to date on newest generation ({status.compliance}%)",
+                status.compliance == 100.0 and not status.outdated and status.total == 5)
+    
+    # A newer generation is built but not yet switched to
+    gen2 = fixture.add_system(2, dict(packages, openssl='3.0.14'), kernel='6.6.31')
+    status = await evaluator.refresh()
+    ok &= check(f"Outdated packages found ({status.outdated}, {status.compliance}%)",
+                status.outdated == ['linux', 'openssl'] and status.compliance == 60.0)
+    
+    # Switched but still running the old kernel
+    fixture.switch(gen2)
+    status = await evaluator.refresh()
+    ok &= check("Compliant after switch, reboot required",
+                status.compliance == 100.0 and status.reboot_required)
+    
+    evaluated_at = status.evaluated_at
+    status = await evaluator.refresh()
+    ok &= check("Unchanged system reuses the cached result", status.evaluated_at == evaluated_at)
+    
+    reloaded = collector.PatchComplianceEvaluator(root=root, cache_file=root / 'cache.json')
+    ok &= check(f"Cache survives restart (age {reloaded.age():.2f}s)",
+                reloaded.status == status and 0 <= reloaded.age() < 60)
+    
+    collector.patch_metrics.evaluator = reloaded
+    exposition = collector.generate_latest(collector.registry).decode()
+    ok &= check("Patch series exported once a result exists",
+                'security_patch_compliance 100.0' in exposition and
+                'security_patch_reboot_required 1.0' in exposition)
+    return ok
+
+
+async def test_unsupported(root: Path) -> bool:
+    """No package manager state: compliance is unknown rather than 100%"""
+    print("\n🔍 Testing system without package metadata...")
+    evaluator = collector.PatchComplianceEvaluator(root=root, cache_file=None)
+    status = await evaluator.refresh()
+    ok = check("No result and no age", status is None and evaluator.age() == -1)
+    
+    collector.patch_metrics.evaluator = evaluator
+    exposition = collector.generate_latest(collector.registry).decode()
+    ok &= check("No patch series exported", 'security_patch_' not in exposition)
+    return ok
+
+
+async def main():
+    """Run all patch compliance tests"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        results.append(await test_nixos(Path(tmp) / 'nixos'))
+        (Path(tmp) / 'empty').mkdir()
+        results.append(await test_unsupported(Path(tmp) / 'empty'))
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} patch compliance tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,7 +5,6 @@ Comprehensive Docker container security scanning and enforcement
 """
 
 import asyncio
-import docker
 import json
 import yaml
 from pathlib import Path
@@ -18,6 +17,8 @@ import subprocess
 import hashlib
 import re
 
+from docker_api_client import AsyncDockerClient, DockerNotFound, get_shared_client, container_name
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,24 +54,26 @@ class SecurityPolicy:
 class ContainerSecurityScanner:
     """Scans containers for security issues"""
     
-    def __init__(self):
-        self.docker_client = docker.from_env()
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None):
+        self.docker_api = docker_api or get_shared_client()
         self.scan_history = {}
         
     async def scan_container(self, container_id: str) -> ContainerScanResult:
         """Comprehensive container security scan"""
         try:
-            container = self.docker_client.containers.get(container_id)
+            attrs = await self.docker_api.inspect_container(container_id)
+            image_attrs = await self.docker_api.inspect_image(attrs['Image'])
             
             # Get container info
-            container_name = container.name
-            image = container.image.tags[0] if container.image.tags else container.image.id
-            image_id = container.image.id
+            name = container_name(attrs)
+            tags = image_attrs.get('RepoTags') or []
+            image = tags[0] if tags else attrs['Image']
+            image_id = attrs['Image']
             
             findings = []
             
             # 1. Check for privileged mode
-            if container.attrs['HostConfig'].get('Privileged', False):
+            if attrs['HostConfig'].get('Privileged', False):
                 findings.append({
                     'type': 'configuration',
                     'severity': 'critical',
@@ -80,7 +83,7 @@ class ContainerSecurityScanner:
                 })
             
             # 2. Check capabilities
-            cap_add = container.attrs['HostConfig'].get('CapAdd', [])
+            cap_add = attrs['HostConfig'].get('CapAdd', [])
             dangerous_caps = ['SYS_ADMIN', 'SYS_PTRACE', 'SYS_MODULE', 'NET_ADMIN']
             for cap in cap_add:
                 if cap in dangerous_caps:
@@ -93,7 +96,7 @@ class ContainerSecurityScanner:
                     })
             
             # 3. Check volume mounts
-            mounts = container.attrs.get('Mounts', [])
+            mounts = attrs.get('Mounts', [])
             dangerous_paths = ['/', '/etc', '/var/run/docker.sock', '/root', '/home']
             for mount in mounts:
                 source = mount.get('Source', '')
@@ -108,7 +111,7 @@ class ContainerSecurityScanner:
                         })
             
             # 4. Check for root user
-            user = container.attrs['Config'].get('User', '')
+            user = attrs['Config'].get('User', '')
             if not user or user == 'root' or user == '0':
                 findings.append({
                     'type': 'user',
@@ -119,7 +122,7 @@ class ContainerSecurityScanner:
                 })
             
             # 5. Check network mode
-            network_mode = container.attrs['HostConfig'].get('NetworkMode', '')
+            network_mode = attrs['HostConfig'].get('NetworkMode', '')
             if network_mode == 'host':
                 findings.append({
                     'type': 'network',
@@ -130,7 +133,7 @@ class ContainerSecurityScanner:
                 })
             
             # 6. Check PID mode
-            pid_mode = container.attrs['HostConfig'].get('PidMode', '')
+            pid_mode = attrs['HostConfig'].get('PidMode', '')
             if pid_mode == 'host':
                 findings.append({
                     'type': 'namespace',
@@ -141,7 +144,7 @@ class ContainerSecurityScanner:
                 })
             
             # 7. Check security options
-            security_opt = container.attrs['HostConfig'].get('SecurityOpt', [])
+            security_opt = attrs['HostConfig'].get('SecurityOpt', [])
             if not any('seccomp' in opt for opt in security_opt):
                 findings.append({
                     'type': 'seccomp',
@@ -152,7 +155,7 @@ class ContainerSecurityScanner:
                 })
             
             # 8. Check resource limits
-            if not container.attrs['HostConfig'].get('Memory'):
+            if not attrs['HostConfig'].get('Memory'):
                 findings.append({
                     'type': 'resources',
                     'severity': 'low',
@@ -173,7 +176,7 @@ class ContainerSecurityScanner:
             
             return ContainerScanResult(
                 container_id=container_id,
-                container_name=container_name,
+                container_name=name,
                 image=image,
                 image_id=image_id,
                 scan_type='comprehensive',
@@ -183,7 +186,7 @@ class ContainerSecurityScanner:
                 recommendations=recommendations
             )
             
-        except docker.errors.NotFound:
+        except DockerNotFound:
             logger.error(f"Container {container_id} not found")
             raise
         except Exception as e:
@@ -294,8 +297,8 @@ class ContainerSecurityScanner:
 class ContainerSecurityEnforcer:
     """Enforces container security policies"""
     
-    def __init__(self):
-        self.docker_client = docker.from_env()
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None):
+        self.docker_api = docker_api or get_shared_client()
         self.policies = {}
         self.quarantine_network = None
         
@@ -408,7 +411,7 @@ class ContainerSecurityEnforcer:
                             violation: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Take enforcement action based on policy"""
         try:
-            container = self.docker_client.containers.get(container_id)
+            attrs = await self.docker_api.inspect_container(container_id)
             
             if enforcement_mode == 'warn':
                 # Just log warning
@@ -420,7 +423,7 @@ class ContainerSecurityEnforcer:
             
             elif enforcement_mode == 'block':
                 # Stop container
-                container.stop()
+                await self.docker_api.stop_container(container_id)
                 logger.info(f"Stopped container {container_id} due to policy violation")
                 return {
                     'action': 'stop',
@@ -429,7 +432,7 @@ class ContainerSecurityEnforcer:
             
             elif enforcement_mode == 'quarantine':
                 # Move to quarantine network
-                await self._quarantine_container(container)
+                await self._quarantine_container(container_id, attrs)
                 logger.info(f"Quarantined container {container_id}")
                 return {
                     'action': 'quarantine',
@@ -441,39 +444,39 @@ class ContainerSecurityEnforcer:
         
         return None
     
-    async def _quarantine_container(self, container):
+    async def _quarantine_container(self, container_id: str, attrs: Dict[str, Any]):
         """Move container to quarantine network"""
         # Create quarantine network if it doesn't exist
         if not self.quarantine_network:
             try:
-                self.quarantine_network = self.docker_client.networks.get('quarantine')
-            except docker.errors.NotFound:
-                self.quarantine_network = self.docker_client.networks.create(
+                await self.docker_api.inspect_network('quarantine')
+            except DockerNotFound:
+                await self.docker_api.create_network(
                     'quarantine',
                     driver='bridge',
                     internal=True,  # No external access
                     labels={'security': 'quarantine'}
                 )
+            self.quarantine_network = 'quarantine'
         
         # Disconnect from all networks
-        for network in container.attrs['NetworkSettings']['Networks']:
+        for network in attrs['NetworkSettings']['Networks']:
             try:
-                network_obj = self.docker_client.networks.get(network)
-                network_obj.disconnect(container)
+                await self.docker_api.disconnect_network(network, container_id)
             except:
                 pass
         
         # Connect to quarantine network
-        self.quarantine_network.connect(container)
+        await self.docker_api.connect_network(self.quarantine_network, container_id)
 
 
 class ContainerSecurityMonitor:
     """Continuous container security monitoring"""
     
-    def __init__(self):
-        self.docker_client = docker.from_env()
-        self.scanner = ContainerSecurityScanner()
-        self.enforcer = ContainerSecurityEnforcer()
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None):
+        self.docker_api = docker_api or get_shared_client()
+        self.scanner = ContainerSecurityScanner(self.docker_api)
+        self.enforcer = ContainerSecurityEnforcer(self.docker_api)
         self.scan_interval = 300  # 5 minutes
         self.results_dir = Path("/var/log/security/container-scans")
         self.results_dir.mkdir(parents=True, exist_ok=True)
@@ -485,7 +488,7 @@ class ContainerSecurityMonitor:
         while True:
             try:
                 # Get all running containers
-                containers = self.docker_client.containers.list()
+                containers = await self.docker_api.list_containers()
                 
                 logger.info(f"Scanning {len(containers)} running containers")
                 
@@ -497,7 +500,7 @@ class ContainerSecurityMonitor:
                             continue
                         
                         # Scan container
-                        scan_result = await self.scanner.scan_container(container.id)
+                        scan_result = await self.scanner.scan_container(container['Id'])
                         
                         # Save scan result
                         await self._save_scan_result(scan_result)
@@ -505,7 +508,7 @@ class ContainerSecurityMonitor:
                         # Enforce policies
                         if self.enforcer.policies:
                             enforcement_result = await self.enforcer.enforce_policies(
-                                container.id,
+                                container['Id'],
                                 scan_result
                             )
                             
@@ -517,7 +520,7 @@ class ContainerSecurityMonitor:
                             await self._alert_high_risk_container(scan_result)
                         
                     except Exception as e:
-                        logger.error(f"Error scanning container {container.id}: {str(e)}")
+                        logger.error(f"Error scanning container {container['Id']}: {str(e)}")
                 
                 # Monitor for new containers
                 await self._monitor_container_events()
@@ -531,7 +534,7 @@ class ContainerSecurityMonitor:
     def _is_system_container(self, container) -> bool:
         """Check if container is a system container"""
         system_prefixes = ['k8s_', 'kube-', 'calico-', 'weave-']
-        return any(container.name.startswith(prefix) for prefix in system_prefixes)
+        return any(container_name(container).startswith(prefix) for prefix in system_prefixes)
     
     async def _save_scan_result(self, scan_result: ContainerScanResult):
         """Save scan result to file"""
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Docker API Benchmark
+Compares the pooled shared Docker client against per-request connections
+on container-heavy workloads, using the local fake Docker API server
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from docker_api_client import AsyncDockerClient
+from fake_docker_api import FakeDockerAPIServer
+
+
+async def scan_cycle(client_factory, concurrency: int):
+    """List containers, then inspect every container and its image"""
+    client = client_factory()
+    containers = await client.list_containers()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def inspect(summary):
+        async with semaphore:
+            c = client_factory()
+            attrs = await c.inspect_container(summary['Id'])
+            await c.inspect_image(attrs['Config']['Image'])
+            # Security tools commonly re-read the same container within a cycle
+            await c.inspect_container(summary['Id'])
+    
+    await asyncio.gather(*(inspect(summary) for summary in containers))
+    return len(containers)
+
+
+async def run_workload(name: str, server: FakeDockerAPIServer, client_factory,
+                       cycles: int, concurrency: int):
+    """Run scan cycles and report throughput and latency"""
+    server.request_count = 0
+    server.connection_count = 0
+    durations = []
+    
+    start = time.perf_counter()
+    for _ in range(cycles):
+        cycle_start = time.perf_counter()
+        await scan_cycle(client_factory, concurrency)
+        durations.append(time.perf_counter() - cycle_start)
+    elapsed = time.perf_counter() - start
+    
+    durations.sort()
+    p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    print(f"\n   {name}")
+    print(f"     Cycles/s:          {cycles / elapsed:.1f}")
+    print(f"     Cycle p50 / p99:   {statistics.median(durations) * 1000:.1f} ms / {p99 * 1000:.1f} ms")
+    print(f"     Server requests:   {server.request_count}")
+    print(f"     Server connections:{server.connection_count:>6}")
+
+
+async def benchmark(containers: int, cycles: int, concurrency: int, latency: float):
+    """Run pooled and unpooled workloads against the fake server"""
+    socket_path = str(Path(tempfile.mkdtemp()) / 'docker.sock')
+    print(f"🐳 Docker API benchmark: {containers} containers, {cycles} cycles, "
+          f"concurrency {concurrency}, server latency {latency * 1000:.1f} ms")
+    
+    async with FakeDockerAPIServer(socket_path, latency=latency) as server:
+        for i in range(containers):
+            server.add_container(f"bench-{i}", image=f"bench/image-{i % 20}:latest")
+        
+        # Baseline: a fresh connection per request and no inspect cache
+        await run_workload(
+            'Per-request connections',
+            server,
+            lambda: AsyncDockerClient(socket_path, inspect_cache_ttl=0),
+            cycles, concurrency
+        )
+        
+        shared = AsyncDockerClient(socket_path, max_connections=concurrency)
+        await run_workload('Shared pooled client', server, lambda: shared, cycles, concurrency)
+        
+        metrics = shared.get_metrics()
+        print(f"     Connections reused: {metrics['connections_reused']}, "
+              f"cache hits: {metrics['cache_hits']}, misses: {metrics['cache_misses']}")
+        await shared.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Docker API Benchmark')
+    parser.add_argument('--containers', type=int, default=500, help='Number of fake containers')
+    parser.add_argument('--cycles', type=int, default=20, help='Scan cycles per workload')
+    parser.add_argument('--concurrency', type=int, default=10, help='Concurrent requests')
+    parser.add_argument('--latency', type=float, default=0.0005,
+                        help='Fake server latency per request in seconds')
+    
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.containers, args.cycles, args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
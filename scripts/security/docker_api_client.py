@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Shared Async Docker API Client
+Pooled keep-alive HTTP client for the Docker Engine API over its unix socket
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
+from urllib.parse import urlencode, quote
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+
+
+class DockerAPIError(Exception):
+    """Error returned by the Docker API"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class DockerNotFound(DockerAPIError):
+    """Requested Docker object does not exist"""
+
+
+class _Connection:
+    """Single HTTP/1.1 connection to the Docker socket"""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+    
+    def close(self):
+        self.reusable = False
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncDockerClient:
+    """Async Docker API client with connection pooling and an inspect cache
+    
+    Connections are kept alive and reused between requests, the number of
+    concurrent requests is bounded by a semaphore, and container/image
+    inspect results are cached for a short TTL. Per-endpoint request timings
+    are recorded and available through get_metrics().
+    """
+    
+    # Path segments that identify objects, collapsed for metric labels
+    _ID_PATTERN = re.compile(r'^/(containers|images|networks|volumes)/(?!json$|create$|prune$)[^/]+')
+    
+    def __init__(self, socket_path: Optional[str] = None, max_connections: int = 10,
+                 timeout: float = 30.0, inspect_cache_ttl: float = 2.0,
+                 api_version: Optional[str] = None):
+        self.socket_path = socket_path or self._socket_from_env()
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.inspect_cache_ttl = inspect_cache_ttl
+        self.api_version = api_version
+        
+        self._idle: List[_Connection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._inspect_cache: Dict[str, Tuple[float, Any]] = {}
+        
+        self.stats = {
+            'connections_created': 0,
+            'connections_reused': 0,
+            'cache_hits': 0,
+            'cache_misses': 0
+        }
+        self.endpoint_metrics = defaultdict(
+            lambda: {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+        )
+    
+    @staticmethod
+    def _socket_from_env() -> str:
+        """Resolve the socket path from DOCKER_HOST"""
+        docker_host = os.environ.get('DOCKER_HOST', '')
+        if docker_host.startswith('unix://'):
+            return docker_host[len('unix://'):]
+        return DEFAULT_SOCKET
+    
+    def _bind_loop(self):
+        """Reset loop-bound state when used from a new event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+    
+    async def _acquire(self) -> Tuple[_Connection, bool]:
+        """Get an idle connection or open a new one"""
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.writer.is_closing() and not conn.reader.at_eof():
+                self.stats['connections_reused'] += 1
+                return conn, True
+            conn.close()
+        
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        self.stats['connections_created'] += 1
+        return _Connection(reader, writer), False
+    
+    def _release(self, conn: _Connection):
+        """Return a connection to the pool"""
+        if conn.reusable and len(self._idle) < self.max_connections:
+            self._idle.append(conn)
+        else:
+            conn.close()
+    
+    async def close(self):
+        """Close all pooled connections"""
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+    
+    def _build_path(self, path: str, params: Optional[Dict[str, Any]]) -> str:
+        if self.api_version:
+            path = f"/{self.api_version}{path}"
+        if params:
+            query = {k: v for k, v in params.items() if v is not None}
+            if query:
+                path += '?' + urlencode(query)
+        return path
+    
+    @staticmethod
+    async def _send(conn: _Connection, method: str, path: str, body: Optional[bytes]):
+        """Write an HTTP request"""
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            "Host: docker",
+            "Connection: keep-alive"
+        ]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+            headers.append(f"Content-Length: {len(body)}")
+        
+        conn.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + (body or b''))
+        await conn.writer.drain()
+    
+    @staticmethod
+    async def _read_head(conn: _Connection) -> Tuple[int, Dict[str, str]]:
+        """Read the status line and headers of a response"""
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Docker API closed the connection")
+        
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        if headers.get('connection', '').lower() == 'close':
+            conn.reusable = False
+        
+        return status, headers
+    
+    @staticmethod
+    async def _iter_body(conn: _Connection, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        """Yield the response body as it arrives"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await conn.reader.readline()
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await conn.reader.readline()
+                    return
+                chunk = await conn.reader.readexactly(size)
+                await conn.reader.readexactly(2)
+                yield chunk
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length:
+                yield await conn.reader.readexactly(length)
+        else:
+            conn.reusable = False
+            data = await conn.reader.read()
+            if data:
+                yield data
+    
+    async def _roundtrip(self, conn: _Connection, method: str, path: str,
+                         body: Optional[bytes]) -> Tuple[int, bytes]:
+        await self._send(conn, method, path, body)
+        status, headers = await self._read_head(conn)
+        if status in (204, 304):
+            return status, b''
+        chunks = [chunk async for chunk in self._iter_body(conn, headers)]
+        return status, b''.join(chunks)
+    
+    def _endpoint_label(self, method: str, path: str) -> str:
+        return f"{method} {self._ID_PATTERN.sub(lambda m: f'/{m.group(1)}/{{id}}', path)}"
+    
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                      body: Optional[Any] = None) -> Tuple[int, bytes]:
+        """Perform a request on a pooled connection"""
+        self._bind_loop()
+        full_path = self._build_path(path, params)
+        payload = json.dumps(body).encode() if body is not None else None
+        metrics = self.endpoint_metrics[self._endpoint_label(method, path)]
+        
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                for attempt in range(2):
+                    conn, reused = await self._acquire()
+                    try:
+                        result = await asyncio.wait_for(
+                            self._roundtrip(conn, method, full_path, payload),
+                            timeout=self.timeout
+                        )
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        conn.close()
+                        # A reused keep-alive connection may have been closed by the daemon
+                        if reused and attempt == 0:
+                            continue
+                        raise
+                    except BaseException:
+                        conn.close()
+                        raise
+                    
+                    self._release(conn)
+                    return result
+            except BaseException:
+                metrics['errors'] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics['count'] += 1
+                metrics['total_seconds'] += elapsed
+                metrics['max_seconds'] = max(metrics['max_seconds'], elapsed)
+    
+    async def _json(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                    body: Optional[Any] = None) -> Any:
+        """Perform a request and decode the JSON response"""
+        status, data = await self.request(method, path, params, body)
+        
+        if status >= 400:
+            try:
+                message = json.loads(data).get('message', data.decode())
+            except (ValueError, AttributeError):
+                message = data.decode(errors='replace')
+            if status == 404:
+                raise DockerNotFound(status, message)
+            raise DockerAPIError(status, message)
+        
+        return json.loads(data) if data else None
+    
+    async def _inspect(self, path: str) -> Dict[str, Any]:
+        """Inspect an object, serving repeated lookups from the TTL cache"""
+        now = time.monotonic()
+        cached = self._inspect_cache.get(path)
+        if cached is not None and cached[0] > now:
+            self.stats['cache_hits'] += 1
+            return cached[1]
+        
+        self.stats['cache_misses'] += 1
+        data = await self._json('GET', path)
+        if self.inspect_cache_ttl > 0:
+            self._inspect_cache[path] = (now + self.inspect_cache_ttl, data)
+            if len(self._inspect_cache) > 4096:
+                self._inspect_cache = {
+                    key: value for key, value in self._inspect_cache.items() if value[0] > now
+                }
+        return data
+    
+    def invalidate(self, container_id: Optional[str] = None):
+        """Drop cached container inspect results after a state change
+        
+        Containers may be cached under both their ID and name, so all
+        container entries are dropped; image entries are kept.
+        """
+        self._inspect_cache = {
+            path: entry for path, entry in self._inspect_cache.items()
+            if not path.startswith('/containers/')
+        }
+    
+    # Containers
+    
+    async def list_containers(self, all: bool = False,
+                              filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        """List containers"""
+        params = {'all': 'true' if all else None,
+                  'filters': json.dumps(filters) if filters else None}
+        return await self._json('GET', '/containers/json', params)
+    
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        """Inspect a container"""
+        return await self._inspect(f"/containers/{quote(container_id, safe='')}/json")
+    
+    async def pause_container(self, container_id: str):
+        """Pause a container"""
+        self.invalidate(container_id)
+        await self._json('POST', f"/containers/{quote(container_id, safe='')}/pause")
+    
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        """Stop a container"""
+        self.invalidate(container_id)
+        await self._json('POST', f"/containers/{quote(container_id, safe='')}/stop", {'t': timeout})
+    
+    async def remove_container(self, container_id: str, force: bool = False):
+        """Remove a container"""
+        self.invalidate(container_id)
+        await self._json('DELETE', f"/containers/{quote(container_id, safe='')}",
+                         {'force': 'true' if force else None})
+    
+    # Images
+    
+    async def inspect_image(self, image: str) -> Dict[str, Any]:
+        """Inspect an image"""
+        return await self._inspect(f"/images/{quote(image, safe='')}/json")
+    
+    # Networks
+    
+    async def inspect_network(self, network: str) -> Dict[str, Any]:
+        """Inspect a network"""
+        return await self._json('GET', f"/networks/{quote(network, safe='')}")
+    
+    async def create_network(self, name: str, driver: str = 'bridge', internal: bool = False,
+                             labels: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Create a network"""
+        return await self._json('POST', '/networks/create', body={
+            'Name': name,
+            'Driver': driver,
+            'Internal': internal,
+            'Labels': labels or {}
+        })
+    
+    async def connect_network(self, network: str, container_id: str):
+        """Connect a container to a network"""
+        self.invalidate(container_id)
+        await self._json('POST', f"/networks/{quote(network, safe='')}/connect",
+                         body={'Container': container_id})
+    
+    async def disconnect_network(self, network: str, container_id: str, force: bool = False):
+        """Disconnect a container from a network"""
+        self.invalidate(container_id)
+        await self._json('POST', f"/networks/{quote(network, safe='')}/disconnect",
+                         body={'Container': container_id, 'Force': force})
+    
+    # Events
+    
+    async def events(self, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream Docker events on a dedicated connection"""
+        self._bind_loop()
+        path = self._build_path('/events', {'filters': json.dumps(filters) if filters else None})
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        conn = _Connection(reader, writer)
+        
+        try:
+            await self._send(conn, 'GET', path, None)
+            status, headers = await self._read_head(conn)
+            if status >= 400:
+                raise DockerAPIError(status, 'event stream rejected')
+            
+            buffer = b''
+            async for chunk in self._iter_body(conn, headers):
+                buffer += chunk
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    if line.strip():
+                        yield json.loads(line)
+        finally:
+            conn.close()
+    
+    # Metrics
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return pool, cache and per-endpoint timing metrics"""
+        endpoints = {}
+        for endpoint, m in self.endpoint_metrics.items():
+            endpoints[endpoint] = dict(m)
+            endpoints[endpoint]['avg_seconds'] = m['total_seconds'] / m['count'] if m['count'] else 0.0
+        
+        return {
+            **self.stats,
+            'idle_connections': len(self._idle),
+            'endpoints': endpoints
+        }
+
+
+def container_name(container: Dict[str, Any]) -> str:
+    """Container name from list or inspect output, without the leading slash"""
+    if 'Name' in container:
+        return container['Name'].lstrip('/')
+    names = container.get('Names') or ['']
+    return names[0].lstrip('/')
+
+
+def container_image(container: Dict[str, Any]) -> str:
+    """Image reference from list or inspect output"""
+    if 'Config' in container:
+        return container['Config'].get('Image') or container.get('Image', '')
+    return container.get('Image', '')
+
+
+_shared_client: Optional[AsyncDockerClient] = None
+
+
+def get_shared_client(**kwargs) -> AsyncDockerClient:
+    """Return the process-wide Docker client, creating it on first use"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncDockerClient(**kwargs)
+    return _shared_client
@@ -14,9 +14,9 @@ from pathlib import Path
 from collections import defaultdict
 from typing import Dict, List, Optional
 import aiofiles
-import docker
 import pyinotify
 
+from docker_api_client import AsyncDockerClient, DockerNotFound, get_shared_client
 from playbook_executor import PlaybookExecutor, SecurityEvent
 
 # Setup logging
@@ -131,23 +131,17 @@ class SSHMonitor(EventDetector):
 class DockerMonitor(EventDetector):
     """Monitor Docker events"""
     
-    def __init__(self):
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None):
         super().__init__()
-        self.client = docker.from_env()
+        self.client = docker_api or get_shared_client()
         self.dangerous_images = ['alpine', 'busybox']  # Example
         self.dangerous_mounts = ['/', '/etc', '/root', '/var/run/docker.sock']
     
     async def monitor(self, callback):
         """Monitor Docker events"""
-        # Monitor events in a separate thread
-        loop = asyncio.get_event_loop()
-        
-        def event_generator():
-            for event in self.client.events(decode=True):
-                loop.create_task(self._process_event(event, callback))
-        
-        # Run in executor to avoid blocking
-        await loop.run_in_executor(None, event_generator)
+        # Stream events on a dedicated connection and process each concurrently
+        async for event in self.client.events(filters={'type': ['container']}):
+            asyncio.create_task(self._process_event(event, callback))
     
     async def _process_event(self, event: Dict, callback):
         """Process Docker event"""
@@ -161,10 +155,10 @@ class DockerMonitor(EventDetector):
             image = attributes.get('image', '')
             
             try:
-                container = self.client.containers.get(container_id)
+                container = await self.client.inspect_container(container_id)
                 
                 # Check for privileged container
-                if container.attrs['HostConfig'].get('Privileged'):
+                if container['HostConfig'].get('Privileged'):
                     await callback(SecurityEvent(
                         event_type='container_compromise',
                         container_id=container_id,
@@ -175,7 +169,7 @@ class DockerMonitor(EventDetector):
                     ))
                 
                 # Check for dangerous mounts
-                mounts = container.attrs['Mounts']
+                mounts = container['Mounts']
                 for mount in mounts:
                     source = mount.get('Source', '')
                     if any(source.startswith(dangerous) for dangerous in self.dangerous_mounts):
@@ -189,7 +183,7 @@ class DockerMonitor(EventDetector):
                             }
                         ))
                 
-            except docker.errors.NotFound:
+            except DockerNotFound:
                 pass
 
 
@@ -399,13 +393,14 @@ class SecurityEventMonitor:
         # Log event
         await self._log_event(event)
         
-        # Find matching playbook
-        playbook = self.executor.match_event_to_playbook(event)
+        # Find matching playbooks
+        playbooks = self.executor.match_event_to_playbooks(event)
         
-        if playbook:
+        for playbook in playbooks:
             logger.info(f"Triggering playbook: {playbook}")
             await self.executor.execute_playbook(playbook, event)
-        else:
+        
+        if not playbooks:
             logger.warning(f"No playbook found for event type: {event.event_type}")
     
     async def _log_event(self, event: SecurityEvent):
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Fake Docker API Server
+Local Docker Engine API stand-in on a unix socket for tests and benchmarks
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+logger = logging.getLogger(__name__)
+
+
+class FakeDockerAPIServer:
+    """In-memory Docker API serving containers, images, networks and events
+    
+    Implements the subset of the Engine API used by the security tools, with
+    HTTP/1.1 keep-alive and an optional per-request latency so pooled and
+    unpooled clients can be compared.
+    """
+    
+    def __init__(self, socket_path: str, latency: float = 0.0):
+        self.socket_path = socket_path
+        self.latency = latency
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.images: Dict[str, Dict[str, Any]] = {}
+        self.networks: Dict[str, Dict[str, Any]] = {
+            'bridge': {'Name': 'bridge', 'Id': self._make_id('bridge'), 'Containers': {}}
+        }
+        self.request_count = 0
+        self.connection_count = 0
+        self._server = None
+        self._writers = set()
+        self._event_queues: List[asyncio.Queue] = []
+    
+    @staticmethod
+    def _make_id(seed: str) -> str:
+        return hashlib.sha256(seed.encode()).hexdigest()
+    
+    def add_container(self, name: str, image: str = 'nginx:latest', privileged: bool = False,
+                      user: str = '', mounts: Optional[List[str]] = None,
+                      cap_add: Optional[List[str]] = None, network_mode: str = 'bridge') -> str:
+        """Register a running container and its image"""
+        container_id = self._make_id(f"container:{name}")
+        image_id = 'sha256:' + self._make_id(f"image:{image}")
+        
+        self.images.setdefault(image, {'Id': image_id, 'RepoTags': [image]})
+        self.containers[container_id] = {
+            'Id': container_id,
+            'Name': f"/{name}",
+            'Image': image_id,
+            'State': {'Status': 'running', 'Running': True, 'Paused': False},
+            'Config': {'Image': image, 'User': user},
+            'HostConfig': {
+                'Privileged': privileged,
+                'CapAdd': cap_add or [],
+                'NetworkMode': network_mode,
+                'PidMode': '',
+                'SecurityOpt': [],
+                'Memory': 0
+            },
+            'Mounts': [{'Source': source, 'Destination': source} for source in mounts or []],
+            'NetworkSettings': {'Networks': {'bridge': {}}}
+        }
+        self.networks['bridge']['Containers'][container_id] = {}
+        return container_id
+    
+    def emit_event(self, event: Dict[str, Any]):
+        """Publish an event to connected /events streams"""
+        for queue in self._event_queues:
+            queue.put_nowait(event)
+    
+    async def start(self):
+        Path(self.socket_path).unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            await asyncio.sleep(0)
+            self._server = None
+        Path(self.socket_path).unlink(missing_ok=True)
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.stop()
+    
+    def _find_container(self, ref: str) -> Optional[Dict[str, Any]]:
+        if ref in self.containers:
+            return self.containers[ref]
+        for container in self.containers.values():
+            if container['Name'] == f"/{ref}" or container['Id'].startswith(ref):
+                return container
+        return None
+    
+    def _find_image(self, ref: str) -> Optional[Dict[str, Any]]:
+        if ref in self.images:
+            return self.images[ref]
+        for image in self.images.values():
+            if image['Id'] == ref or image['Id'].split(':')[-1].startswith(ref):
+                return image
+        return None
+    
+    def _summary(self, container: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'Id': container['Id'],
+            'Names': [container['Name']],
+            'Image': container['Config']['Image'],
+            'ImageID': container['Image'],
+            'State': container['State']['Status']
+        }
+    
+    async def _route(self, method: str, path: str, query: Dict[str, List[str]],
+                     body: Any) -> Tuple[int, Any]:
+        """Dispatch a request; returns (status, json body)"""
+        path = re.sub(r'^/v[0-9.]+', '', path)
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+        
+        if parts == ['_ping']:
+            return 200, 'OK'
+        
+        if parts == ['containers', 'json']:
+            show_all = query.get('all', ['false'])[0] in ('1', 'true')
+            return 200, [self._summary(c) for c in self.containers.values()
+                         if show_all or c['State']['Running']]
+        
+        if parts[0] == 'containers' and len(parts) >= 2:
+            container = self._find_container(parts[1])
+            if container is None:
+                return 404, {'message': f"No such container: {parts[1]}"}
+            
+            if len(parts) == 2 and method == 'DELETE':
+                del self.containers[container['Id']]
+                return 204, None
+            if parts[2:] == ['json']:
+                return 200, container
+            if parts[2:] == ['pause']:
+                container['State'].update(Status='paused', Paused=True)
+                return 204, None
+            if parts[2:] == ['stop']:
+                container['State'].update(Status='exited', Running=False)
+                return 204, None
+        
+        if parts[0] == 'images' and len(parts) >= 3 and parts[-1] == 'json':
+            image = self._find_image('/'.join(parts[1:-1]))
+            if image is None:
+                return 404, {'message': f"No such image: {'/'.join(parts[1:-1])}"}
+            return 200, image
+        
+        if parts == ['networks', 'create'] and method == 'POST':
+            name = body['Name']
+            self.networks[name] = {'Name': name, 'Id': self._make_id(name), 'Containers': {},
+                                   'Internal': body.get('Internal', False)}
+            return 201, {'Id': self.networks[name]['Id']}
+        
+        if parts[0] == 'networks' and len(parts) >= 2:
+            network = self.networks.get(parts[1])
+            if network is None:
+                return 404, {'message': f"network {parts[1]} not found"}
+            if len(parts) == 2:
+                return 200, network
+            
+            container = self._find_container(body.get('Container', ''))
+            if container is None:
+                return 404, {'message': 'No such container'}
+            networks = container['NetworkSettings']['Networks']
+            if parts[2] == 'connect':
+                networks[network['Name']] = {}
+                network['Containers'][container['Id']] = {}
+                return 200, None
+            if parts[2] == 'disconnect':
+                networks.pop(network['Name'], None)
+                network['Containers'].pop(container['Id'], None)
+                return 200, None
+        
+        return 404, {'message': f"page not found: {method} {path}"}
+    
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        """Serve a chunked /events stream until the client disconnects"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._event_queues.append(queue)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        try:
+            while True:
+                data = json.dumps(await queue.get()).encode() + b'\n'
+                writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._event_queues.remove(queue)
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connection_count += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                
+                method, target, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                raw_body = b''
+                if 'content-length' in headers:
+                    raw_body = await reader.readexactly(int(headers['content-length']))
+                body = json.loads(raw_body) if raw_body else {}
+                
+                self.request_count += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                
+                url = urlsplit(target)
+                if re.sub(r'^/v[0-9.]+', '', url.path) == '/events':
+                    await self._stream_events(writer)
+                    break
+                
+                status, payload = await self._route(method, url.path, parse_qs(url.query), body)
+                data = b'' if payload is None else json.dumps(payload).encode()
+                reason = {200: 'OK', 201: 'Created', 204: 'No Content', 404: 'Not Found'}.get(status, 'Error')
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def serve(socket_path: str, containers: int, latency: float):
+    """Run the fake server until interrupted"""
+    server = FakeDockerAPIServer(socket_path, latency=latency)
+    for i in range(containers):
+        server.add_container(f"fake-{i}", image=f"fake/image-{i % 10}:latest",
+                             privileged=(i % 17 == 0))
+    
+    await server.start()
+    logger.info(f"Fake Docker API listening on {socket_path} with {containers} containers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Fake Docker API Server')
+    parser.add_argument('--socket', default='/tmp/fake-docker.sock', help='Unix socket path')
+    parser.add_argument('--containers', type=int, default=50, help='Number of fake containers')
+    parser.add_argument('--latency', type=float, default=0.0, help='Per-request latency in seconds')
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    try:
+        asyncio.run(serve(args.socket, args.containers, args.latency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Playbook Benchmark
+Measures event-to-playbook matching performance with large rule sets and
+playbook execution throughput against simulated action backends
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from playbook_executor import PlaybookExecutor, PlaybookMatcher, SecurityEvent, SimulationConfig
+
+DEFAULT_PLAYBOOKS = Path(__file__).resolve().parent / "incident-response-playbooks.yaml"
+
+# Event types produced by the monitors, with the fields they populate
+SYNTHETIC_EVENT_TYPES = [
+    'brute_force', 'port_scan', 'malware', 'privilege_escalation',
+    'data_exfiltration', 'container_compromise', 'suspicious_process',
+    'unauthorized_access'
+]
+
+
+def build_rule_set(rule_count: int, event_types: int, seed: int = 42) -> PlaybookMatcher:
+    """Build a matcher with a synthetic mix of rules"""
+    rng = random.Random(seed)
+    matcher = PlaybookMatcher()
+    
+    for i in range(rule_count):
+        condition = {'event_type': f"event_{i % event_types}"}
+        kind = i % 4
+        
+        if kind == 1:
+            # Rule scoped to a /24 network
+            condition['source_ip'] = f"10.{(i >> 8) & 255}.{i & 255}.0/24"
+        elif kind == 2:
+            condition['details'] = {'service': f"^svc{rng.randint(0, 20)}$"}
+        elif kind == 3:
+            condition['user'] = [f"user{rng.randint(0, 50)}"]
+        
+        matcher.add_rule(f"playbook_{i}", condition)
+    
+    return matcher
+
+
+def build_events(count: int, event_types: int, seed: int = 7) -> List[SecurityEvent]:
+    """Build synthetic security events"""
+    rng = random.Random(seed)
+    events = []
+    
+    for _ in range(count):
+        events.append(SecurityEvent(
+            event_type=f"event_{rng.randrange(event_types)}",
+            source_ip=f"10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            user=f"user{rng.randint(0, 50)}",
+            details={'service': f"svc{rng.randint(0, 20)}"}
+        ))
+    
+    return events
+
+
+def linear_match(matcher: PlaybookMatcher, event: SecurityEvent) -> List[str]:
+    """Reference matcher evaluating every rule, used as the baseline"""
+    address = ipaddress.ip_address(event.source_ip) if event.source_ip else None
+    playbooks = []
+    
+    for rule in matcher.rules:
+        if rule.event_types and event.event_type not in rule.event_types:
+            continue
+        if rule.networks and (address is None or
+                              not any(address in network for network in rule.networks)):
+            continue
+        if rule.matches_attributes(event) and rule.playbook not in playbooks:
+            playbooks.append(rule.playbook)
+    
+    return playbooks
+
+
+def benchmark_matcher(rule_count: int, event_types: int, event_count: int):
+    """Compare indexed matching against a linear scan"""
+    print(f"\n🔎 Matcher benchmark: {rule_count} rules, {event_types} event types, "
+          f"{event_count} events")
+    
+    start = time.perf_counter()
+    matcher = build_rule_set(rule_count, event_types)
+    build_time = time.perf_counter() - start
+    events = build_events(event_count, event_types)
+    
+    start = time.perf_counter()
+    indexed = [matcher.match(event) for event in events]
+    indexed_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    linear = [linear_match(matcher, event) for event in events]
+    linear_time = time.perf_counter() - start
+    
+    mismatches = sum(1 for a, b in zip(indexed, linear) if a != b)
+    matched = sum(len(m) for m in indexed)
+    
+    print(f"   Index build:      {build_time * 1000:.1f} ms")
+    print(f"   Indexed matching: {indexed_time / event_count * 1e6:.1f} µs/event "
+          f"({event_count / indexed_time:,.0f} events/s)")
+    print(f"   Linear matching:  {linear_time / event_count * 1e6:.1f} µs/event "
+          f"({event_count / linear_time:,.0f} events/s)")
+    print(f"   Speedup:          {linear_time / indexed_time:.1f}x")
+    print(f"   Playbooks matched: {matched}, mismatches vs linear: {mismatches}")
+    
+    return mismatches == 0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def build_incident_events(count: int, distinct_sources: int, seed: int = 11) -> List[SecurityEvent]:
+    """Build synthetic events resembling monitor output"""
+    rng = random.Random(seed)
+    events = []
+    
+    for _ in range(count):
+        event_type = rng.choice(SYNTHETIC_EVENT_TYPES)
+        source = rng.randrange(distinct_sources)
+        events.append(SecurityEvent(
+            event_type=event_type,
+            source_ip=f"203.0.{source >> 8 & 255}.{source & 255}",
+            user=f"user{rng.randrange(20)}",
+            process_name='xmrig' if event_type in ('malware', 'suspicious_process') else None,
+            container_id=f"container-{source}" if event_type == 'container_compromise' else None,
+            details={'service': 'ssh', 'command': '/tmp/xmrig --donate-level 0'}
+        ))
+    
+    return events
+
+
+async def benchmark_throughput(playbook_file: str, event_count: int, concurrency: int,
+                               distinct_sources: int, latency_scale: float,
+                               failure_rate: float):
+    """Push synthetic events through matching and simulated execution"""
+    print(f"\n⚙️  Throughput benchmark: {event_count} events, concurrency {concurrency}, "
+          f"{distinct_sources} distinct sources")
+    
+    config = SimulationConfig(default_failure_rate=failure_rate, seed=1)
+    config.latency = {k: v * latency_scale for k, v in config.latency.items()}
+    config.default_latency *= latency_scale
+    
+    executor = PlaybookExecutor(playbook_file, simulation=config)
+    events = build_incident_events(event_count, distinct_sources)
+    semaphore = asyncio.Semaphore(concurrency)
+    end_to_end: List[float] = []
+    
+    async def handle(event: SecurityEvent):
+        async with semaphore:
+            start = time.perf_counter()
+            playbooks = executor.match_event_to_playbooks(event)
+            await asyncio.gather(*(executor.execute_playbook(p, event) for p in playbooks))
+            end_to_end.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(event) for event in events))
+    elapsed = time.perf_counter() - start
+    
+    stats = executor.get_single_flight_stats()
+    executed = sum(s['executed'] for s in stats.values())
+    absorbed = sum(s['attached'] + s['cooldown'] for s in stats.values())
+    failed = sum(1 for record in executor.execution_history if not record['success'])
+    
+    print(f"   Events/s:          {event_count / elapsed:,.0f}")
+    print(f"   Executions/s:      {executed / elapsed:,.0f} ({executed} executions, "
+          f"{absorbed} absorbed, {failed} with failed actions)")
+    print(f"   End-to-end p50/p99/p99.9: {percentile(end_to_end, 50) * 1000:.1f} / "
+          f"{percentile(end_to_end, 99) * 1000:.1f} / {percentile(end_to_end, 99.9) * 1000:.1f} ms")
+    print("   Per-action latency (ms):")
+    print(f"     {'type':<14}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    
+    latencies: Dict[str, List[float]] = executor.action_executor.latencies_by_type()
+    for action_type, values in sorted(latencies.items()):
+        print(f"     {action_type:<14}{len(values):>8}"
+              f"{percentile(values, 50) * 1000:>9.2f}{percentile(values, 90) * 1000:>9.2f}"
+              f"{percentile(values, 99) * 1000:>9.2f}{max(values) * 1000:>9.2f}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Playbook Benchmark')
+    parser.add_argument('mode', nargs='?', choices=['matcher', 'throughput', 'all'], default='all',
+                        help='Benchmark to run')
+    parser.add_argument('--rules', type=int, default=1000, help='Number of match rules')
+    parser.add_argument('--event-types', type=int, default=100, help='Distinct event types')
+    parser.add_argument('--events', type=int, default=20000, help='Number of synthetic events')
+    parser.add_argument('--playbooks', default=str(DEFAULT_PLAYBOOKS), help='Playbook file')
+    parser.add_argument('--concurrency', type=int, default=200, help='Events processed concurrently')
+    parser.add_argument('--sources', type=int, default=5000, help='Distinct event source IPs')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiplier for simulated action latencies')
+    parser.add_argument('--failure-rate', type=float, default=0.01,
+                        help='Injected failure probability per action')
+    
+    args = parser.parse_args()
+    
+    # Per-action and injected-failure logging would dominate the measurements
+    logging.getLogger('playbook_executor').setLevel(logging.ERROR)
+    
+    if args.mode in ('matcher', 'all'):
+        if not benchmark_matcher(args.rules, args.event_types, args.events):
+            print("❌ Indexed matcher disagrees with linear baseline")
+            raise SystemExit(1)
+    
+    if args.mode in ('throughput', 'all'):
+        asyncio.run(benchmark_throughput(args.playbooks, args.events, args.concurrency,
+                                         args.sources, args.latency_scale, args.failure_rate))
+    
+    print("\n✅ Benchmark completed")
+
+
+if __name__ == "__main__":
+    main()
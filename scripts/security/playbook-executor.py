@@ -10,13 +10,20 @@ import logging
 import subprocess
 import json
 import time
+import re
+import random
+import signal
+import ipaddress
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set, Tuple
 import aiofiles
-import docker
 from dataclasses import dataclass, field
 
+from docker_api_client import AsyncDockerClient, DockerNotFound, get_shared_client
+from process_control import get_process_controller
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -38,11 +45,221 @@ class SecurityEvent:
     timestamp: datetime = field(default_factory=datetime.now)
 
 
+# Event types routed to playbooks that do not declare their own match rules
+DEFAULT_EVENT_PLAYBOOK_MAP = {
+    'brute_force': 'brute_force_ssh',
+    'port_scan': 'port_scan_detected',
+    'malware': 'malware_detected',
+    'privilege_escalation': 'privilege_escalation',
+    'data_exfiltration': 'data_exfiltration',
+    'container_compromise': 'container_compromise'
+}
+
+
+@dataclass
+class MatchRule:
+    """Compiled match condition declared by a playbook"""
+    rule_id: int
+    playbook: str
+    event_types: Set[str] = field(default_factory=set)
+    networks: List[Any] = field(default_factory=list)
+    users: Set[str] = field(default_factory=set)
+    container_ids: Set[str] = field(default_factory=set)
+    process_names: Set[str] = field(default_factory=set)
+    detail_patterns: Dict[str, Any] = field(default_factory=dict)
+    
+    def matches_attributes(self, event: SecurityEvent) -> bool:
+        """Check the non-indexed conditions of the rule"""
+        if self.users and event.user not in self.users:
+            return False
+        if self.container_ids and event.container_id not in self.container_ids:
+            return False
+        if self.process_names and event.process_name not in self.process_names:
+            return False
+        
+        for key, pattern in self.detail_patterns.items():
+            value = event.details.get(key)
+            if value is None or not pattern.search(str(value)):
+                return False
+        
+        return True
+
+
+class CIDRTrie:
+    """Binary prefix trie mapping IP networks to rule ids"""
+    
+    def __init__(self):
+        # Separate roots for IPv4 and IPv6; node layout is [zero, one, rule_ids]
+        self.roots = {4: [None, None, []], 6: [None, None, []]}
+        self.max_prefix = {4: 0, 6: 0}
+    
+    def insert(self, network, rule_id: int):
+        """Insert a network for a rule"""
+        node = self.roots[network.version]
+        bits = int(network.network_address)
+        width = network.max_prefixlen
+        
+        for i in range(network.prefixlen):
+            bit = (bits >> (width - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        
+        node[2].append(rule_id)
+        self.max_prefix[network.version] = max(self.max_prefix[network.version], network.prefixlen)
+    
+    def lookup(self, address) -> List[int]:
+        """Return rule ids of every network containing the address"""
+        node = self.roots[address.version]
+        bits = int(address)
+        width = address.max_prefixlen
+        found = list(node[2])
+        
+        for i in range(self.max_prefix[address.version]):
+            node = node[(bits >> (width - 1 - i)) & 1]
+            if node is None:
+                break
+            found.extend(node[2])
+        
+        return found
+
+
+class _RuleBucket:
+    """Rules sharing an event type, split by whether they constrain source_ip"""
+    
+    def __init__(self):
+        self.unconstrained: List[int] = []
+        self.trie: Optional[CIDRTrie] = None
+    
+    def add(self, rule: MatchRule):
+        if not rule.networks:
+            self.unconstrained.append(rule.rule_id)
+            return
+        
+        if self.trie is None:
+            self.trie = CIDRTrie()
+        for network in rule.networks:
+            self.trie.insert(network, rule.rule_id)
+    
+    def candidates(self, address) -> List[int]:
+        if self.trie is None or address is None:
+            return self.unconstrained
+        return self.unconstrained + self.trie.lookup(address)
+
+
+class PlaybookMatcher:
+    """Indexed event-to-playbook matcher compiled from playbook match rules
+    
+    Rules are indexed by exact event_type (hash lookup) and by source_ip
+    network (CIDR trie), so only candidate rules are evaluated per event.
+    Remaining conditions (user, container, process, detail regexes) are
+    checked on the candidates only.
+    """
+    
+    WILDCARD = '*'
+    
+    def __init__(self):
+        self.rules: List[MatchRule] = []
+        self.buckets: Dict[str, _RuleBucket] = {}
+    
+    @classmethod
+    def from_playbooks(cls, playbooks: Dict[str, Any]) -> 'PlaybookMatcher':
+        """Compile the match sections of the loaded playbooks"""
+        matcher = cls()
+        declared = set()
+        
+        for name, playbook in playbooks.items():
+            conditions = playbook.get('match')
+            if not conditions:
+                continue
+            if isinstance(conditions, dict):
+                conditions = [conditions]
+            
+            declared.add(name)
+            for condition in conditions:
+                try:
+                    matcher.add_rule(name, condition)
+                except (ValueError, re.error) as e:
+                    logger.error(f"Invalid match rule in playbook {name}: {str(e)}")
+        
+        # Playbooks without match rules keep the legacy event type routing
+        for event_type, name in DEFAULT_EVENT_PLAYBOOK_MAP.items():
+            if name in playbooks and name not in declared:
+                matcher.add_rule(name, {'event_type': event_type})
+        
+        return matcher
+    
+    def add_rule(self, playbook: str, condition: Dict[str, Any]) -> MatchRule:
+        """Compile a single match condition and add it to the index"""
+        rule = MatchRule(
+            rule_id=len(self.rules),
+            playbook=playbook,
+            event_types=self._as_set(condition.get('event_type')),
+            networks=[ipaddress.ip_network(str(cidr), strict=False)
+                      for cidr in self._as_list(condition.get('source_ip'))],
+            users=self._as_set(condition.get('user')),
+            container_ids=self._as_set(condition.get('container_id')),
+            process_names=self._as_set(condition.get('process_name')),
+            detail_patterns={
+                key: re.compile(str(pattern))
+                for key, pattern in (condition.get('details') or {}).items()
+            }
+        )
+        self.rules.append(rule)
+        
+        for event_type in rule.event_types or {self.WILDCARD}:
+            self.buckets.setdefault(event_type, _RuleBucket()).add(rule)
+        
+        return rule
+    
+    def match(self, event: SecurityEvent) -> List[str]:
+        """Return every playbook whose rules match the event, in declaration order"""
+        address = None
+        if event.source_ip:
+            try:
+                address = ipaddress.ip_address(event.source_ip)
+            except ValueError:
+                address = None
+        
+        candidate_ids: Set[int] = set()
+        for key in (event.event_type, self.WILDCARD):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                candidate_ids.update(bucket.candidates(address))
+        
+        playbooks = []
+        seen = set()
+        for rule_id in sorted(candidate_ids):
+            rule = self.rules[rule_id]
+            if rule.playbook in seen:
+                continue
+            if rule.matches_attributes(event):
+                seen.add(rule.playbook)
+                playbooks.append(rule.playbook)
+        
+        return playbooks
+    
+    @staticmethod
+    def _as_list(value) -> List[Any]:
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple, set)):
+            return list(value)
+        return [value]
+    
+    @classmethod
+    def _as_set(cls, value) -> Set[str]:
+        return {str(v) for v in cls._as_list(value)}
+
+
 class ActionExecutor:
     """Executes individual playbook actions"""
     
-    def __init__(self):
-        self.docker_client = docker.from_env()
+    ACTION_TYPES = ('firewall', 'forensics', 'notification', 'process',
+                    'docker', 'network', 'command')
+    
+    def __init__(self, docker_api: Optional[AsyncDockerClient] = None):
+        self.docker_api = docker_api or get_shared_client()
         self.rate_limits = {}  # Track notification rate limits
     
     async def execute_action(self, action: Dict, event: SecurityEvent) -> bool:
@@ -182,17 +399,42 @@ Details: {json.dumps(event.details, indent=2)}
         if not event.process_name:
             return False
         
-        signal = params.get('signal', 'SIGTERM')
+        sig = self._parse_signal(params.get('signal', 'SIGTERM'))
+        if sig is None:
+            logger.error(f"Process action has an unknown signal: {params.get('signal')!r}")
+            return False
         
-        # Find and kill process
-        cmd = f"pkill -{signal} -f {event.process_name}"
-        result = subprocess.run(cmd, shell=True, capture_output=True)
+        # Process names from events are literal, never patterns
+        result = await get_process_controller().kill_matching(
+            re.escape(event.process_name),
+            sig=sig,
+            timeout=params.get('timeout', 5),
+            escalate=params.get('escalate', True),
+            tree=params.get('tree', False),
+            cgroup=params.get('cgroup', False)
+        )
         
-        if result.returncode == 0:
-            logger.info(f"Killed process {event.process_name} with {signal}")
-            return True
+        if result.failed:
+            logger.warning(f"Could not signal {event.process_name} PIDs: {result.failed}")
         
-        return False
+        if result.signalled:
+            escalated = f", escalated {len(result.escalated)} to SIGKILL" if result.escalated else ""
+            sent = 'SIGKILL (cgroup)' if params.get('cgroup') else sig.name
+            logger.info(f"Sent {sent} to {len(result.signalled)} {event.process_name} processes{escalated}")
+        
+        # A partial kill leaves matched processes running: report it as a failure
+        return result.success
+    
+    @staticmethod
+    def _parse_signal(value) -> Optional[signal.Signals]:
+        """Signal from a name such as SIGTERM or TERM, or a number; None if unknown"""
+        try:
+            if isinstance(value, int) and not isinstance(value, bool):
+                return signal.Signals(value)
+            name = str(value).strip().upper()
+            return signal.Signals[name if name.startswith('SIG') else f"SIG{name}"]
+        except (KeyError, ValueError):
+            return None
     
     async def _docker_action(self, params: Dict, event: SecurityEvent) -> bool:
         """Handle Docker container actions"""
@@ -200,28 +442,28 @@ Details: {json.dumps(event.details, indent=2)}
             return False
         
         try:
-            container = self.docker_client.containers.get(event.container_id)
+            container = await self.docker_api.inspect_container(event.container_id)
             action = params.get('action', 'stop')
             
             if action == 'pause':
-                container.pause()
+                await self.docker_api.pause_container(event.container_id)
                 logger.info(f"Paused container {event.container_id}")
             elif action == 'stop':
-                container.stop()
+                await self.docker_api.stop_container(event.container_id)
                 logger.info(f"Stopped container {event.container_id}")
             elif action == 'remove':
-                container.remove(force=True)
+                await self.docker_api.remove_container(event.container_id, force=True)
                 logger.info(f"Removed container {event.container_id}")
             
             # Disconnect networks if requested
             if params.get('disconnect_networks'):
-                for network in container.attrs['NetworkSettings']['Networks']:
-                    container.disconnect(network)
+                for network in container['NetworkSettings']['Networks']:
+                    await self.docker_api.disconnect_network(network, event.container_id)
                     logger.info(f"Disconnected from network {network}")
             
             return True
             
-        except docker.errors.NotFound:
+        except DockerNotFound:
             logger.error(f"Container {event.container_id} not found")
             return False
         except Exception as e:
@@ -281,14 +523,123 @@ Details: {json.dumps(event.details, indent=2)}
             return False
 
 
+@dataclass
+class SimulationConfig:
+    """Latency and failure injection settings for simulated actions"""
+    # Mean latency in seconds per action type, and for types not listed
+    latency: Dict[str, float] = field(default_factory=lambda: {
+        'firewall': 0.005,
+        'forensics': 0.050,
+        'notification': 0.010,
+        'process': 0.005,
+        'docker': 0.020,
+        'network': 0.010,
+        'command': 0.015
+    })
+    default_latency: float = 0.005
+    jitter: float = 0.5  # Uniform +/- fraction of the mean latency
+    # Probability of failure per action type, and for types not listed
+    failure_rate: Dict[str, float] = field(default_factory=dict)
+    default_failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class RecordedAction:
+    """Action call captured by the simulator"""
+    action_type: str
+    name: str
+    parameters: Dict[str, Any]
+    event_type: str
+    source_ip: Optional[str]
+    started: float
+    duration: float
+    success: bool
+    injected_failure: bool = False
+
+
+class SimulatedActionExecutor(ActionExecutor):
+    """Dry-run action executor recording calls instead of touching the system
+    
+    Every action type is replaced by a recording fake that sleeps for the
+    configured latency and fails according to the configured failure rate.
+    Types the real executor does not support fail as they would for real.
+    """
+    
+    def __init__(self, config: Optional[SimulationConfig] = None):
+        self.config = config or SimulationConfig()
+        self.rng = random.Random(self.config.seed)
+        self.recorded: List[RecordedAction] = []
+        self.rate_limits = {}
+    
+    async def execute_action(self, action: Dict, event: SecurityEvent) -> bool:
+        """Simulate a single action from a playbook"""
+        action_type = action['type']
+        config = self.config
+        started = time.perf_counter()
+        injected = False
+        
+        if action_type in self.ACTION_TYPES:
+            mean = config.latency.get(action_type, config.default_latency)
+            delay = mean * (1 + self.rng.uniform(-config.jitter, config.jitter))
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            rate = config.failure_rate.get(action_type, config.default_failure_rate)
+            injected = self.rng.random() < rate
+            success = not injected
+        else:
+            success = False
+        
+        self.recorded.append(RecordedAction(
+            action_type=action_type,
+            name=action.get('name', action_type),
+            parameters=action.get('parameters', {}),
+            event_type=event.event_type,
+            source_ip=event.source_ip,
+            started=started,
+            duration=time.perf_counter() - started,
+            success=success,
+            injected_failure=injected
+        ))
+        return success
+    
+    def latencies_by_type(self) -> Dict[str, List[float]]:
+        """Recorded action durations grouped by action type"""
+        latencies = defaultdict(list)
+        for record in self.recorded:
+            latencies[record.action_type].append(record.duration)
+        return dict(latencies)
+
+
 class PlaybookExecutor:
     """Main playbook executor"""
     
-    def __init__(self, playbook_file: str = "incident-response-playbooks.yaml"):
+    # Single-flight defaults; key fields may be set under settings.single_flight or
+    # per playbook, a cooldown only per playbook
+    DEFAULT_SINGLE_FLIGHT_KEYS = ['source_ip', 'container_id', 'process_name']
+    DEFAULT_SINGLE_FLIGHT_COOLDOWN = 0
+    
+    def __init__(self, playbook_file: str = "incident-response-playbooks.yaml",
+                 simulate: bool = False, simulation: Optional[SimulationConfig] = None):
         self.playbook_file = Path(playbook_file)
+        self.settings = {}
         self.playbooks = self._load_playbooks()
-        self.action_executor = ActionExecutor()
+        self.matcher = PlaybookMatcher.from_playbooks(self.playbooks)
+        self.simulate = simulate or simulation is not None
+        if self.simulate:
+            self.action_executor = SimulatedActionExecutor(simulation)
+        else:
+            self.action_executor = ActionExecutor()
         self.execution_history = []
+        
+        # Single-flight state: running executions and cooldown windows per key
+        self.in_flight: Dict[Tuple, asyncio.Task] = {}
+        self.in_flight_records: Dict[Tuple, Dict[str, Any]] = {}
+        self.cooldowns: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+        self.single_flight_stats = defaultdict(
+            lambda: {'executed': 0, 'attached': 0, 'cooldown': 0}
+        )
     
     def _load_playbooks(self) -> Dict:
         """Load playbooks from YAML file"""
@@ -298,25 +649,132 @@ class PlaybookExecutor:
         
         with open(self.playbook_file, 'r') as f:
             data = yaml.safe_load(f)
+            self.settings = data.get('settings', {}) or {}
             return data.get('playbooks', {})
     
-    async def execute_playbook(self, playbook_name: str, event: SecurityEvent):
-        """Execute a specific playbook"""
+    def _single_flight_config(self, playbook_name: str) -> Tuple[List[str], float]:
+        """Resolve single-flight key fields and cooldown for a playbook"""
+        playbook_config = self.playbooks[playbook_name].get('single_flight') or {}
+        config = dict(self.settings.get('single_flight') or {})
+        config.update(playbook_config)
+        
+        key_fields = config.get('key', self.DEFAULT_SINGLE_FLIGHT_KEYS)
+        if isinstance(key_fields, str):
+            key_fields = [key_fields]
+        cooldown = float(playbook_config.get('cooldown', self.DEFAULT_SINGLE_FLIGHT_COOLDOWN))
+        
+        return list(key_fields), cooldown
+    
+    def _single_flight_key(self, playbook_name: str, event: SecurityEvent,
+                           key_fields: List[str]) -> Optional[Tuple]:
+        """Build the deduplication key for an execution
+        
+        None when the event has none of the key fields: nothing identifies
+        it as a repeat, so it is never deduplicated.
+        """
+        values = []
+        for key_field in key_fields:
+            value = getattr(event, key_field, None)
+            if value is None:
+                value = event.details.get(key_field)
+            values.append(str(value) if value is not None else None)
+        
+        if all(value is None for value in values):
+            return None
+        return (playbook_name, tuple(values))
+    
+    async def execute_playbook(self, playbook_name: str, event: SecurityEvent) -> Optional[Dict[str, Any]]:
+        """Execute a specific playbook
+        
+        Identical events (same playbook and key fields) arriving while an
+        execution is running attach to it instead of starting a new one, and
+        events arriving within the playbook's cooldown after it finished
+        successfully are absorbed.
+        """
         if playbook_name not in self.playbooks:
             logger.error(f"Playbook {playbook_name} not found")
-            return
-        
-        playbook = self.playbooks[playbook_name]
-        logger.info(f"Executing playbook: {playbook['name']}")
+            return None
+        
+        key_fields, cooldown = self._single_flight_config(playbook_name)
+        key = self._single_flight_key(playbook_name, event, key_fields)
+        stats = self.single_flight_stats[playbook_name]
+        
+        if key is None:
+            stats['executed'] += 1
+            record = self._new_execution_record(playbook_name, event)
+            return await self._run_playbook(playbook_name, event, record)
+        
+        # Attach to a running execution
+        task = self.in_flight.get(key)
+        if task is not None:
+            stats['attached'] += 1
+            self.in_flight_records[key]['absorbed_events'] += 1
+            logger.info(f"Playbook {playbook_name} already running for {key[1]}, attaching event")
+            return await asyncio.shield(task)
+        
+        # Absorb into the cooldown window of a finished execution
+        window = self.cooldowns.get(key)
+        if window is not None:
+            expires, record = window
+            if time.monotonic() < expires:
+                stats['cooldown'] += 1
+                record['absorbed_events'] += 1
+                logger.info(f"Playbook {playbook_name} in cooldown for {key[1]}, absorbing event")
+                return record
+            del self.cooldowns[key]
+        
+        self._prune_cooldowns()
+        stats['executed'] += 1
+        record = self._new_execution_record(playbook_name, event)
+        task = asyncio.ensure_future(self._run_playbook(playbook_name, event, record))
+        self.in_flight[key] = task
+        self.in_flight_records[key] = record
+        task.add_done_callback(
+            lambda done: self._finish_single_flight(key, done, record, cooldown)
+        )
         
-        # Record execution
-        execution_record = {
+        return await asyncio.shield(task)
+    
+    def _finish_single_flight(self, key: Tuple, task: asyncio.Task,
+                              record: Dict[str, Any], cooldown: float):
+        """Release a finished execution and open its cooldown window
+        
+        Failed executions open no window, so a repeat event retries them.
+        """
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+            del self.in_flight_records[key]
+        
+        if cooldown > 0 and not task.cancelled() and task.exception() is None and record['success']:
+            self.cooldowns[key] = (time.monotonic() + cooldown, record)
+    
+    def _prune_cooldowns(self):
+        """Drop expired cooldown windows"""
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self.cooldowns.items() if expires <= now]
+        for key in expired:
+            del self.cooldowns[key]
+    
+    def get_single_flight_stats(self) -> Dict[str, Dict[str, int]]:
+        """Return executed/attached/cooldown counters per playbook"""
+        return {name: dict(counts) for name, counts in self.single_flight_stats.items()}
+    
+    def _new_execution_record(self, playbook_name: str, event: SecurityEvent) -> Dict[str, Any]:
+        """Create an execution record"""
+        return {
             'playbook': playbook_name,
             'event': event,
             'timestamp': datetime.now(),
             'actions_executed': [],
+            'absorbed_events': 0,
             'success': True
         }
+    
+    async def _run_playbook(self, playbook_name: str, event: SecurityEvent,
+                            execution_record: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the actions of a playbook"""
+        playbook = self.playbooks[playbook_name]
+        logger.info(f"Executing playbook: {playbook['name']}")
         
         # Execute each action
         for action in playbook['actions']:
@@ -335,8 +793,11 @@ class PlaybookExecutor:
         
         self.execution_history.append(execution_record)
         
-        # Save execution history
-        await self._save_execution_history()
+        # Save execution history (simulated runs never touch the real log)
+        if not self.simulate:
+            await self._save_execution_history()
+        
+        return execution_record
     
     async def _save_execution_history(self):
         """Save execution history to file"""
@@ -350,26 +811,21 @@ class PlaybookExecutor:
                 'playbook': record['playbook'],
                 'timestamp': record['timestamp'].isoformat(),
                 'success': record['success'],
+                'absorbed_events': record.get('absorbed_events', 0),
                 'actions': record['actions_executed']
             })
         
         async with aiofiles.open(history_file, 'w') as f:
             await f.write(json.dumps(history_data, indent=2))
     
+    def match_event_to_playbooks(self, event: SecurityEvent) -> List[str]:
+        """Match an event to every playbook whose rules it satisfies"""
+        return self.matcher.match(event)
+    
     def match_event_to_playbook(self, event: SecurityEvent) -> Optional[str]:
-        """Match an event to appropriate playbook"""
-        # Simple matching based on event type
-        event_playbook_map = {
-            'brute_force': 'brute_force_ssh',
-            'port_scan': 'port_scan_detected',
-            'malware': 'malware_detected',
-            'privilege_escalation': 'privilege_escalation',
-            'data_exfiltration': 'data_exfiltration',
-            'container_compromise': 'container_compromise'
-        }
-        
-        return event_playbook_map.get(event.event_type)
-
+        """Match an event to the first appropriate playbook"""
+        playbooks = self.matcher.match(event)
+        return playbooks[0] if playbooks else None
 
 async def main():
     """Example usage"""
@@ -384,10 +840,10 @@ async def main():
         details={'failed_attempts': 10}
     )
     
-    playbook = executor.match_event_to_playbook(event)
-    if playbook:
+    playbooks = executor.match_event_to_playbooks(event)
+    for playbook in playbooks:
         await executor.execute_playbook(playbook, event)
-    else:
+    if not playbooks:
         logger.warning(f"No playbook found for event type: {event.event_type}")
 
 
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Process Control
+In-process process matching and race-free termination using pidfds
+"""
+
+import asyncio
+import errno
+import logging
+import os
+import re
+import signal
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+# Cleared on first use if the kernel turns out to lack pidfd_open (before 5.3)
+HAS_PIDFD = hasattr(os, 'pidfd_open') and hasattr(signal, 'pidfd_send_signal')
+
+
+@dataclass
+class ProcessInfo:
+    """Snapshot of a process taken from /proc"""
+    pid: int
+    ppid: int
+    state: str
+    starttime: int  # Clock ticks since boot; (pid, starttime) identifies a process
+    comm: str
+    cmdline: str
+
+
+@dataclass
+class KillResult:
+    """Outcome of a termination request"""
+    matched: List[int] = field(default_factory=list)
+    signalled: List[int] = field(default_factory=list)
+    exited: List[int] = field(default_factory=list)
+    escalated: List[int] = field(default_factory=list)
+    failed: Dict[int, str] = field(default_factory=dict)
+    
+    @property
+    def success(self) -> bool:
+        return bool(self.matched) and not self.failed
+
+
+class ProcessMatcher:
+    """Precompiled matcher for process command lines
+    
+    Patterns are regular expressions as with pgrep/pkill; strings that are
+    not valid expressions are matched literally. With full_command=False only
+    the process name (comm) is matched.
+    """
+    
+    def __init__(self, pattern: str, full_command: bool = True):
+        try:
+            self.regex = re.compile(pattern)
+        except re.error:
+            self.regex = re.compile(re.escape(pattern))
+        self.full_command = full_command
+    
+    def matches(self, process: ProcessInfo) -> bool:
+        text = process.cmdline if self.full_command and process.cmdline else process.comm
+        return self.regex.search(text) is not None
+
+
+class ProcessController:
+    """Scans /proc once per request and signals processes through pidfds
+    
+    A pidfd refers to one specific process, so once it is opened (and the
+    start time rechecked) a signal can never reach a process that reused
+    the PID. Kernels without pidfd support fall back to os.kill after the
+    same start time check.
+    """
+    
+    def __init__(self, proc_root: str = '/proc', cgroup_root: str = '/sys/fs/cgroup'):
+        self.proc_root = Path(proc_root)
+        self.cgroup_root = Path(cgroup_root)
+    
+    def _read_process(self, pid: int) -> Optional[ProcessInfo]:
+        base = self.proc_root / str(pid)
+        try:
+            stat = (base / 'stat').read_bytes().decode(errors='replace')
+            cmdline = (base / 'cmdline').read_bytes()
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return None
+        
+        # comm may contain spaces and parentheses; fields resume after the last ')'
+        open_paren, close_paren = stat.find('('), stat.rfind(')')
+        fields = stat[close_paren + 2:].split()
+        return ProcessInfo(
+            pid=pid,
+            ppid=int(fields[1]),
+            state=fields[0],
+            starttime=int(fields[19]),
+            comm=stat[open_paren + 1:close_paren],
+            cmdline=cmdline.rstrip(b'\0').replace(b'\0', b' ').decode(errors='replace')
+        )
+    
+    def scan(self) -> Dict[int, ProcessInfo]:
+        """Snapshot every process in a single pass over /proc"""
+        processes = {}
+        with os.scandir(self.proc_root) as entries:
+            for entry in entries:
+                if entry.name.isdigit():
+                    process = self._read_process(int(entry.name))
+                    if process is not None:
+                        processes[process.pid] = process
+        return processes
+    
+    def protected(self, processes: Dict[int, ProcessInfo]) -> Set[int]:
+        """PIDs never signalled: init, kernel threads, this process and its ancestors
+        
+        A shell, sudo or supervisor that started us may carry the pattern in
+        its command line; killing it would take this process down with it.
+        """
+        protected = {1}
+        protected.update(p.pid for p in processes.values() if p.ppid == 2 or p.pid == 2 or not p.cmdline)
+        pid = os.getpid()
+        while pid > 0 and pid not in protected:
+            protected.add(pid)
+            process = processes.get(pid) or self._read_process(pid)
+            pid = process.ppid if process is not None else 0
+        return protected
+    
+    def find(self, pattern: Union[str, ProcessMatcher],
+             processes: Optional[Dict[int, ProcessInfo]] = None) -> List[ProcessInfo]:
+        """Processes matching a pattern, never including protected() ones"""
+        matcher = pattern if isinstance(pattern, ProcessMatcher) else ProcessMatcher(pattern)
+        processes = processes if processes is not None else self.scan()
+        protected = self.protected(processes)
+        return [p for p in processes.values() if p.pid not in protected and matcher.matches(p)]
+    
+    @staticmethod
+    def descendants(roots: List[int], processes: Dict[int, ProcessInfo]) -> List[int]:
+        """Roots plus all their descendants, parents before children"""
+        children: Dict[int, List[int]] = {}
+        for process in processes.values():
+            children.setdefault(process.ppid, []).append(process.pid)
+        
+        ordered, seen = [], set()
+        stack = list(reversed(roots))
+        while stack:
+            pid = stack.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            ordered.append(pid)
+            stack.extend(reversed(children.get(pid, [])))
+        return ordered
+    
+    @staticmethod
+    def _pidfd_open(pid: int) -> int:
+        """A pidfd for pid, or -1 where the kernel has no pidfd support"""
+        global HAS_PIDFD
+        if not HAS_PIDFD:
+            return -1
+        try:
+            return os.pidfd_open(pid)
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL):
+                raise
+            logger.info(f"pidfd_open unavailable ({e.strerror}), signalling with os.kill")
+            HAS_PIDFD = False
+            return -1
+    
+    def _open(self, process: ProcessInfo) -> Optional[int]:
+        """Open a pidfd and confirm it still refers to the scanned process"""
+        fd = self._pidfd_open(process.pid)
+        current = self._read_process(process.pid)
+        if current is None or current.starttime != process.starttime:
+            if fd >= 0:
+                os.close(fd)
+            raise ProcessLookupError(process.pid)
+        return fd
+    
+    @staticmethod
+    def _signal(pid: int, fd: int, sig: int):
+        if fd >= 0:
+            signal.pidfd_send_signal(fd, sig)
+        else:
+            os.kill(pid, sig)
+    
+    def _is_alive(self, process: ProcessInfo) -> bool:
+        current = self._read_process(process.pid)
+        return current is not None and current.starttime == process.starttime and current.state != 'Z'
+    
+    async def _wait_exit(self, pid: int, fd: int, process: ProcessInfo, timeout: float) -> bool:
+        """Wait until the process exits; pidfds become readable on exit"""
+        if timeout <= 0:
+            return not self._is_alive(process)
+        
+        loop = asyncio.get_running_loop()
+        if fd >= 0:
+            exited = loop.create_future()
+            loop.add_reader(fd, lambda: exited.done() or exited.set_result(True))
+            try:
+                await asyncio.wait_for(exited, timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                loop.remove_reader(fd)
+        
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if not self._is_alive(process):
+                return True
+            await asyncio.sleep(0.05)
+        return not self._is_alive(process)
+    
+    async def terminate(self, targets: List[ProcessInfo], sig: int = signal.SIGTERM,
+                        timeout: float = 5.0, escalate: bool = True) -> KillResult:
+        """Signal processes, escalating to SIGKILL if they outlive the timeout
+        
+        Several targets are stopped before being signalled so a process tree
+        cannot fork replacements while it is being torn down.
+        """
+        result = KillResult(matched=[p.pid for p in targets])
+        by_pid = {p.pid: p for p in targets}
+        live: Dict[int, int] = {}
+        
+        for process in targets:
+            try:
+                live[process.pid] = self._open(process)
+            except ProcessLookupError:
+                result.exited.append(process.pid)
+            except OSError as e:
+                result.failed[process.pid] = e.strerror or str(e)
+        
+        def send(pid: int, sig: int) -> bool:
+            try:
+                self._signal(pid, live[pid], sig)
+                return True
+            except ProcessLookupError:
+                result.exited.append(pid)
+            except OSError as e:
+                result.failed[pid] = e.strerror or str(e)
+            if live[pid] >= 0:
+                os.close(live[pid])
+            del live[pid]
+            return False
+        
+        try:
+            freeze = len(live) > 1 and sig not in (signal.SIGKILL, signal.SIGSTOP)
+            if freeze:
+                for pid in list(live):
+                    send(pid, signal.SIGSTOP)
+            
+            for pid in list(live):
+                if send(pid, sig):
+                    result.signalled.append(pid)
+            
+            if freeze:
+                for pid in list(live):
+                    send(pid, signal.SIGCONT)
+            
+            pending = list(live)
+            waits = await asyncio.gather(*(
+                self._wait_exit(pid, live[pid], by_pid[pid], timeout) for pid in pending
+            ))
+            
+            for pid, exited in zip(pending, waits):
+                if exited:
+                    result.exited.append(pid)
+                elif escalate and sig != signal.SIGKILL:
+                    if send(pid, signal.SIGKILL):
+                        result.escalated.append(pid)
+        finally:
+            for fd in live.values():
+                if fd >= 0:
+                    os.close(fd)
+        
+        return result
+    
+    async def kill_matching(self, pattern: Union[str, ProcessMatcher], sig: int = signal.SIGTERM,
+                            timeout: float = 5.0, escalate: bool = True,
+                            tree: bool = False, cgroup: bool = False) -> KillResult:
+        """Terminate processes matching a pattern, optionally with their descendants
+        
+        With cgroup=True the whole cgroup of each matched process (its
+        container, service or scope) is killed instead; see kill_cgroup().
+        """
+        processes = self.scan()
+        matched = self.find(pattern, processes)
+        
+        if cgroup and matched:
+            return await self._kill_cgroups(matched, timeout)
+        
+        if tree and matched:
+            protected = self.protected(processes)
+            pids = self.descendants([p.pid for p in matched], processes)
+            matched = [processes[pid] for pid in pids if pid not in protected]
+        
+        return await self.terminate(matched, sig=sig, timeout=timeout, escalate=escalate)
+    
+    def cgroup_of(self, pid: int) -> Optional[Path]:
+        """cgroup v2 directory of a process"""
+        try:
+            for line in (self.proc_root / str(pid) / 'cgroup').read_text().splitlines():
+                if line.startswith('0::'):
+                    return self.cgroup_root / line[3:].lstrip('/')
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            pass
+        return None
+    
+    async def _kill_cgroups(self, matched: List[ProcessInfo], timeout: float) -> KillResult:
+        """Kill the cgroups of matched processes, merging the results"""
+        result = KillResult()
+        groups: Dict[Path, List[int]] = {}
+        for process in matched:
+            path = self.cgroup_of(process.pid)
+            if path is None:
+                result.matched.append(process.pid)
+                result.failed[process.pid] = 'not in a cgroup v2 hierarchy'
+            else:
+                groups.setdefault(path, []).append(process.pid)
+        
+        for path, pids in groups.items():
+            try:
+                killed = await self.kill_cgroup(path, timeout)
+            except (ValueError, OSError) as e:
+                logger.warning(f"Could not kill cgroup {path}: {str(e)}")
+                result.matched.extend(pids)
+                result.failed.update((pid, str(e)) for pid in pids)
+                continue
+            result.matched.extend(killed.matched)
+            result.signalled.extend(killed.signalled)
+            result.exited.extend(killed.exited)
+            result.escalated.extend(killed.escalated)
+            result.failed.update(killed.failed)
+        return result
+    
+    async def kill_cgroup(self, cgroup: Union[str, Path], timeout: float = 5.0) -> KillResult:
+        """Kill every process in a cgroup v2 subtree in one pass
+        
+        Uses cgroup.kill where the kernel provides it (5.14+); otherwise the
+        cgroup is frozen, its members are killed through pidfds and it is
+        thawed so the kernel can reap them.
+        """
+        path = Path(cgroup)
+        if not path.is_absolute():
+            path = self.cgroup_root / path
+        if path.resolve() == self.cgroup_root.resolve() or path == self.cgroup_of(os.getpid()):
+            raise ValueError(f"Refusing to kill cgroup {path}")
+        
+        members: Set[int] = set()
+        for procs_file in path.rglob('cgroup.procs'):
+            members.update(int(pid) for pid in procs_file.read_text().split())
+        if members & self.protected({}):
+            raise ValueError(f"Refusing to kill cgroup {path}: it contains init or an ancestor of this process")
+        
+        result = KillResult(matched=sorted(members))
+        kill_file = path / 'cgroup.kill'
+        if kill_file.exists():
+            kill_file.write_text('1')
+            result.signalled.extend(result.matched)
+            return result
+        
+        freeze_file = path / 'cgroup.freeze'
+        frozen = freeze_file.exists()
+        if frozen:
+            freeze_file.write_text('1')
+        try:
+            targets = [p for p in (self._read_process(pid) for pid in members) if p is not None]
+            return await self.terminate(targets, sig=signal.SIGKILL, timeout=timeout, escalate=False)
+        finally:
+            if frozen:
+                freeze_file.write_text('0')
+
+
+_controller: Optional[ProcessController] = None
+
+
+def get_process_controller() -> ProcessController:
+    """Process controller shared by the security tools"""
+    global _controller
+    if _controller is None:
+        _controller = ProcessController()
+    return _controller
@@ -25,6 +25,8 @@ echo -e "${YELLOW}Installing scripts...${NC}"
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 sudo cp "$SCRIPT_DIR/playbook-executor.py" /opt/scripts/security/
+sudo cp "$SCRIPT_DIR/docker_api_client.py" /opt/scripts/security/
+sudo cp "$SCRIPT_DIR/process_control.py" /opt/scripts/security/
 sudo cp "$SCRIPT_DIR/event-monitor.py" /opt/scripts/security/
 sudo cp "$SCRIPT_DIR/incident-response-playbooks.yaml" /opt/scripts/security/
 sudo cp "$SCRIPT_DIR/test-incident-response.py" /opt/scripts/security/
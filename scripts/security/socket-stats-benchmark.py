@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Socket Statistics Benchmark
+Compares psutil.net_connections against /proc/net parsing and netlink
+sock_diag counting with many open loopback sockets
+"""
+
+import argparse
+import resource
+import socket
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from socket_stats import PROC_FILES, SocketStateCounter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Ephemeral ports run out per destination, so spread connections over listeners
+CONNECTIONS_PER_LISTENER = 20000
+
+
+def raise_fd_limit(wanted: int) -> int:
+    """Raise the open file limit as far as allowed and return it"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        soft = target
+    return soft
+
+
+def open_connections(sockets: int) -> list:
+    """Open established loopback TCP pairs totalling roughly the requested sockets"""
+    opened = []
+    remaining = sockets // 2
+    while remaining > 0:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(4096)
+        opened.append(listener)
+        address = listener.getsockname()
+        
+        batch = min(remaining, CONNECTIONS_PER_LISTENER)
+        for _ in range(batch):
+            client = socket.create_connection(address)
+            server, _ = listener.accept()
+            opened.extend((client, server))
+        remaining -= batch
+    return opened
+
+
+def write_fixture(root: Path, sockets: int):
+    """Write /proc/net files with synthetic rows in a mix of states"""
+    net = root / 'net'
+    net.mkdir(parents=True, exist_ok=True)
+    header = ("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when "
+              "retrnsmt   uid  timeout inode\n")
+    states = ['01'] * 8 + ['06', '0A']
+    rows = [
+        f"{i:4d}: 0100007F:{i % 65536:04X} 0100007F:1F90 {states[i % len(states)]} "
+        f"00000000:00000000 00:00000000 00000000  1000        0 {100000 + i} 1 "
+        f"0000000000000000 20 4 30 10 -1\n"
+        for i in range(sockets)
+    ]
+    (net / 'tcp').write_text(header + ''.join(rows))
+    for name in ('tcp6', 'udp', 'udp6'):
+        (net / name).write_text(header)
+
+
+def time_call(func, repeat: int) -> float:
+    """Median wall time of a call in seconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def psutil_counts():
+    counts = {}
+    for conn in psutil.net_connections():
+        if conn.status != 'NONE':
+            key = (conn.status, 'tcp' if conn.type == 1 else 'udp')
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def benchmark(sizes: list, repeat: int, fixture_only: bool):
+    """Run each counting method at each socket count"""
+    limit = raise_fd_limit(max(sizes) + 1024)
+    netlink = SocketStateCounter(use_netlink=True)
+    proc = SocketStateCounter(use_netlink=False)
+    
+    for size in sizes:
+        print(f"\n🔌 {size} sockets")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            write_fixture(Path(tmp), size)
+            fixture = SocketStateCounter(proc_root=tmp, use_netlink=False)
+            elapsed = time_call(fixture.counts, repeat)
+            print(f"   /proc fixture parse:   {elapsed * 1000:9.1f} ms")
+        
+        if fixture_only:
+            continue
+        if size + 64 > limit:
+            print(f"   Skipping live sockets: open file limit is {limit}")
+            continue
+        
+        opened = open_connections(size)
+        try:
+            total = sum(proc.counts().values())
+            print(f"   Live sockets counted:  {total:9d}")
+            if psutil is not None:
+                print(f"   psutil.net_connections:{time_call(psutil_counts, repeat) * 1000:9.1f} ms")
+            print(f"   /proc/net parse:       {time_call(proc.counts, repeat) * 1000:9.1f} ms")
+            netlink_elapsed = time_call(netlink.counts, repeat)
+            fallback = ', '.join(f"{p}/{'v6' if f == socket.AF_INET6 else 'v4'}"
+                                 for p, f in PROC_FILES if (p, f) in netlink._netlink_unsupported)
+            print(f"   netlink sock_diag:     {netlink_elapsed * 1000:9.1f} ms"
+                  + (f" (/proc fallback for {fallback})" if fallback else ''))
+        finally:
+            for sock in opened:
+                sock.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Socket Statistics Benchmark')
+    parser.add_argument('--sockets', type=int, nargs='+', default=[10000, 100000],
+                        help='Socket counts to benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement')
+    parser.add_argument('--fixture-only', action='store_true',
+                        help='Only parse synthetic /proc/net files')
+    
+    args = parser.parse_args()
+    benchmark(args.sockets, args.repeat, args.fixture_only)
+
+
+if __name__ == "__main__":
+    main()
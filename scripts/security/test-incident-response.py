@@ -9,6 +9,9 @@ import sys
 from datetime import datetime
 from playbook_executor import PlaybookExecutor, SecurityEvent
 
+# Dry-run mode: actions are recorded by the simulator instead of executed
+SIMULATE = False
+
 async def test_brute_force():
     """Test brute force response"""
     print("\n🔴 Testing SSH Brute Force Response...")
@@ -23,7 +26,7 @@ async def test_brute_force():
         }
     )
     
-    executor = PlaybookExecutor()
+    executor = PlaybookExecutor(simulate=SIMULATE)
     await executor.execute_playbook('brute_force_ssh', event)
     
     print("✅ Brute force test completed")
@@ -45,7 +48,7 @@ async def test_port_scan():
         }
     )
     
-    executor = PlaybookExecutor()
+    executor = PlaybookExecutor(simulate=SIMULATE)
     await executor.execute_playbook('port_scan_detected', event)
     
     print("✅ Port scan test completed")
@@ -68,7 +71,7 @@ async def test_malware():
         }
     )
     
-    executor = PlaybookExecutor()
+    executor = PlaybookExecutor(simulate=SIMULATE)
     await executor.execute_playbook('malware_detected', event)
     
     print("✅ Malware test completed")
@@ -90,7 +93,7 @@ async def test_container_compromise():
         }
     )
     
-    executor = PlaybookExecutor()
+    executor = PlaybookExecutor(simulate=SIMULATE)
     await executor.execute_playbook('container_compromise', event)
     
     print("✅ Container test completed")
@@ -139,9 +142,14 @@ async def test_specific(test_name: str):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    args = sys.argv[1:]
+    if '--simulate' in args:
+        args.remove('--simulate')
+        SIMULATE = True
+    
+    if args:
         # Run specific test
-        asyncio.run(test_specific(sys.argv[1]))
+        asyncio.run(test_specific(args[0]))
     else:
         # Run all tests
         asyncio.run(test_all())
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test script for in-process process control
+Spawns marked process trees and kills them by pattern from a child process
+"""
+
+import argparse
+import asyncio
+import errno
+import json
+import os
+import signal
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import process_control  # noqa: E402
+from process_control import ProcessController  # noqa: E402
+
+# Victim: a parent and two children all carrying the marker, plus one unmarked child
+VICTIM = '''
+import subprocess, sys, time
+marker = sys.argv[1]
+children = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)', marker]) for _ in range(2)]
+children.append(subprocess.Popen(['sleep', '60']))
+print(' '.join(str(c.pid) for c in children), flush=True)
+time.sleep(60)
+'''
+
+
+async def run_killer(marker: str, tree: bool):
+    """Killer process: kill everything matching the marker and report"""
+    result = await ProcessController().kill_matching(marker, timeout=2, tree=tree)
+    print(json.dumps({'matched': result.matched, 'failed': result.failed}), flush=True)
+
+
+def alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+async def spawn_victim(marker: str):
+    victim = await asyncio.create_subprocess_exec(sys.executable, '-c', VICTIM, marker,
+                                                  stdout=asyncio.subprocess.PIPE)
+    children = [int(pid) for pid in (await victim.stdout.readline()).split()]
+    return victim, children
+
+
+async def test_tree_kill() -> bool:
+    """Tree kill from under a shell whose command line matches the pattern"""
+    print("\n🔪 Testing tree kill with a matching ancestor...")
+    marker = f"victim-{uuid.uuid4().hex[:8]}"
+    victim, children = await spawn_victim(marker)
+    
+    # The shell and the killer both carry the marker in their command lines
+    shell = await asyncio.create_subprocess_exec(
+        'sh', '-c', f'"{sys.executable}" "{__file__}" --kill {marker} --tree; echo survived {marker}',
+        stdout=asyncio.subprocess.PIPE
+    )
+    output, _ = await asyncio.wait_for(shell.communicate(), 30)
+    lines = output.decode().splitlines()
+    report = json.loads(lines[0])
+    await victim.wait()
+    await asyncio.sleep(0.1)
+    
+    ok = check("Killer and its shell survived", lines[1:] == [f"survived {marker}"] and shell.returncode == 0)
+    ok &= check(f"Only the victim tree was matched ({len(report['matched'])} PIDs)",
+                sorted(report['matched']) == sorted([victim.pid] + children) and not report['failed'])
+    ok &= check("Victim, marked and unmarked children are gone",
+                victim.returncode == -signal.SIGTERM and not any(alive(pid) for pid in children))
+    return ok
+
+
+async def test_plain_kill() -> bool:
+    """Without tree only marked processes die"""
+    print("\n🔪 Testing kill without tree expansion...")
+    marker = f"victim-{uuid.uuid4().hex[:8]}"
+    victim, children = await spawn_victim(marker)
+    try:
+        await run_killer(marker, tree=False)
+        await victim.wait()
+        await asyncio.sleep(0.1)
+        return check("Unmarked child left running", alive(children[2]) and not alive(children[0]))
+    finally:
+        for pid in children:
+            if alive(pid):
+                os.kill(pid, signal.SIGKILL)
+
+
+async def test_no_pidfd() -> bool:
+    """Kernels without pidfd_open fall back to os.kill"""
+    print("\n🔪 Testing kill on a kernel without pidfds...")
+    marker = f"victim-{uuid.uuid4().hex[:8]}"
+    victim, children = await spawn_victim(marker)
+    calls = []
+    
+    def pidfd_open(pid, flags=0):
+        calls.append(pid)
+        raise OSError(errno.ENOSYS, os.strerror(errno.ENOSYS))
+    
+    real, has_pidfd = getattr(os, 'pidfd_open', None), process_control.HAS_PIDFD
+    os.pidfd_open, process_control.HAS_PIDFD = pidfd_open, True
+    try:
+        result = await ProcessController().kill_matching(marker, timeout=2, tree=True)
+        await victim.wait()
+        ok = check(f"All {len(result.matched)} processes signalled through os.kill",
+                   result.success and len(result.signalled) == 4 and not any(alive(pid) for pid in children))
+        ok &= check("pidfd_open attempted once, then skipped",
+                    len(calls) == 1 and not process_control.HAS_PIDFD)
+        return ok
+    finally:
+        process_control.HAS_PIDFD = has_pidfd
+        if real is not None:
+            os.pidfd_open = real
+        else:
+            del os.pidfd_open
+
+
+async def test_cgroup_kill(root: Path) -> bool:
+    """cgroup kills take the whole group and refuse groups holding our ancestry"""
+    print("\n🔪 Testing cgroup kills...")
+    marker = f"victim-{uuid.uuid4().hex[:8]}"
+    victim, children = await spawn_victim(marker)
+    controller = ProcessController(cgroup_root=str(root))
+    try:
+        # Without cgroup.kill or cgroup.freeze the members are killed through pidfds
+        group = root / 'victim.scope'
+        group.mkdir()
+        (group / 'cgroup.procs').write_text('\n'.join(str(pid) for pid in [victim.pid] + children))
+        result = await controller.kill_cgroup(group, timeout=2)
+        await victim.wait()
+        ok = check(f"Every member killed, unmarked child included ({len(result.matched)} PIDs)",
+                   result.success and not any(alive(pid) for pid in children))
+        
+        ours = root / 'ours.scope'
+        ours.mkdir()
+        (ours / 'cgroup.procs').write_text(str(os.getppid()))
+        try:
+            await controller.kill_cgroup(ours)
+            refused = False
+        except ValueError:
+            refused = True
+        ok &= check("cgroup holding our parent refused", refused and alive(os.getppid()))
+        return ok
+    finally:
+        for pid in children:
+            if alive(pid):
+                os.kill(pid, signal.SIGKILL)
+
+
+def test_protected() -> bool:
+    """init, kernel threads and our ancestry are never candidates"""
+    print("\n🛡  Testing protected processes...")
+    controller = ProcessController()
+    processes = controller.scan()
+    protected = controller.protected(processes)
+    ancestry, pid = [], os.getpid()
+    while pid > 0:
+        ancestry.append(pid)
+        pid = processes[pid].ppid if pid in processes else 0
+    matched = {p.pid for p in controller.find('.', processes)}
+    kernel = {p.pid for p in processes.values() if p.ppid == 2 or not p.cmdline}
+    ok = check(f"Own ancestry protected ({len(ancestry)} processes)", set(ancestry) <= protected)
+    ok &= check("Catch-all pattern skips init, kernel threads and ancestry",
+                1 not in matched and not matched & kernel and not matched & set(ancestry))
+    return ok
+
+
+async def main():
+    """Run all process control tests"""
+    results = [test_protected(), await test_plain_kill(), await test_tree_kill(), await test_no_pidfd()]
+    with tempfile.TemporaryDirectory() as tmp:
+        results.append(await test_cgroup_kill(Path(tmp)))
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} process control tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Process control test')
+    parser.add_argument('--kill', metavar='PATTERN', help='Run as the killer process')
+    parser.add_argument('--tree', action='store_true', help='Killer also kills descendants')
+    args = parser.parse_args()
+    
+    if args.kill:
+        asyncio.run(run_killer(args.kill, args.tree))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Test script for the vulnerability database
+Exercises connections, transactions, scan merges and schema migration
+against temporary databases
+"""
+
+import importlib.util
+import sqlite3
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# The system is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'vulnerability_management_system', Path(__file__).resolve().parent / 'vulnerability-management-system.py'
+)
+vms = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(vms)
+
+
+def make_vuln(vuln_id: str, component: str = 'openssl', version: str = '1.1.1',
+              priority: int = 50) -> 'vms.Vulnerability':
+    return vms.Vulnerability(
+        vuln_id=vuln_id, cve_id=f"CVE-2024-{vuln_id}",
+        title=f"{component} flaw {vuln_id}", description=f"Issue in {component}",
+        severity=vms.Severity.HIGH, cvss_score=7.5, affected_component=component,
+        affected_version=version, fixed_version=None, discovered_date=datetime.now(),
+        status=vms.VulnerabilityStatus.NEW, remediation=None, priority=priority
+    )
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+def in_thread(function):
+    """Result of calling function on a new thread"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_connections(db_path: Path) -> bool:
+    """One persistent WAL connection per thread"""
+    print("\n🗄  Testing per-thread connections...")
+    manager = vms.ConnectionManager(db_path)
+    conn = manager.connection()
+    other = in_thread(manager.connection)
+    ok = check("Same thread reuses its connection", manager.connection() is conn)
+    ok &= check("Other threads get their own", other is not conn and len(manager._connections) == 2)
+    ok &= check("WAL journal mode", conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal')
+    ok &= check("Autocommit between transactions", conn.isolation_level is None)
+    
+    manager.close()
+    try:
+        conn.execute('SELECT 1')
+        closed = False
+    except sqlite3.ProgrammingError:
+        closed = True
+    ok &= check("close() closes every thread's connection", closed and not manager._connections)
+    ok &= check("Connections reopen after close", manager.connection() is not conn)
+    manager.close()
+    return ok
+
+
+def test_transactions(db_path: Path) -> bool:
+    """Nested blocks join the outer transaction and failures roll back"""
+    print("\n🗄  Testing transactions...")
+    db = vms.VulnerabilityDatabase(str(db_path))
+    
+    def count() -> int:
+        return db.connections.connection().execute('SELECT COUNT(*) FROM vulnerabilities').fetchone()[0]
+    
+    with db.connections.transaction():
+        db.add_vulnerability(make_vuln('A'))
+        inner_committed = in_thread(count)
+    ok = check("Nested writes join the outer transaction", inner_committed == 0 and in_thread(count) == 1)
+    
+    try:
+        with db.connections.transaction():
+            db.add_vulnerabilities([make_vuln('B'), make_vuln('C')])
+            raise RuntimeError('abort')
+    except RuntimeError:
+        pass
+    ok &= check("Exception rolls the whole block back", count() == 1 and
+                not db.connections.connection().in_transaction)
+    
+    ok &= check("Bulk add of 1,000 findings", db.add_vulnerabilities([make_vuln(f"V{i:04d}") for i in range(1000)])
+                and count() == 1001)
+    ok &= check("Upsert updates in place", db.add_vulnerability(make_vuln('A', version='1.1.2')) and
+                db.get_vulnerability('A')['affected_version'] == '1.1.2' and count() == 1001)
+    
+    counts = []
+    readers = [threading.Thread(target=lambda: counts.append(count())) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    ok &= check("Concurrent readers on their own connections", counts == [1001] * 4)
+    db.close()
+    return ok
+
+
+def test_scan_delta(db_path: Path) -> bool:
+    """Rescans report new, changed and resolved findings and keep triage"""
+    print("\n🗄  Testing scan deltas...")
+    db = vms.VulnerabilityDatabase(str(db_path))
+    Status = vms.VulnerabilityStatus
+    
+    def status(vuln_id: str) -> str:
+        return db.get_vulnerability(vuln_id)['status']
+    
+    delta = db.ingest_scan({'img1': [make_vuln('A'), make_vuln('B'), make_vuln('C')], 'img2': [make_vuln('D')]})
+    ok = check("First scan: everything new", delta.new == {'A', 'B', 'C', 'D'} and not delta.changed)
+    db.update_vulnerability_status('A', Status.ACCEPTED)
+    db.update_vulnerability_status('B', Status.IN_PROGRESS)
+    
+    delta = db.ingest_scan({'img1': [make_vuln('A', version='1.1.2'), make_vuln('B'), make_vuln('E')]})
+    ok &= check("Rescan: new, changed, resolved and unchanged sets",
+                delta.new == {'E'} and delta.changed == {'A'} and delta.resolved == {'C'} and delta.unchanged == 1)
+    ok &= check("Changed finding keeps its triage", status('A') == 'accepted' and
+                db.get_vulnerability('A')['affected_version'] == '1.1.2')
+    ok &= check("Missing finding resolved, other targets untouched", status('D') == 'new' and status('C') == 'resolved')
+    
+    delta = db.ingest_scan({'img1': [make_vuln('A', version='1.1.2'), make_vuln('E')]})
+    ok &= check("In-progress finding resolved", delta.resolved == {'B'} and status('B') == 'resolved')
+    
+    delta = db.ingest_scan({'img1': [make_vuln(v, version='1.1.2' if v == 'A' else '1.1.1') for v in 'ABCE']})
+    ok &= check("Reappearing findings reported as changed", delta.changed == {'B', 'C'} and not delta.new)
+    ok &= check("Triage status restored on reappearance", status('B') == 'in_progress' and status('C') == 'new' and
+                db.get_vulnerability('B')['status_before_resolve'] is None)
+    
+    delta = db.ingest_scan({'img1': [make_vuln('A', version='1.1.2')]}, complete=[])
+    ok &= check("Incomplete scan resolves nothing", not delta.resolved and status('B') == 'in_progress')
+    
+    db.update_vulnerability_status('D', Status.FALSE_POSITIVE)
+    delta = db.ingest_scan({'img2': []})
+    ok &= check("False positives are not resolved", not delta.resolved and status('D') == 'false_positive')
+    
+    scan_id = db.begin_scan()
+    db.stage_findings(scan_id, 'img1', [make_vuln('F')])
+    db.discard_scan(scan_id)
+    ok &= check("Discarded scan leaves no trace", db.get_vulnerability('F') is None and
+                db.connections.connection().execute('SELECT COUNT(*) FROM scan_staging').fetchone()[0] == 0)
+    db.close()
+    return ok
+
+
+def test_migration(db_path: Path) -> bool:
+    """Schema 0 databases get target-scoped finding IDs"""
+    print("\n🗄  Testing migration from schema 0...")
+    legacy = sqlite3.connect(str(db_path))
+    legacy.executescript('''
+        CREATE TABLE vulnerabilities (
+            vuln_id TEXT PRIMARY KEY, cve_id TEXT, title TEXT NOT NULL, description TEXT,
+            severity TEXT NOT NULL, cvss_score REAL, affected_component TEXT NOT NULL,
+            affected_version TEXT, fixed_version TEXT, discovered_date TIMESTAMP, status TEXT NOT NULL,
+            remediation TEXT, "references" TEXT, tags TEXT, risk_score INTEGER, priority INTEGER,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, scan_target TEXT
+        );
+        CREATE TABLE patches (patch_id TEXT PRIMARY KEY, vuln_id TEXT NOT NULL, patch_type TEXT NOT NULL);
+        CREATE TABLE remediation_history (remediation_id TEXT PRIMARY KEY, vuln_id TEXT NOT NULL, notes TEXT);
+        INSERT INTO vulnerabilities (vuln_id, title, severity, affected_component, status, priority, scan_target)
+        VALUES ('A', 'openssl flaw', 'high', 'openssl', 'accepted', 50, 'img1'),
+               ('B', 'zlib flaw', 'low', 'zlib', 'new', 10, 'img2'),
+               ('M', 'manual entry', 'low', 'kernel', 'new', 5, NULL);
+        INSERT INTO patches VALUES ('P1', 'A', 'update');
+        INSERT INTO remediation_history VALUES ('R1', 'B', 'triaged');
+    ''')
+    legacy.commit()
+    ok = check("Legacy database at user_version 0",
+               legacy.execute('PRAGMA user_version').fetchone()[0] == 0)
+    legacy.close()
+    
+    db = vms.VulnerabilityDatabase(str(db_path))
+    conn = db.connections.connection()
+    scoped_a = db.scoped_vuln_id('A', 'img1')
+    scoped_b = db.scoped_vuln_id('B', 'img2')
+    ok &= check("user_version bumped to 1", conn.execute('PRAGMA user_version').fetchone()[0] == 1)
+    ok &= check("Scanner findings rescoped, manual entries kept",
+                {row[0] for row in conn.execute('SELECT vuln_id FROM vulnerabilities')} == {scoped_a, scoped_b, 'M'}
+                and db.get_vulnerability(scoped_a)['status'] == 'accepted')
+    ok &= check("Patches and remediation history follow their findings",
+                conn.execute("SELECT vuln_id FROM patches").fetchone()[0] == scoped_a and
+                conn.execute("SELECT vuln_id FROM remediation_history").fetchone()[0] == scoped_b)
+    ok &= check("New columns added", 'status_before_resolve' in db.get_vulnerability('M'))
+    ok &= check("Migrated findings searchable", [r['vuln_id'] for r in db.search_vulnerabilities('zlib')[0]] == [scoped_b])
+    db.close()
+    
+    db = vms.VulnerabilityDatabase(str(db_path))
+    ok &= check("Migration runs once", db.get_vulnerability(scoped_a) is not None and
+                db.get_vulnerability(db.scoped_vuln_id(scoped_a, 'img1')) is None)
+    db.close()
+    return ok
+
+
+def main():
+    """Run all vulnerability database tests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [test_connections(Path(tmp) / 'connections.db'),
+                   test_transactions(Path(tmp) / 'transactions.db'),
+                   test_scan_delta(Path(tmp) / 'delta.db'),
+                   test_migration(Path(tmp) / 'legacy.db')]
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} vulnerability database tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
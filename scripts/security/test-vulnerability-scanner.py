@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Test script for vulnerability scanning
+Runs the scanner and scan scheduler against a fake trivy on PATH
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# The system is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'vulnerability_management_system', Path(__file__).resolve().parent / 'vulnerability-management-system.py'
+)
+vms = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(vms)
+
+# Fake trivy: filesystem targets are directories whose files steer the scan
+#   findings      number of findings to report (default 5)
+#   trivy_target  Trivy Target the findings are reported under
+#   sleep         seconds to take
+#   pause         seconds to stall after the first finding
+#   huge          description length of the first finding
+# Targets named broken* fail after partial output and flaky* fail on their
+# first attempt. Calls are logged to the state directory, which also holds
+# the vulnerability DB metadata; an offline file there fails DB downloads.
+FAKE_TRIVY = '''#!{python}
+import json, os, sys, time
+state = os.environ['FAKE_TRIVY_STATE']
+args = sys.argv[1:]
+
+def log(line):
+    with open(os.path.join(state, 'calls'), 'a') as f:
+        f.write(line + '\\n')
+
+if args[0] == 'version':
+    with open(os.path.join(state, 'dbmeta.json')) as f:
+        print(json.dumps({{'VulnerabilityDB': json.load(f)}}))
+    sys.exit(0)
+if '--download-db-only' in args:
+    log('download')
+    if os.path.exists(os.path.join(state, 'offline')):
+        sys.exit(1)
+    with open(os.path.join(state, 'dbmeta.json'), 'w') as f:
+        json.dump({{'Version': 2, 'UpdatedAt': '2026-10-01T00:00:00.123456789Z',
+                   'NextUpdate': '2099-01-01T00:00:00.987654321Z'}}, f)
+    sys.exit(0)
+
+def setting(name, default):
+    try:
+        with open(os.path.join(target, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+target = args[-1]
+name = os.path.basename(target)
+log(f"start {{target}} {{time.time()}}")
+time.sleep(float(setting('sleep', 0)))
+findings = int(setting('findings', 5))
+huge = int(setting('huge', 0))
+for i in range(findings):
+    sys.stdout.write(json.dumps({{'Target': setting('trivy_target', 'requirements.txt'), 'Vulnerability': {{
+        'VulnerabilityID': f"CVE-2024-{{i}}", 'PkgName': f"pkg{{i}}", 'InstalledVersion': '1.0',
+        'FixedVersion': '1.1', 'Severity': ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW'][i % 4],
+        'Title': f"Issue {{i}}", 'Description': 'x' * (huge if i == 0 and huge else 200), 'References': []
+    }}}}) + '\\n')
+    if i == 0:
+        sys.stdout.flush()
+        time.sleep(float(setting('pause', 0)))
+sys.stdout.flush()
+log(f"end {{target}} {{time.time()}}")
+with open(os.path.join(state, 'calls')) as f:
+    attempts = f.read().count(f"start {{target}} ")
+if name.startswith('broken') or (name.startswith('flaky') and attempts == 1):
+    sys.exit(2)
+'''
+
+
+class PoisonPrioritizer(vms.VulnerabilityPrioritizer):
+    """Prioritizer that fails on findings of the poison target"""
+    
+    async def prioritize_vulnerabilities(self, vulnerabilities):
+        if any(v.affected_component.startswith('poison') for v in vulnerabilities):
+            raise RuntimeError('prioritizer failure')
+        return await super().prioritize_vulnerabilities(vulnerabilities)
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+def make_target(root: Path, name: str, **settings) -> str:
+    path = root / name
+    path.mkdir()
+    for setting, value in settings.items():
+        (path / setting).write_text(str(value))
+    return str(path)
+
+
+def calls(state: Path) -> list:
+    log = state / 'calls'
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def peak_concurrency(state: Path) -> int:
+    """Most scanner processes running at once, from the call log"""
+    events = []
+    for line in calls(state):
+        kind, _, timestamp = line.split()
+        events.append((float(timestamp), 1 if kind == 'start' else -1))
+    running = peak = 0
+    for _, change in sorted(events):
+        running += change
+        peak = max(peak, running)
+    return peak
+
+
+def scans_of(state: Path, target: str) -> int:
+    return sum(1 for line in calls(state) if line.startswith(f"start {target} "))
+
+
+def write_db_metadata(state: Path, updated: str, next_update: str):
+    (state / 'dbmeta.json').write_text(json.dumps({'Version': 2, 'UpdatedAt': updated, 'NextUpdate': next_update}))
+
+
+def staged_rows(db) -> int:
+    return db.connections.connection().execute('SELECT COUNT(*) FROM scan_staging').fetchone()[0]
+
+
+def stored_rows(db) -> int:
+    return db.connections.connection().execute('SELECT COUNT(*) FROM vulnerabilities').fetchone()[0]
+
+
+async def test_parallelism(root: Path, state: Path) -> bool:
+    """Scans run concurrently up to the worker limit and merge per target"""
+    print("\n🔎 Testing parallel scans...")
+    db = vms.VulnerabilityDatabase(str(root / 'parallel.db'))
+    scanner = vms.VulnerabilityScanner(db)
+    updates = []
+    scheduler = vms.ScanScheduler(scanner, vms.VulnerabilityPrioritizer(db), db, max_workers=2,
+                                  memory_budget_mb=4096, batch_size=7,
+                                  progress_callback=lambda progress, target, status: updates.append(target))
+    targets = [make_target(root, f"app{i}", sleep=0.3, findings=20) for i in range(4)]
+    results, delta, progress = await scheduler.run(targets + targets[:1])
+    
+    ok = check(f"At most 2 scans at once (peak {peak_concurrency(state)})", peak_concurrency(state) == 2)
+    ok &= check("Duplicate targets scanned once", len(calls(state)) == 8 and sorted(updates) == sorted(targets))
+    ok &= check("Every target completed", progress.completed == 4 and not progress.failed and
+                progress.findings == 80 and progress.running == 0 and progress.pending == 0)
+    ok &= check("Severity counts per target", all(results[t] == {'critical': 5, 'high': 5, 'medium': 5, 'low': 5}
+                                                  for t in targets))
+    # All four targets report the same Trivy Target and CVEs
+    ok &= check("Findings scoped to their scan target", len(delta.new) == 80 and stored_rows(db) == 80)
+    ok &= check("Memory budget caps workers",
+                vms.ScanScheduler(scanner, None, db, max_workers=8, memory_budget_mb=1024).workers == 2)
+    db.close()
+    return ok
+
+
+async def test_failures(root: Path, state: Path) -> bool:
+    """Failed scans are retried, and failures never merge partial results"""
+    print("\n🔎 Testing retries and failures...")
+    db = vms.VulnerabilityDatabase(str(root / 'failures.db'))
+    scanner = vms.VulnerabilityScanner(db)
+    scheduler = vms.ScanScheduler(scanner, PoisonPrioritizer(db), db, max_workers=4,
+                                  memory_budget_mb=4096, retries=2, backoff=0.01)
+    good = make_target(root, 'good')
+    flaky = make_target(root, 'flaky')
+    broken = make_target(root, 'broken', findings=50)
+    poison = make_target(root, 'poison', trivy_target='poison.lock')
+    results, delta, progress = await scheduler.run([good, flaky, broken, poison])
+    
+    attempts = [line.split()[1] for line in calls(state) if line.startswith('start')]
+    ok = check("Flaky target retried once and merged", attempts.count(flaky) == 2 and sum(results[flaky].values()) == 5)
+    ok &= check("Broken target gave up after 3 attempts", attempts.count(broken) == 3 and not results[broken])
+    ok &= check("Prioritizer exception contained to its target", not results[poison] and
+                sum(results[good].values()) == 5)
+    ok &= check(f"Progress: {progress.completed} completed, {progress.failed} failed, {progress.retries} retries",
+                progress.completed == 2 and progress.failed == 2 and progress.retries == 5)
+    ok &= check("No partial findings merged or left staged",
+                stored_rows(db) == 10 and len(delta.new) == 10 and staged_rows(db) == 0)
+    ok &= check("Scanner records the failed target", broken in scanner.failed_targets and
+                flaky not in scanner.failed_targets)
+    db.close()
+    return ok
+
+
+async def test_cache(root: Path, state: Path) -> bool:
+    """Unchanged targets are served from the cache until the scanner DB changes"""
+    print("\n💾 Testing the scan cache...")
+    write_db_metadata(state, '2026-10-01T00:00:00Z', '2099-01-01T00:00:00Z')
+    db = vms.VulnerabilityDatabase(str(root / 'cache-vulns.db'))
+    cache = vms.ScanCache(str(root / 'cache.db'), metrics_file=root / 'cache.prom')
+    scanner = vms.VulnerabilityScanner(db, cache)
+    target = make_target(root, 'app', findings=30)
+    
+    first = [v.vuln_id for v in await scanner.scan_filesystem(target)]
+    second = [v.vuln_id for v in await scanner.scan_filesystem(target)]
+    ok = check("Second scan served from the cache", scans_of(state, target) == 1 and
+               cache.stats['misses'] == 1 and cache.stats['hits'] == 1)
+    ok &= check("Cached findings scoped like fresh ones", second == first and len(first) == 30 and
+                first[0] == db.scoped_vuln_id(scanner._generate_vuln_id('CVE-2024-0', 'pkg0', 'requirements.txt'),
+                                              target))
+    
+    (Path(target) / 'findings').write_text('40')
+    ok &= check("Changed target rescanned", len(await scanner.scan_filesystem(target)) == 40 and
+                scans_of(state, target) == 2)
+    
+    broken = make_target(root, 'broken')
+    await scanner.scan_filesystem(broken)
+    await scanner.scan_filesystem(broken)
+    ok &= check("Failed scans are not cached", scans_of(state, broken) == 2 and cache.get_metrics()['entries'] == 2)
+    
+    write_db_metadata(state, '2026-10-02T00:00:00Z', '2099-01-01T00:00:00Z')
+    await vms.VulnerabilityScanner(db, cache).scan_filesystem(target)
+    ok &= check("New scanner DB version invalidates entries", scans_of(state, target) == 3)
+    
+    cache.write_metrics()
+    metrics = (root / 'cache.prom').read_text()
+    ok &= check("Metrics exported", 'vulnerability_scan_cache_hits_total 1' in metrics and
+                'vulnerability_scan_cache_entries 3' in metrics)
+    cache.close()
+    db.close()
+    return ok
+
+
+async def test_stale_db(root: Path, state: Path) -> bool:
+    """A DB past its NextUpdate is refreshed, or bypasses the cache if it cannot be"""
+    print("\n💾 Testing stale scanner DBs...")
+    db = vms.VulnerabilityDatabase(str(root / 'stale-vulns.db'))
+    cache = vms.ScanCache(str(root / 'stale-cache.db'), metrics_file=None)
+    target = make_target(root, 'app')
+    
+    write_db_metadata(state, '2020-01-01T00:00:00Z', '2020-01-02T00:00:00.5Z')
+    await vms.VulnerabilityScanner(db, cache).scan_filesystem(target)
+    ok = check("Stale DB downloaded before caching", 'download' in calls(state) and
+               cache.get_metrics()['entries'] == 1 and not cache.stats['uncacheable'])
+    
+    write_db_metadata(state, '2020-01-01T00:00:00Z', '2020-01-02T00:00:00Z')
+    (state / 'offline').touch()
+    scanner = vms.VulnerabilityScanner(db, cache)
+    await scanner.scan_filesystem(target)
+    await scanner.scan_filesystem(target)
+    ok &= check("DB that stays stale is not served from the cache",
+                scans_of(state, target) == 3 and cache.stats['uncacheable'] == 2 and not cache.stats['hits'])
+    ok &= check("Download attempted once per version lookup", calls(state).count('download') == 2)
+    cache.close()
+    db.close()
+    return ok
+
+
+async def test_eviction(root: Path, state: Path) -> bool:
+    """Entries over the size budget are evicted least recently used first"""
+    print("\n💾 Testing cache eviction...")
+    write_db_metadata(state, '2026-10-01T00:00:00Z', '2099-01-01T00:00:00Z')
+    db = vms.VulnerabilityDatabase(str(root / 'evict-vulns.db'))
+    cache = vms.ScanCache(str(root / 'evict-cache.db'), metrics_file=None)
+    scanner = vms.VulnerabilityScanner(db, cache)
+    first, second, third = (make_target(root, name, findings=50) for name in ('first', 'second', 'third'))
+    
+    await scanner.scan_filesystem(first)
+    # All entries are the same size; room for two
+    cache.max_bytes = cache.get_metrics()['bytes'] * 5 // 2
+    await scanner.scan_filesystem(second)
+    await scanner.scan_filesystem(first)
+    await scanner.scan_filesystem(third)
+    ok = check("Least recently used entry evicted", cache.stats['evictions'] == 1 and
+               cache.get_metrics()['entries'] == 2)
+    
+    await scanner.scan_filesystem(first)
+    await scanner.scan_filesystem(second)
+    ok &= check("Recently used entry kept", scans_of(state, first) == 1 and scans_of(state, second) == 2)
+    cache.close()
+    db.close()
+    return ok
+
+
+async def test_streaming(root: Path, state: Path) -> bool:
+    """Findings are yielded while the scanner is still reporting"""
+    print("\n🌊 Testing streamed reports...")
+    db = vms.VulnerabilityDatabase(str(root / 'stream.db'))
+    scanner = vms.VulnerabilityScanner(db)
+    
+    slow = make_target(root, 'slow', findings=5, pause=1.0)
+    start = time.monotonic()
+    first_at, count = None, 0
+    async for _ in scanner.stream_filesystem(slow):
+        first_at = first_at or time.monotonic() - start
+        count += 1
+    ok = check(f"First finding after {first_at:.2f}s of a {time.monotonic() - start:.2f}s scan",
+               first_at < 0.5 and count == 5)
+    
+    big = make_target(root, 'big', findings=50000)
+    tracemalloc.start()
+    count = 0
+    async for _ in scanner.stream_filesystem(big):
+        count += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    ok &= check(f"50,000 findings streamed with {peak / 1024 / 1024:.1f} MiB peak", count == 50000 and
+                peak < 16 * 1024 * 1024)
+    
+    scheduler = vms.ScanScheduler(scanner, vms.VulnerabilityPrioritizer(db), db, max_workers=1,
+                                  memory_budget_mb=4096, batch_size=1000)
+    _, delta, progress = await scheduler.run([big])
+    ok &= check("Large report staged in batches and merged", progress.findings == 50000 and
+                len(delta.new) == 50000 and stored_rows(db) == 50000 and staged_rows(db) == 0)
+    db.close()
+    return ok
+
+
+async def test_long_lines(root: Path, state: Path) -> bool:
+    """A line over the limit fails the scan instead of buffering it"""
+    print("\n🌊 Testing over-long report lines...")
+    db = vms.VulnerabilityDatabase(str(root / 'long.db'))
+    scanner = vms.VulnerabilityScanner(db)
+    
+    fits = make_target(root, 'fits', huge=vms.VulnerabilityScanner.TRIVY_LINE_LIMIT // 2)
+    ok = check("Lines under the limit are read", len(await scanner.scan_filesystem(fits)) == 5 and
+               fits not in scanner.failed_targets)
+    
+    huge = make_target(root, 'huge', huge=vms.VulnerabilityScanner.TRIVY_LINE_LIMIT * 4)
+    scheduler = vms.ScanScheduler(scanner, vms.VulnerabilityPrioritizer(db), db, max_workers=1,
+                                  memory_budget_mb=4096, retries=0)
+    results, _, progress = await scheduler.run([huge])
+    ok &= check("Over-long line fails the target", progress.failed == 1 and not results[huge] and
+                huge in scanner.failed_targets)
+    ok &= check("Scanner stopped without finishing its report", scans_of(state, huge) == 1 and
+                not any(line.startswith(f"end {huge} ") for line in calls(state)))
+    ok &= check("Nothing merged from the failed scan", stored_rows(db) == 0 and staged_rows(db) == 0)
+    db.close()
+    return ok
+
+
+async def run_test(test, root: Path) -> bool:
+    """Run a test with its own directory and empty call log"""
+    directory = Path(tempfile.mkdtemp(dir=root))
+    state = directory / 'state'
+    state.mkdir()
+    os.environ['FAKE_TRIVY_STATE'] = str(state)
+    return await test(directory, state)
+
+
+async def main():
+    """Run all scanner tests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_dir = Path(tmp) / 'bin'
+        bin_dir.mkdir()
+        trivy = bin_dir / 'trivy'
+        trivy.write_text(FAKE_TRIVY.format(python=sys.executable))
+        trivy.chmod(0o755)
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        
+        results = [await run_test(test_parallelism, Path(tmp)),
+                   await run_test(test_failures, Path(tmp)),
+                   await run_test(test_cache, Path(tmp)),
+                   await run_test(test_stale_db, Path(tmp)),
+                   await run_test(test_eviction, Path(tmp)),
+                   await run_test(test_streaming, Path(tmp)),
+                   await run_test(test_long_lines, Path(tmp))]
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} scanner tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
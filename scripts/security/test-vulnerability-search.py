@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for vulnerability search
+Checks full-text matching, filters and keyset paging against a temporary database
+"""
+
+import importlib.util
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# The system is an installed script rather than a module; load it by path
+_spec = importlib.util.spec_from_file_location(
+    'vulnerability_management_system', Path(__file__).resolve().parent / 'vulnerability-management-system.py'
+)
+vms = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(vms)
+
+Status = vms.VulnerabilityStatus
+Severity = vms.Severity
+
+COMPONENTS = ['requirements.txt:django', 'requirements.txt:django-rest-framework', 'ubuntu:openssl',
+              'ubuntu:libssl3', 'package-lock.json:ssl-root-cas']
+TITLES = ['Heap buffer overflow in parser', 'SQL injection in query builder', 'Denial of service via regex']
+
+
+def make_vuln(i: int, title: Optional[str] = None) -> 'vms.Vulnerability':
+    return vms.Vulnerability(
+        vuln_id=f"V{i:04d}", cve_id=f"CVE-2024-{i:04d}", title=title or TITLES[i % len(TITLES)],
+        description=f"Finding number {i}", severity=list(Severity)[i % 4], cvss_score=5.0,
+        affected_component=COMPONENTS[i % len(COMPONENTS)], affected_version='1.0', fixed_version=None,
+        discovered_date=datetime.now(), status=Status.NEW if i % 3 else Status.TRIAGED,
+        remediation=None, priority=i % 7 * 10
+    )
+
+
+def check(description: str, condition: bool) -> bool:
+    print(f"   {'✅' if condition else '❌'} {description}")
+    return condition
+
+
+def ids(rows) -> list:
+    return [row['vuln_id'] for row in rows]
+
+
+def all_pages(db, limit: int = 40, **filters) -> list:
+    """IDs of every page of a search, following the cursor"""
+    found, cursor = [], None
+    while True:
+        rows, cursor = db.search_vulnerabilities(limit=limit, after=cursor, **filters)
+        found.extend(ids(rows))
+        if cursor is None:
+            return found
+
+
+def expected(vulns, match=lambda v: True) -> list:
+    """IDs in search order: priority, then ID, descending"""
+    return [v.vuln_id for v in sorted(vulns, key=lambda v: (v.priority, v.vuln_id), reverse=True) if match(v)]
+
+
+def test_text_search(db, vulns) -> bool:
+    """All words must match somewhere in the searchable columns"""
+    print("\n🔍 Testing full-text search...")
+    ok = check("Full-text index available", db.fts_enabled)
+    ok &= check("Words matched across title and description",
+                ids(db.search_vulnerabilities('overflow number', limit=None)[0]) ==
+                expected(vulns, lambda v: 'overflow' in v.title))
+    ok &= check("CVE IDs searchable", ids(db.search_vulnerabilities('CVE-2024-0042')[0]) == ['V0042'])
+    ok &= check("Query syntax treated as text", db.search_vulnerabilities('"injection" OR (NEAR')[0] == [])
+    
+    db.add_vulnerability(make_vuln(7, title='Use after free in allocator'))
+    ok &= check("Index follows updates", ids(db.search_vulnerabilities('allocator')[0]) == ['V0007'] and
+                'V0007' not in ids(db.search_vulnerabilities('injection', limit=None)[0]))
+    db.add_vulnerability(vulns[7])
+    return ok
+
+
+def test_filters(db, vulns) -> bool:
+    """Status, severity and component filters, alone and combined"""
+    print("\n🔍 Testing filters...")
+    ok = check("Status filter", ids(db.get_vulnerabilities(status=Status.TRIAGED)) ==
+               expected(vulns, lambda v: v.status == Status.TRIAGED))
+    ok &= check("Severity filter with text", ids(db.search_vulnerabilities(
+        'injection', severity=Severity.CRITICAL, limit=None)[0]) ==
+        expected(vulns, lambda v: v.severity == Severity.CRITICAL and 'injection' in v.title))
+    
+    def component(query: str) -> set:
+        return {row['affected_component'] for row in db.get_vulnerabilities(component=query)}
+    
+    ok &= check("Component matches whole words by prefix",
+                component('django') == {'requirements.txt:django', 'requirements.txt:django-rest-framework'} and
+                component('open') == {'ubuntu:openssl'} and
+                component('ubuntu libssl3') == {'ubuntu:libssl3'})
+    # Word-prefix rather than substring: ssl no longer matches inside libssl3 or openssl
+    ok &= check("Component does not match inside words", component('ssl') == {'package-lock.json:ssl-root-cas'})
+    ok &= check("Component words only match the component", component('overflow') == set())
+    
+    db.fts_enabled = False
+    try:
+        ok &= check("Without FTS5 components fall back to substring matching",
+                    component('ssl') == {'ubuntu:openssl', 'ubuntu:libssl3', 'package-lock.json:ssl-root-cas'} and
+                    ids(db.search_vulnerabilities('overflow number', limit=None)[0]) ==
+                    expected(vulns, lambda v: 'overflow' in v.title))
+    finally:
+        db.fts_enabled = True
+    return ok
+
+
+def test_paging(db, vulns) -> bool:
+    """Keyset pages cover every match once, across priority ties"""
+    print("\n🔍 Testing keyset paging...")
+    ok = check("Unfiltered pages", all_pages(db) == expected(vulns))
+    ok &= check("Pages of a text search", all_pages(db, limit=7, text='injection') ==
+                expected(vulns, lambda v: 'injection' in v.title))
+    ok &= check("Pages of a filtered component search",
+                all_pages(db, limit=9, component='django', status=Status.NEW) ==
+                expected(vulns, lambda v: 'django' in v.affected_component and v.status == Status.NEW))
+    
+    rows, cursor = db.search_vulnerabilities(limit=len(vulns) + 1)
+    ok &= check("Short last page has no cursor", len(rows) == len(vulns) and cursor is None)
+    return ok
+
+
+def main():
+    """Run all vulnerability search tests"""
+    vulns = [make_vuln(i) for i in range(250)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = vms.VulnerabilityDatabase(str(Path(tmp) / 'search.db'))
+        db.add_vulnerabilities(vulns)
+        results = [test_text_search(db, vulns), test_filters(db, vulns), test_paging(db, vulns)]
+        db.close()
+    
+    print(f"\n{'✅ All' if all(results) else '❌ Some'} vulnerability search tests passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
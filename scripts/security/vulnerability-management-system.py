@@ -6,15 +6,23 @@ Tracks, prioritizes, and manages vulnerabilities across the infrastructure
 
 import asyncio
 import json
+import os
+import re
 import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Set, Tuple, AsyncIterator, Iterable, Iterator
 import logging
 import subprocess
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 import hashlib
+import time
+import uuid
+import zlib
 import requests
 import yaml
 
@@ -34,6 +42,7 @@ class VulnerabilityStatus(Enum):
     MITIGATED = "mitigated"
     ACCEPTED = "accepted"
     FALSE_POSITIVE = "false_positive"
+    RESOLVED = "resolved"  # No longer reported by a rescan; prior status returns if it reappears
 
 
 class Severity(Enum):
@@ -83,210 +92,773 @@ class VulnerabilityPatch:
     applied_date: Optional[datetime] = None
 
 
+@dataclass
+class ScanDelta:
+    """Differences between a scan and the stored vulnerabilities of its targets"""
+    new: Set[str] = field(default_factory=set)
+    changed: Set[str] = field(default_factory=set)
+    resolved: Set[str] = field(default_factory=set)
+    unchanged: int = 0
+
+
+@dataclass
+class ScanProgress:
+    """Progress of a multi-target scan"""
+    total: int
+    completed: int = 0
+    failed: int = 0
+    running: int = 0
+    retries: int = 0
+    findings: int = 0
+    
+    @property
+    def pending(self) -> int:
+        return self.total - self.completed - self.failed - self.running
+
+
+class ConnectionManager:
+    """Persistent per-thread SQLite connections in WAL mode
+    
+    Each thread opens its connection once and keeps it, so statements stay
+    in the connection's prepared statement cache. Connections run in
+    autocommit mode and writes are grouped with transaction().
+    """
+    
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',      # WAL is still durable across application crashes
+        'mmap_size': 268435456,       # 256 MiB
+        'cache_size': -65536,         # 64 MiB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    }
+    
+    def __init__(self, db_path: Path, cached_statements: int = 256,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.pragmas = dict(self.PRAGMAS, **(pragmas or {}))
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+    
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.db_path),
+                isolation_level=None,
+                cached_statements=self.cached_statements,
+                check_same_thread=False  # Only so close() can run from any thread
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {pragma}={value}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block in one write transaction; nested blocks join the outer one"""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    def close(self):
+        """Close every thread's connection"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _fields_differ(fields: Tuple[str, ...], new: str, old: str) -> str:
+    """SQL condition true when any field differs between two row aliases"""
+    return ' OR '.join(f"{new}.{f} IS NOT {old}.{f}" for f in fields)
+
+
 class VulnerabilityDatabase:
     """SQLite database for vulnerability tracking"""
     
+    # Fixed statement text lets every call reuse the connection's prepared statement.
+    # Upserts update in place: REPLACE would delete rows without firing the
+    # triggers that keep the full-text index in sync.
+    UPSERT_VULNERABILITY = '''
+        INSERT INTO vulnerabilities
+        (vuln_id, cve_id, title, description, severity, cvss_score,
+         affected_component, affected_version, fixed_version,
+         discovered_date, status, remediation, "references", tags,
+         risk_score, priority)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (vuln_id) DO UPDATE SET
+            cve_id = excluded.cve_id, title = excluded.title, description = excluded.description,
+            severity = excluded.severity, cvss_score = excluded.cvss_score,
+            affected_component = excluded.affected_component,
+            affected_version = excluded.affected_version, fixed_version = excluded.fixed_version,
+            discovered_date = excluded.discovered_date, status = excluded.status,
+            remediation = excluded.remediation, "references" = excluded."references",
+            tags = excluded.tags, risk_score = excluded.risk_score, priority = excluded.priority,
+            last_updated = CURRENT_TIMESTAMP
+    '''
+    SELECT_VULNERABILITY = 'SELECT * FROM vulnerabilities WHERE vuln_id = ?'
+    SELECT_BY_CVE = 'SELECT * FROM vulnerabilities WHERE cve_id = ? ORDER BY priority DESC, vuln_id DESC'
+    
+    # Full-text index over the searchable columns, stored as an external content
+    # table and kept in sync by triggers
+    FTS_COLUMNS = 'title, description, affected_component, cve_id'
+    CREATE_FTS = (
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS vulnerabilities_fts USING fts5(
+            {FTS_COLUMNS}, content='vulnerabilities', content_rowid='rowid'
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS vulnerabilities_fts_insert AFTER INSERT ON vulnerabilities BEGIN
+            INSERT INTO vulnerabilities_fts (rowid, {FTS_COLUMNS})
+            VALUES (new.rowid, new.title, new.description, new.affected_component, new.cve_id);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS vulnerabilities_fts_delete AFTER DELETE ON vulnerabilities BEGIN
+            INSERT INTO vulnerabilities_fts (vulnerabilities_fts, rowid, {FTS_COLUMNS})
+            VALUES ('delete', old.rowid, old.title, old.description, old.affected_component, old.cve_id);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS vulnerabilities_fts_update
+        AFTER UPDATE OF {FTS_COLUMNS} ON vulnerabilities BEGIN
+            INSERT INTO vulnerabilities_fts (vulnerabilities_fts, rowid, {FTS_COLUMNS})
+            VALUES ('delete', old.rowid, old.title, old.description, old.affected_component, old.cve_id);
+            INSERT INTO vulnerabilities_fts (rowid, {FTS_COLUMNS})
+            VALUES (new.rowid, new.title, new.description, new.affected_component, new.cve_id);
+        END
+        '''
+    )
+    
+    # Bulk ingest: findings are staged in batches under a scan token and merged
+    # with set-based statements once the scan completes
+    SCAN_COLUMNS = (
+        'vuln_id, cve_id, title, description, severity, cvss_score, affected_component, '
+        'affected_version, fixed_version, discovered_date, status, remediation, "references", '
+        'tags, risk_score, priority, scan_target'
+    )
+    # Fields a rescan may change; status, discovered_date and triage are kept
+    SCAN_FIELDS = ('title', 'description', 'severity', 'cvss_score', 'affected_version',
+                   'fixed_version', 'remediation', '"references"', 'tags', 'risk_score', 'priority')
+    STAGE_RESULT = f'''
+        INSERT OR REPLACE INTO scan_staging (scan_id, staged_at, {SCAN_COLUMNS})
+        VALUES ({", ".join("?" * 19)})
+    '''
+    SELECT_NEW = '''
+        SELECT s.vuln_id FROM scan_staging s
+        LEFT JOIN vulnerabilities v ON v.vuln_id = s.vuln_id
+        WHERE s.scan_id = ? AND v.vuln_id IS NULL
+    '''
+    SELECT_CHANGED = f'''
+        SELECT s.vuln_id FROM scan_staging s
+        JOIN vulnerabilities v ON v.vuln_id = s.vuln_id
+        WHERE s.scan_id = ? AND (v.status = 'resolved' OR {_fields_differ(SCAN_FIELDS, 's', 'v')})
+    '''
+    SELECT_RESOLVED = '''
+        SELECT v.vuln_id FROM vulnerabilities v
+        WHERE v.scan_target = ?
+          AND v.status NOT IN ('resolved', 'false_positive')
+          AND NOT EXISTS (SELECT 1 FROM scan_staging s WHERE s.scan_id = ? AND s.vuln_id = v.vuln_id)
+    '''
+    MERGE_RESULTS = f'''
+        INSERT INTO vulnerabilities ({SCAN_COLUMNS})
+        SELECT {SCAN_COLUMNS} FROM scan_staging WHERE scan_id = ?
+        ON CONFLICT (vuln_id) DO UPDATE SET
+            {", ".join(f"{f} = excluded.{f}" for f in SCAN_FIELDS)},
+            scan_target = excluded.scan_target,
+            status = CASE WHEN status = 'resolved' THEN COALESCE(status_before_resolve, 'new') ELSE status END,
+            status_before_resolve = NULL,
+            last_updated = CURRENT_TIMESTAMP
+        WHERE status = 'resolved' OR scan_target IS NOT excluded.scan_target
+           OR {_fields_differ(SCAN_FIELDS, 'excluded', 'vulnerabilities')}
+    '''
+    RESOLVE = '''
+        UPDATE vulnerabilities
+        SET status_before_resolve = status, status = 'resolved', last_updated = CURRENT_TIMESTAMP
+        WHERE vuln_id = ?
+    '''
+    DISCARD_SCAN = 'DELETE FROM scan_staging WHERE scan_id = ?'
+    # Staged rows of scans that never finished, e.g. after a crash
+    EXPIRE_STAGING = 'DELETE FROM scan_staging WHERE staged_at < ?'
+    STAGING_MAX_AGE = 86400
+    UPDATE_STATUS = '''
+        UPDATE vulnerabilities
+        SET status = ?, status_before_resolve = NULL, last_updated = CURRENT_TIMESTAMP
+        WHERE vuln_id = ?
+    '''
+    INSERT_REMEDIATION = '''
+        INSERT INTO remediation_history
+        (remediation_id, vuln_id, action_type, action_date, notes)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    
     def __init__(self, db_path: str = "/var/lib/security/vulnerabilities.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connections = ConnectionManager(self.db_path)
         self.init_database()
     
     def init_database(self):
         """Initialize database schema"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        # Vulnerabilities table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vulnerabilities (
-                vuln_id TEXT PRIMARY KEY,
-                cve_id TEXT,
-                title TEXT NOT NULL,
-                description TEXT,
-                severity TEXT NOT NULL,
-                cvss_score REAL,
-                affected_component TEXT NOT NULL,
-                affected_version TEXT,
-                fixed_version TEXT,
-                discovered_date TIMESTAMP,
-                status TEXT NOT NULL,
-                remediation TEXT,
-                references TEXT,
-                tags TEXT,
-                risk_score INTEGER,
-                priority INTEGER,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Patches table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patches (
-                patch_id TEXT PRIMARY KEY,
-                vuln_id TEXT NOT NULL,
-                patch_type TEXT NOT NULL,
-                description TEXT,
-                commands TEXT,
-                test_commands TEXT,
-                rollback_commands TEXT,
-                estimated_downtime INTEGER,
-                risk_level TEXT,
-                tested BOOLEAN DEFAULT FALSE,
-                applied BOOLEAN DEFAULT FALSE,
-                applied_date TIMESTAMP,
-                FOREIGN KEY (vuln_id) REFERENCES vulnerabilities (vuln_id)
-            )
-        ''')
-        
-        # Scan history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scan_history (
-                scan_id TEXT PRIMARY KEY,
-                scan_date TIMESTAMP,
-                scan_type TEXT,
-                target TEXT,
-                vulnerabilities_found INTEGER,
-                new_vulnerabilities INTEGER,
-                scan_duration INTEGER
+        with self.connections.transaction() as conn:
+            # Vulnerabilities table; "references" is an SQL keyword and must be quoted
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS vulnerabilities (
+                    vuln_id TEXT PRIMARY KEY,
+                    cve_id TEXT,
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    severity TEXT NOT NULL,
+                    cvss_score REAL,
+                    affected_component TEXT NOT NULL,
+                    affected_version TEXT,
+                    fixed_version TEXT,
+                    discovered_date TIMESTAMP,
+                    status TEXT NOT NULL,
+                    remediation TEXT,
+                    "references" TEXT,
+                    tags TEXT,
+                    risk_score INTEGER,
+                    priority INTEGER,
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Patches table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS patches (
+                    patch_id TEXT PRIMARY KEY,
+                    vuln_id TEXT NOT NULL,
+                    patch_type TEXT NOT NULL,
+                    description TEXT,
+                    commands TEXT,
+                    test_commands TEXT,
+                    rollback_commands TEXT,
+                    estimated_downtime INTEGER,
+                    risk_level TEXT,
+                    tested BOOLEAN DEFAULT FALSE,
+                    applied BOOLEAN DEFAULT FALSE,
+                    applied_date TIMESTAMP,
+                    FOREIGN KEY (vuln_id) REFERENCES vulnerabilities (vuln_id)
+                )
+            ''')
+            
+            # Scan history table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scan_history (
+                    scan_id TEXT PRIMARY KEY,
+                    scan_date TIMESTAMP,
+                    scan_type TEXT,
+                    target TEXT,
+                    vulnerabilities_found INTEGER,
+                    new_vulnerabilities INTEGER,
+                    scan_duration INTEGER
+                )
+            ''')
+            
+            # Remediation history
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS remediation_history (
+                    remediation_id TEXT PRIMARY KEY,
+                    vuln_id TEXT NOT NULL,
+                    action_type TEXT,
+                    action_date TIMESTAMP,
+                    performed_by TEXT,
+                    success BOOLEAN,
+                    notes TEXT,
+                    FOREIGN KEY (vuln_id) REFERENCES vulnerabilities (vuln_id)
+                )
+            ''')
+            
+            # Target a finding was last reported for, so rescans can resolve it
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(vulnerabilities)')}
+            if 'scan_target' not in columns:
+                conn.execute('ALTER TABLE vulnerabilities ADD COLUMN scan_target TEXT')
+            # Triage status of a resolved finding, restored if a rescan reports it again
+            if 'status_before_resolve' not in columns:
+                conn.execute('ALTER TABLE vulnerabilities ADD COLUMN status_before_resolve TEXT')
+            
+            # Findings of in-progress scans
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scan_staging (
+                    scan_id TEXT NOT NULL,
+                    staged_at REAL NOT NULL,
+                    vuln_id TEXT NOT NULL,
+                    cve_id TEXT,
+                    title TEXT,
+                    description TEXT,
+                    severity TEXT,
+                    cvss_score REAL,
+                    affected_component TEXT,
+                    affected_version TEXT,
+                    fixed_version TEXT,
+                    discovered_date TIMESTAMP,
+                    status TEXT,
+                    remediation TEXT,
+                    "references" TEXT,
+                    tags TEXT,
+                    risk_score INTEGER,
+                    priority INTEGER,
+                    scan_target TEXT,
+                    PRIMARY KEY (scan_id, vuln_id)
+                )
+            ''')
+            conn.execute(self.EXPIRE_STAGING, (time.time() - self.STAGING_MAX_AGE,))
+            
+            # Schema 1: finding IDs are scoped to the scan target
+            if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                self._scope_vuln_ids(conn)
+                conn.execute('PRAGMA user_version = 1')
+            
+            # Create indexes
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_scan_target ON vulnerabilities(scan_target, status)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_severity ON vulnerabilities(severity)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_status ON vulnerabilities(status)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_component ON vulnerabilities(affected_component)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_cve ON vulnerabilities(cve_id)')
+            # Keyset pagination in priority order, optionally within one status
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_priority ON vulnerabilities(priority, vuln_id)')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_vuln_status_priority ON vulnerabilities(status, priority, vuln_id)'
             )
-        ''')
+            
+            self.fts_enabled = self._init_fts(conn)
+    
+    @staticmethod
+    def scoped_vuln_id(vuln_id: str, scan_target: str) -> str:
+        """ID of a scanner finding within one scan target
         
-        # Remediation history
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS remediation_history (
-                remediation_id TEXT PRIMARY KEY,
-                vuln_id TEXT NOT NULL,
-                action_type TEXT,
-                action_date TIMESTAMP,
-                performed_by TEXT,
-                success BOOLEAN,
-                notes TEXT,
-                FOREIGN KEY (vuln_id) REFERENCES vulnerabilities (vuln_id)
-            )
+        Scanners name findings after their own notion of target (a Trivy
+        Target such as an OS or lock file), which different images and
+        paths share; the scan target keeps their findings apart.
+        """
+        return hashlib.sha256(f"{vuln_id}@{scan_target}".encode()).hexdigest()[:16]
+    
+    def _scope_vuln_ids(self, conn: sqlite3.Connection):
+        """Rewrite findings stored before IDs were scoped to their scan target"""
+        conn.create_function('scoped_vuln_id', 2, self.scoped_vuln_id, deterministic=True)
+        for table in ('patches', 'remediation_history'):
+            conn.execute(f'''
+                UPDATE {table} SET vuln_id = (
+                    SELECT scoped_vuln_id(v.vuln_id, v.scan_target) FROM vulnerabilities v
+                    WHERE v.vuln_id = {table}.vuln_id
+                )
+                WHERE vuln_id IN (SELECT vuln_id FROM vulnerabilities WHERE scan_target IS NOT NULL)
+            ''')
+        conn.execute('''
+            UPDATE vulnerabilities SET vuln_id = scoped_vuln_id(vuln_id, scan_target)
+            WHERE scan_target IS NOT NULL
         ''')
-        
-        # Create indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vuln_severity ON vulnerabilities(severity)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vuln_status ON vulnerabilities(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vuln_component ON vulnerabilities(affected_component)')
-        
-        conn.commit()
-        conn.close()
+        conn.execute('DELETE FROM scan_staging')
+    
+    def _init_fts(self, conn: sqlite3.Connection) -> bool:
+        """Create the full-text index, building it from existing rows on first use"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vulnerabilities_fts'"
+        ).fetchone()
+        try:
+            for statement in self.CREATE_FTS:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5; text search falls back to LIKE scans
+            logger.warning(f"Full-text search unavailable: {e}")
+            return False
+        if not exists:
+            conn.execute("INSERT INTO vulnerabilities_fts(vulnerabilities_fts) VALUES ('rebuild')")
+        return True
+    
+    @staticmethod
+    def _vulnerability_row(vuln: Vulnerability) -> Tuple:
+        return (
+            vuln.vuln_id,
+            vuln.cve_id,
+            vuln.title,
+            vuln.description,
+            vuln.severity.value,
+            vuln.cvss_score,
+            vuln.affected_component,
+            vuln.affected_version,
+            vuln.fixed_version,
+            vuln.discovered_date.isoformat(),
+            vuln.status.value,
+            vuln.remediation,
+            json.dumps(vuln.references),
+            json.dumps(vuln.tags),
+            vuln.risk_score,
+            vuln.priority
+        )
     
     def add_vulnerability(self, vuln: Vulnerability) -> bool:
         """Add vulnerability to database"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
+        return self.add_vulnerabilities([vuln])
+    
+    def add_vulnerabilities(self, vulns: List[Vulnerability]) -> bool:
+        """Add many vulnerabilities in a single transaction"""
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO vulnerabilities 
-                (vuln_id, cve_id, title, description, severity, cvss_score,
-                 affected_component, affected_version, fixed_version,
-                 discovered_date, status, remediation, references, tags,
-                 risk_score, priority)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                vuln.vuln_id,
-                vuln.cve_id,
-                vuln.title,
-                vuln.description,
-                vuln.severity.value,
-                vuln.cvss_score,
-                vuln.affected_component,
-                vuln.affected_version,
-                vuln.fixed_version,
-                vuln.discovered_date.isoformat(),
-                vuln.status.value,
-                vuln.remediation,
-                json.dumps(vuln.references),
-                json.dumps(vuln.tags),
-                vuln.risk_score,
-                vuln.priority
-            ))
-            
-            conn.commit()
+            with self.connections.transaction() as conn:
+                conn.executemany(self.UPSERT_VULNERABILITY, (self._vulnerability_row(v) for v in vulns))
             return True
             
         except Exception as e:
             logger.error(f"Error adding vulnerability: {str(e)}")
             return False
-        finally:
-            conn.close()
+    
+    def ingest_scan(self, results: Dict[str, List[Vulnerability]],
+                    complete: Optional[List[str]] = None) -> ScanDelta:
+        """Merge scan results per target and report what changed
+        
+        Stored findings of a completely scanned target (all targets unless
+        `complete` is given) that the scan no longer reports are marked
+        resolved, and come back as new if they reappear. See finish_scan().
+        """
+        scan_id = self.begin_scan()
+        with self.connections.transaction():
+            for target, vulns in results.items():
+                self.stage_findings(scan_id, target, vulns)
+            return self.finish_scan(scan_id, list(results) if complete is None else complete)
+    
+    @staticmethod
+    def begin_scan() -> str:
+        """Token under which a scan's findings are staged"""
+        return uuid.uuid4().hex
+    
+    def stage_findings(self, scan_id: str, target: str, vulns: Iterable[Vulnerability]):
+        """Stage a batch of findings from a scan in progress"""
+        staged_at = time.time()
+        with self.connections.transaction() as conn:
+            conn.executemany(self.STAGE_RESULT, (
+                (scan_id, staged_at) + self._vulnerability_row(vuln) + (target,) for vuln in vulns
+            ))
+    
+    def finish_scan(self, scan_id: str, complete: List[str]) -> ScanDelta:
+        """Merge a scan's staged findings into the database
+        
+        Staged findings are compared with the stored rows by join in a
+        single transaction. New findings are inserted and changed ones
+        updated without touching their triage status; stored findings of the
+        `complete` targets that were not staged are marked resolved, and
+        get their triage status back if a later scan reports them again.
+        """
+        delta = ScanDelta()
+        with self.connections.transaction() as conn:
+            delta.new = {row[0] for row in conn.execute(self.SELECT_NEW, (scan_id,))}
+            delta.changed = {row[0] for row in conn.execute(self.SELECT_CHANGED, (scan_id,))}
+            for target in complete:
+                delta.resolved.update(row[0] for row in conn.execute(self.SELECT_RESOLVED, (target, scan_id)))
+            staged = conn.execute('SELECT COUNT(*) FROM scan_staging WHERE scan_id = ?', (scan_id,)).fetchone()[0]
+            delta.unchanged = staged - len(delta.new) - len(delta.changed)
+            
+            conn.execute(self.MERGE_RESULTS, (scan_id,))
+            conn.executemany(self.RESOLVE, ((vuln_id,) for vuln_id in delta.resolved))
+            conn.execute(self.DISCARD_SCAN, (scan_id,))
+        return delta
+    
+    def discard_scan(self, scan_id: str):
+        """Drop the staged findings of a failed scan"""
+        with self.connections.transaction() as conn:
+            conn.execute(self.DISCARD_SCAN, (scan_id,))
+    
+    def get_vulnerability(self, vuln_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single vulnerability by ID"""
+        row = self.connections.connection().execute(self.SELECT_VULNERABILITY, (vuln_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_vulnerabilities_by_cve(self, cve_id: str) -> List[Dict[str, Any]]:
+        """Get every finding of a CVE"""
+        return [dict(row) for row in self.connections.connection().execute(self.SELECT_BY_CVE, (cve_id,))]
     
     def get_vulnerabilities(self, status: Optional[VulnerabilityStatus] = None,
                           severity: Optional[Severity] = None,
                           component: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get vulnerabilities with optional filters"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        """Get vulnerabilities with optional filters
         
-        query = "SELECT * FROM vulnerabilities WHERE 1=1"
-        params = []
+        component matches words of the affected component, e.g. a package
+        or image name.
+        """
+        return self.search_vulnerabilities(status=status, severity=severity, component=component,
+                                           limit=None)[0]
+    
+    @staticmethod
+    def _fts_phrases(text: str, prefix: bool = False) -> str:
+        """FTS5 query matching all words of free text, with query syntax escaped"""
+        return ' '.join(
+            '"' + word.replace('"', '""') + '"' + ('*' if prefix else '') for word in text.split()
+        )
+    
+    def search_vulnerabilities(self, text: Optional[str] = None,
+                               status: Optional[VulnerabilityStatus] = None,
+                               severity: Optional[Severity] = None,
+                               component: Optional[str] = None,
+                               limit: Optional[int] = 100,
+                               after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Search vulnerabilities in priority order, one page at a time
+        
+        text matches all of its words in the title, description, component
+        or CVE. Pages are fetched by keyset rather than offset, so each one
+        costs the same however deep it is; pass the returned cursor as
+        `after` for the next page, which is None after the last page. A
+        limit of None returns every match in one page.
+        """
+        query = "SELECT v.* FROM vulnerabilities v"
+        conditions = []
+        params: List[Any] = []
+        
+        match = []
+        if text and text.split():
+            match.append(self._fts_phrases(text))
+        if component and component.split():
+            match.append(f"affected_component : ({self._fts_phrases(component, prefix=True)})")
+        if match and self.fts_enabled:
+            # CROSS JOIN keeps the full-text match as the outer loop; driven from
+            # the priority index, the match would be re-run for every row
+            query = "SELECT v.* FROM vulnerabilities_fts f CROSS JOIN vulnerabilities v ON v.rowid = f.rowid"
+            conditions.append("vulnerabilities_fts MATCH ?")
+            params.append(' AND '.join(match))
+        elif match:
+            for word in (text or '').split():
+                conditions.append("(v.title LIKE ? OR v.description LIKE ? OR v.affected_component LIKE ? "
+                                  "OR v.cve_id LIKE ?)")
+                params.extend([f"%{word}%"] * 4)
+            if component:
+                conditions.append("v.affected_component LIKE ?")
+                params.append(f"%{component}%")
         
         if status:
-            query += " AND status = ?"
+            conditions.append("v.status = ?")
             params.append(status.value)
         
         if severity:
-            query += " AND severity = ?"
+            conditions.append("v.severity = ?")
             params.append(severity.value)
         
-        if component:
-            query += " AND affected_component LIKE ?"
-            params.append(f"%{component}%")
-        
-        query += " ORDER BY priority DESC, risk_score DESC"
+        if after:
+            # A row value comparison lets the index seek straight to the cursor
+            priority, _, vuln_id = after.partition(':')
+            conditions.append("(v.priority, v.vuln_id) < (?, ?)")
+            params.extend([int(priority), vuln_id])
         
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY v.priority DESC, v.vuln_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
         
-        conn.close()
-        return results
+        rows = [dict(row) for row in self.connections.connection().execute(query, params)]
+        cursor = f"{rows[-1]['priority']}:{rows[-1]['vuln_id']}" if rows and len(rows) == limit else None
+        return rows, cursor
     
     def update_vulnerability_status(self, vuln_id: str, status: VulnerabilityStatus,
                                   notes: Optional[str] = None) -> bool:
         """Update vulnerability status"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                UPDATE vulnerabilities 
-                SET status = ?, last_updated = CURRENT_TIMESTAMP
-                WHERE vuln_id = ?
-            ''', (status.value, vuln_id))
-            
-            # Add to remediation history
-            if notes:
-                cursor.execute('''
-                    INSERT INTO remediation_history
-                    (remediation_id, vuln_id, action_type, action_date, notes)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    f"rem_{datetime.now().timestamp()}",
-                    vuln_id,
-                    f"status_change_to_{status.value}",
-                    datetime.now().isoformat(),
-                    notes
-                ))
-            
-            conn.commit()
+            with self.connections.transaction() as conn:
+                conn.execute(self.UPDATE_STATUS, (status.value, vuln_id))
+                
+                # Add to remediation history
+                if notes:
+                    conn.execute(self.INSERT_REMEDIATION, (
+                        f"rem_{datetime.now().timestamp()}",
+                        vuln_id,
+                        f"status_change_to_{status.value}",
+                        datetime.now().isoformat(),
+                        notes
+                    ))
             return True
             
         except Exception as e:
             logger.error(f"Error updating vulnerability status: {str(e)}")
             return False
-        finally:
-            conn.close()
+    
+    def close(self):
+        self.connections.close()
+
+
+class CacheEntryWriter:
+    """Compresses findings into a scan cache entry as they stream past"""
+    
+    def __init__(self):
+        self._compressor = zlib.compressobj()
+        self._chunks: List[bytes] = []
+    
+    def add(self, vuln: Vulnerability):
+        row = asdict(vuln)
+        row['severity'] = vuln.severity.value
+        row['status'] = vuln.status.value
+        row['discovered_date'] = vuln.discovered_date.isoformat()
+        line = json.dumps(row, separators=(',', ':')).encode() + b'\n'
+        self._chunks.append(self._compressor.compress(line))
+    
+    def finish(self) -> bytes:
+        self._chunks.append(self._compressor.flush())
+        return b''.join(self._chunks)
+
+
+class ScanCache:
+    """On-disk LRU cache of scan results
+    
+    Results are keyed by what determines them: the image digest or
+    filesystem tree hash, the scanner, and the scanner's vulnerability DB
+    version. Entries hold compressed JSON lines, so they are written and
+    read incrementally, and are evicted least recently used first once
+    their total size exceeds max_bytes.
+    """
+    
+    SELECT = 'SELECT result FROM scan_cache WHERE cache_key = ?'
+    TOUCH = 'UPDATE scan_cache SET last_used = ? WHERE cache_key = ?'
+    STORE = '''
+        INSERT OR REPLACE INTO scan_cache (cache_key, target, result, size, last_used)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    # Keep the most recently used entries whose running total fits the budget
+    EVICT = '''
+        DELETE FROM scan_cache WHERE cache_key IN (
+            SELECT cache_key FROM (
+                SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC) AS running
+                FROM scan_cache
+            ) WHERE running > ?
+        )
+    '''
+    
+    def __init__(self, db_path: str = "/var/lib/security/scan-cache.db",
+                 max_bytes: int = 256 * 1024 * 1024,
+                 metrics_file: Optional[Path] = Path("/var/lib/prometheus/node_exporter/vulnerability_scan_cache.prom")):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.metrics_file = metrics_file
+        self.connections = ConnectionManager(self.db_path)
+        self.stats = {'hits': 0, 'misses': 0, 'uncacheable': 0, 'evictions': 0}
+        
+        with self.connections.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scan_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    target TEXT NOT NULL,
+                    result BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_scan_cache_last_used ON scan_cache(last_used)')
+    
+    @staticmethod
+    def key(content_id: str, scanner: str, db_version: str) -> str:
+        return f"{scanner}:{db_version}:{content_id}"
+    
+    @staticmethod
+    def writer() -> 'CacheEntryWriter':
+        return CacheEntryWriter()
+    
+    @staticmethod
+    def decode(blob: bytes) -> Iterator[Vulnerability]:
+        """Findings of a cache entry, decompressed one line at a time"""
+        decompressor = zlib.decompressobj()
+        pending = b''
+        for offset in range(0, len(blob), 65536):
+            lines = (pending + decompressor.decompress(blob[offset:offset + 65536])).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                row = json.loads(line)
+                yield Vulnerability(**dict(row, severity=Severity(row['severity']),
+                                           status=VulnerabilityStatus(row['status']),
+                                           discovered_date=datetime.fromisoformat(row['discovered_date'])))
+    
+    def get(self, cache_key: str) -> Optional[bytes]:
+        """Cached entry for a key, or None on a miss"""
+        conn = self.connections.connection()
+        row = conn.execute(self.SELECT, (cache_key,)).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        conn.execute(self.TOUCH, (time.time(), cache_key))
+        self.stats['hits'] += 1
+        return row['result']
+    
+    def put(self, cache_key: str, target: str, blob: bytes):
+        """Store an entry and evict least recently used entries over the size budget"""
+        with self.connections.transaction() as conn:
+            conn.execute(self.STORE, (cache_key, target, blob, len(blob), time.time()))
+            self.stats['evictions'] += conn.execute(self.EVICT, (self.max_bytes,)).rowcount
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters and current cache size"""
+        row = self.connections.connection().execute(
+            'SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM scan_cache'
+        ).fetchone()
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_ratio': self.stats['hits'] / lookups if lookups else 0.0,
+            'entries': row['entries'],
+            'bytes': row['bytes']
+        }
+    
+    def write_metrics(self):
+        """Export cache metrics through the node_exporter textfile collector"""
+        if self.metrics_file is None or not self.metrics_file.parent.is_dir():
+            return
+        metrics = self.get_metrics()
+        lines = []
+        for name, kind, value in [
+            ('hits_total', 'counter', metrics['hits']),
+            ('misses_total', 'counter', metrics['misses']),
+            ('uncacheable_total', 'counter', metrics['uncacheable']),
+            ('evictions_total', 'counter', metrics['evictions']),
+            ('hit_ratio', 'gauge', metrics['hit_ratio']),
+            ('entries', 'gauge', metrics['entries']),
+            ('bytes', 'gauge', metrics['bytes'])
+        ]:
+            lines.append(f"# TYPE vulnerability_scan_cache_{name} {kind}")
+            lines.append(f"vulnerability_scan_cache_{name} {value}")
+        
+        # Write and rename so node_exporter never reads a partial file
+        tmp = self.metrics_file.with_suffix('.prom.tmp')
+        tmp.write_text('\n'.join(lines) + '\n')
+        tmp.replace(self.metrics_file)
+    
+    def close(self):
+        self.connections.close()
 
 
 class VulnerabilityScanner:
     """Scans for vulnerabilities using various tools"""
     
-    def __init__(self, db: VulnerabilityDatabase):
+    # Scanner DB versions are looked up at most this often
+    DB_VERSION_TTL = 300
+    # Trivy report as one JSON object per finding (Go template with Sprig functions)
+    TRIVY_TEMPLATE = (
+        '{{- range . }}{{- $target := .Target }}{{- range .Vulnerabilities }}'
+        '{{ dict "Target" $target "Vulnerability" . | toJson }}\n{{ end }}{{- end }}'
+    )
+    # Longest single finding line accepted from the scanner
+    TRIVY_LINE_LIMIT = 1024 * 1024
+    
+    def __init__(self, db: VulnerabilityDatabase, cache: Optional[ScanCache] = None):
         self.db = db
+        self.cache = cache
+        # Targets whose last scan failed; their results are incomplete
+        self.failed_targets: Set[str] = set()
+        self._db_versions: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._db_version_lock = asyncio.Lock()
         self.scanners = {
             'trivy': self._scan_with_trivy,
             'grype': self._scan_with_grype,
@@ -295,76 +867,253 @@ class VulnerabilityScanner:
     
     async def scan_image(self, image: str, scanner: str = 'trivy') -> List[Vulnerability]:
         """Scan container image for vulnerabilities"""
+        return [vuln async for vuln in self.stream_image(image, scanner)]
+    
+    async def scan_filesystem(self, path: str) -> List[Vulnerability]:
+        """Scan filesystem for vulnerabilities"""
+        return [vuln async for vuln in self.stream_filesystem(path)]
+    
+    def stream_image(self, image: str, scanner: str = 'trivy') -> AsyncIterator[Vulnerability]:
+        """Scan container image, yielding findings as the scanner reports them"""
         if scanner not in self.scanners:
             raise ValueError(f"Unknown scanner: {scanner}")
         
-        return await self.scanners[scanner](image)
+        return self._cached_stream(image, scanner, lambda: self._image_digest(image),
+                                   lambda: self._stream_scanner(scanner, image))
     
-    async def scan_filesystem(self, path: str) -> List[Vulnerability]:
-        """Scan filesystem for vulnerabilities"""
-        return await self._scan_with_trivy(f"fs:{path}")
+    def stream_filesystem(self, path: str) -> AsyncIterator[Vulnerability]:
+        """Scan filesystem, yielding findings as the scanner reports them"""
+        return self._cached_stream(path, 'trivy', lambda: asyncio.to_thread(self._tree_hash, path),
+                                   lambda: self._stream_trivy(f"fs:{path}"))
+    
+    async def _stream_scanner(self, scanner: str, target: str) -> AsyncIterator[Vulnerability]:
+        if scanner == 'trivy':
+            async for vuln in self._stream_trivy(target):
+                yield vuln
+        else:
+            for vuln in await self.scanners[scanner](target):
+                yield vuln
+    
+    async def _cached_stream(self, target: str, scanner: str, content_id,
+                             stream) -> AsyncIterator[Vulnerability]:
+        """Serve a scan from the cache when the target and scanner DB are unchanged
+        
+        content_id and stream are called only when needed; a fresh scan is
+        written to the cache as it streams past. Cached findings carry the
+        scanner's IDs, which are scoped to the target as they are yielded.
+        """
+        if self.cache is None:
+            async for vuln in stream():
+                yield self._scoped(vuln, target)
+            return
+        
+        content_id = await content_id()
+        db_version = await self._scanner_db_version(scanner)
+        if content_id is None or db_version is None:
+            self.cache.stats['uncacheable'] += 1
+            async for vuln in stream():
+                yield self._scoped(vuln, target)
+            return
+        
+        cache_key = ScanCache.key(content_id, scanner, db_version)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Scan of {target} served from cache")
+            self.failed_targets.discard(target)
+            for vuln in ScanCache.decode(cached):
+                yield self._scoped(vuln, target)
+            return
+        
+        writer = self.cache.writer()
+        async for vuln in stream():
+            writer.add(vuln)
+            yield self._scoped(vuln, target)
+        if target not in self.failed_targets:
+            await asyncio.to_thread(self.cache.put, cache_key, target, writer.finish())
+    
+    @staticmethod
+    def _scoped(vuln: Vulnerability, target: str) -> Vulnerability:
+        vuln.vuln_id = VulnerabilityDatabase.scoped_vuln_id(vuln.vuln_id, target)
+        return vuln
+    
+    async def _image_digest(self, image: str) -> Optional[str]:
+        """Content-addressed ID of a local image, or None if it is not available"""
+        try:
+            # Installed copies of this tool may lack the Docker client module
+            from docker_api_client import DockerAPIError, get_shared_client
+        except ImportError:
+            logger.debug("docker_api_client not available, image scans are not cached")
+            return None
+        
+        try:
+            return (await get_shared_client().inspect_image(image)).get('Id')
+        except (DockerAPIError, OSError) as e:
+            logger.debug(f"No digest for {image}: {e}")
+            return None
+    
+    @staticmethod
+    def _tree_hash(path: str) -> Optional[str]:
+        """Hash of a directory tree's file names, sizes and modification times
+        
+        Metadata is enough to notice package changes and far cheaper than
+        hashing contents.
+        """
+        if not os.path.exists(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                try:
+                    st = os.lstat(full)
+                except OSError:
+                    continue
+                digest.update(f"{full}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        return f"tree:{digest.hexdigest()}"
+    
+    async def _scanner_db_version(self, scanner: str) -> Optional[str]:
+        """Version of a scanner's vulnerability DB, None if it cannot be determined
+        
+        Only a scan refreshes Trivy's DB, and cache hits skip the scan, so a
+        DB past its NextUpdate is refreshed here first. A DB that is still
+        stale gives no version, so targets are rescanned rather than served
+        from results that predate new advisories.
+        """
+        async with self._db_version_lock:
+            now = time.monotonic()
+            cached = self._db_versions.get(scanner)
+            if cached and cached[0] > now:
+                return cached[1]
+            
+            version = None
+            if scanner == 'trivy':
+                db = await self._trivy_db_metadata()
+                if db is not None and self._trivy_db_stale(db):
+                    logger.info("Trivy vulnerability DB is due for an update, downloading")
+                    await self._run_quiet('trivy', 'image', '--download-db-only')
+                    db = await self._trivy_db_metadata()
+                if db is not None and db.get('UpdatedAt') and not self._trivy_db_stale(db):
+                    version = f"{db.get('Version')}@{db['UpdatedAt']}"
+            
+            self._db_versions[scanner] = (now + self.DB_VERSION_TTL, version)
+            return version
+    
+    @staticmethod
+    async def _run_quiet(*cmd: str) -> Optional[bytes]:
+        """Stdout of a command, None if it could not run or failed"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await process.communicate()
+        except OSError as e:
+            logger.debug(f"Could not run {cmd[0]}: {e}")
+            return None
+        return stdout if process.returncode == 0 else None
+    
+    async def _trivy_db_metadata(self) -> Optional[Dict[str, Any]]:
+        stdout = await self._run_quiet('trivy', 'version', '--format', 'json')
+        try:
+            return json.loads(stdout).get('VulnerabilityDB') if stdout else None
+        except ValueError as e:
+            logger.debug(f"Could not determine Trivy DB version: {e}")
+            return None
+    
+    @staticmethod
+    def _trivy_db_stale(db: Dict[str, Any]) -> bool:
+        """Whether the DB is past its NextUpdate (or has none)"""
+        # RFC 3339 with up to nanosecond precision; keep microseconds for fromisoformat
+        match = re.match(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d{1,6})?\d*(Z|[+-]\d\d:\d\d)$',
+                         db.get('NextUpdate') or '')
+        if not match:
+            return True
+        seconds, fraction, zone = match.groups()
+        next_update = datetime.fromisoformat(seconds + (fraction or '') + zone.replace('Z', '+00:00'))
+        return next_update <= datetime.now(timezone.utc)
     
     async def _scan_with_trivy(self, target: str) -> List[Vulnerability]:
         """Scan using Trivy"""
-        vulnerabilities = []
+        return [vuln async for vuln in self._stream_trivy(target)]
+    
+    async def _stream_trivy(self, target: str) -> AsyncIterator[Vulnerability]:
+        """Scan using Trivy, yielding findings while its report is still being read
+        
+        Trivy writes one JSON object per finding through TRIVY_TEMPLATE, so
+        memory stays flat however large the report is.
+        """
+        source = target[3:] if target.startswith("fs:") else target
+        self.failed_targets.add(source)
+        process = None
+        stderr = None
         
         try:
             # Determine scan type
             if target.startswith("fs:"):
-                cmd = ['trivy', 'fs', '--format', 'json', target[3:]]
+                cmd = ['trivy', 'fs', '--format', 'template', '--template', self.TRIVY_TEMPLATE, target[3:]]
             else:
-                cmd = ['trivy', 'image', '--format', 'json', target]
+                cmd = ['trivy', 'image', '--format', 'template', '--template', self.TRIVY_TEMPLATE, target]
             
             process = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                limit=self.TRIVY_LINE_LIMIT
             )
+            # Drain stderr alongside stdout so neither pipe fills up and stalls Trivy
+            stderr = asyncio.ensure_future(process.stderr.read())
             
-            stdout, stderr = await process.communicate()
+            async for line in process.stdout:
+                if line.strip():
+                    yield self._trivy_vulnerability(json.loads(line))
             
+            await process.wait()
             if process.returncode not in [0, 1]:
-                logger.error(f"Trivy scan failed: {stderr.decode()}")
-                return vulnerabilities
-            
-            # Parse results
-            data = json.loads(stdout.decode())
-            
-            for result in data.get('Results', []):
-                target_name = result.get('Target', 'unknown')
-                
-                for vuln in result.get('Vulnerabilities', []):
-                    vuln_id = self._generate_vuln_id(
-                        vuln.get('VulnerabilityID'),
-                        vuln.get('PkgName'),
-                        target_name
-                    )
-                    
-                    vulnerability = Vulnerability(
-                        vuln_id=vuln_id,
-                        cve_id=vuln.get('VulnerabilityID'),
-                        title=vuln.get('Title', vuln.get('VulnerabilityID')),
-                        description=vuln.get('Description', ''),
-                        severity=self._map_severity(vuln.get('Severity', 'UNKNOWN')),
-                        cvss_score=self._extract_cvss_score(vuln),
-                        affected_component=f"{target_name}:{vuln.get('PkgName')}",
-                        affected_version=vuln.get('InstalledVersion', ''),
-                        fixed_version=vuln.get('FixedVersion'),
-                        discovered_date=datetime.now(),
-                        status=VulnerabilityStatus.NEW,
-                        remediation=self._generate_remediation(vuln),
-                        references=vuln.get('References', [])
-                    )
-                    
-                    # Calculate risk score
-                    vulnerability.risk_score = self._calculate_risk_score(vulnerability)
-                    
-                    vulnerabilities.append(vulnerability)
+                logger.error(f"Trivy scan failed: {(await stderr).decode()}")
+            else:
+                self.failed_targets.discard(source)
             
         except Exception as e:
             logger.error(f"Error in Trivy scan: {str(e)}")
         
-        return vulnerabilities
+        finally:
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+            if stderr is not None and not stderr.done():
+                stderr.cancel()
+    
+    def _trivy_vulnerability(self, record: Dict[str, Any]) -> Vulnerability:
+        """Build a finding from one line of TRIVY_TEMPLATE output"""
+        target_name = record.get('Target') or 'unknown'
+        vuln = record['Vulnerability']
+        vuln_id = self._generate_vuln_id(
+            vuln.get('VulnerabilityID'),
+            vuln.get('PkgName'),
+            target_name
+        )
+        
+        vulnerability = Vulnerability(
+            vuln_id=vuln_id,
+            cve_id=vuln.get('VulnerabilityID'),
+            title=vuln.get('Title', vuln.get('VulnerabilityID')),
+            description=vuln.get('Description', ''),
+            severity=self._map_severity(vuln.get('Severity', 'UNKNOWN')),
+            cvss_score=self._extract_cvss_score(vuln),
+            affected_component=f"{target_name}:{vuln.get('PkgName')}",
+            affected_version=vuln.get('InstalledVersion', ''),
+            fixed_version=vuln.get('FixedVersion'),
+            discovered_date=datetime.now(),
+            status=VulnerabilityStatus.NEW,
+            remediation=self._generate_remediation(vuln),
+            references=vuln.get('References', [])
+        )
+        
+        # Calculate risk score
+        vulnerability.risk_score = self._calculate_risk_score(vulnerability)
+        return vulnerability
     
     async def _scan_with_grype(self, target: str) -> List[Vulnerability]:
         """Scan using Grype (placeholder)"""
@@ -524,8 +1273,7 @@ class RemediationEngine:
     async def generate_remediation_plan(self, vuln_id: str) -> Optional[VulnerabilityPatch]:
         """Generate remediation plan for vulnerability"""
         # Get vulnerability details
-        vulns = self.db.get_vulnerabilities()
-        vuln_data = next((v for v in vulns if v['vuln_id'] == vuln_id), None)
+        vuln_data = self.db.get_vulnerability(vuln_id)
         
         if not vuln_data:
             return None
@@ -673,14 +1421,170 @@ class RemediationEngine:
                 logger.error(f"Rollback error: {str(e)}")
 
 
+class ScanScheduler:
+    """Runs scanner subprocesses concurrently within a CPU and memory budget
+    
+    Findings are staged in batches while the scanner streams them, and each
+    target is merged into the database as soon as its scan completes. Failed
+    scans are retried with exponential back-off; a target waiting to
+    retry gives up its worker slot so the rest of the fleet keeps moving.
+    """
+    
+    # Rough peak resident size of a single Trivy image scan
+    SCAN_MEMORY_MB = 512
+    
+    def __init__(self, scanner: VulnerabilityScanner, prioritizer: 'VulnerabilityPrioritizer',
+                 db: VulnerabilityDatabase, max_workers: Optional[int] = None,
+                 memory_budget_mb: Optional[int] = None, retries: int = 2,
+                 backoff: float = 30.0, batch_size: int = 1000, progress_callback=None):
+        self.scanner = scanner
+        self.prioritizer = prioritizer
+        self.db = db
+        self.workers = self._worker_count(max_workers, memory_budget_mb)
+        self.retries = retries
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.progress_callback = progress_callback
+        self._ingest_lock = asyncio.Lock()
+    
+    def _worker_count(self, max_workers: Optional[int], memory_budget_mb: Optional[int]) -> int:
+        """Concurrent scans allowed by the CPU count and memory budget"""
+        workers = max_workers or os.cpu_count() or 1
+        if memory_budget_mb is None:
+            memory_budget_mb = self._available_memory_mb()
+        if memory_budget_mb:
+            workers = min(workers, memory_budget_mb // self.SCAN_MEMORY_MB)
+        return max(1, workers)
+    
+    @staticmethod
+    def _available_memory_mb() -> Optional[int]:
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) // 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+    
+    def _stream(self, target: str) -> AsyncIterator[Vulnerability]:
+        if target.startswith('/'):
+            return self.scanner.stream_filesystem(target)
+        return self.scanner.stream_image(target)
+    
+    def _report(self, progress: ScanProgress, target: str, status: str):
+        logger.info(f"[{progress.completed + progress.failed}/{progress.total}] {target}: {status} "
+                    f"({progress.running} running, {progress.pending} pending)")
+        if self.progress_callback:
+            self.progress_callback(progress, target, status)
+    
+    async def _stage(self, scan_id: str, target: str, severities: Counter) -> int:
+        """Stream a target's findings into the staging table in batches"""
+        staged = 0
+        batch: List[Vulnerability] = []
+        async for vuln in self._stream(target):
+            batch.append(vuln)
+            if len(batch) < self.batch_size:
+                continue
+            staged += await self._stage_batch(scan_id, target, batch, severities)
+            batch = []
+        if batch:
+            staged += await self._stage_batch(scan_id, target, batch, severities)
+        return staged
+    
+    async def _stage_batch(self, scan_id: str, target: str, batch: List[Vulnerability],
+                           severities: Counter) -> int:
+        await self.prioritizer.prioritize_vulnerabilities(batch)
+        severities.update(vuln.severity.value for vuln in batch)
+        await asyncio.to_thread(self.db.stage_findings, scan_id, target, batch)
+        return len(batch)
+    
+    async def _run_target(self, target: str, semaphore: asyncio.Semaphore,
+                          progress: ScanProgress, delta: ScanDelta) -> Counter:
+        for attempt in range(self.retries + 1):
+            scan_id = self.db.begin_scan()
+            severities: Counter = Counter()
+            error = None
+            async with semaphore:
+                progress.running += 1
+                try:
+                    findings = await self._stage(scan_id, target, severities)
+                    if target in self.scanner.failed_targets:
+                        error = 'scanner failed'
+                    else:
+                        async with self._ingest_lock:
+                            target_delta = await asyncio.to_thread(self.db.finish_scan, scan_id, [target])
+                except Exception as e:
+                    # Prioritizing or staging may fail too; only this target's attempt is lost
+                    error = str(e)
+                finally:
+                    progress.running -= 1
+            
+            if error is None:
+                break
+            try:
+                await asyncio.to_thread(self.db.discard_scan, scan_id)
+            except Exception as e:
+                logger.error(f"Could not discard staged findings of {target}: {str(e)}")
+            if attempt == self.retries:
+                progress.failed += 1
+                self._report(progress, target, f"failed after {attempt + 1} attempts: {error}")
+                return Counter()
+            
+            delay = self.backoff * 2 ** attempt
+            progress.retries += 1
+            logger.warning(f"Scan of {target} failed ({error}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+        
+        delta.new |= target_delta.new
+        delta.changed |= target_delta.changed
+        delta.resolved |= target_delta.resolved
+        delta.unchanged += target_delta.unchanged
+        
+        progress.completed += 1
+        progress.findings += findings
+        self._report(progress, target, f"{findings} findings, {len(target_delta.new)} new")
+        return severities
+    
+    async def run(self, targets: List[str]) -> Tuple[Dict[str, Counter], ScanDelta, ScanProgress]:
+        """Scan all targets and merge each into the database as it completes
+        
+        Findings are not kept in memory; each target's result is its count
+        of findings by severity.
+        """
+        targets = list(dict.fromkeys(targets))
+        progress = ScanProgress(total=len(targets))
+        delta = ScanDelta()
+        semaphore = asyncio.Semaphore(self.workers)
+        logger.info(f"Scanning {len(targets)} targets with {self.workers} workers")
+        
+        scans = await asyncio.gather(
+            *(self._run_target(target, semaphore, progress, delta) for target in targets),
+            return_exceptions=True
+        )
+        results = {}
+        for target, scan in zip(targets, scans):
+            if isinstance(scan, Exception):
+                # _run_target handles scan errors itself; this is a backstop
+                logger.error(f"Scan of {target} aborted: {str(scan)}")
+                progress.failed += 1
+                scan = Counter()
+            results[target] = scan
+        return results, delta, progress
+
+
 class VulnerabilityManagementSystem:
     """Main vulnerability management system"""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None, memory_budget_mb: Optional[int] = None,
+                 retries: int = 2, scan_cache: bool = True):
         self.db = VulnerabilityDatabase()
-        self.scanner = VulnerabilityScanner(self.db)
+        self.scanner = VulnerabilityScanner(self.db, ScanCache() if scan_cache else None)
         self.prioritizer = VulnerabilityPrioritizer(self.db)
         self.remediation = RemediationEngine(self.db)
+        self.scheduler = ScanScheduler(self.scanner, self.prioritizer, self.db,
+                                       max_workers=max_workers, memory_budget_mb=memory_budget_mb,
+                                       retries=retries)
         self.scan_interval = 3600  # 1 hour
     
     async def scan_environment(self, targets: List[str]) -> Dict[str, Any]:
@@ -688,35 +1592,9 @@ class VulnerabilityManagementSystem:
         scan_id = f"scan_{datetime.now().timestamp()}"
         start_time = datetime.now()
         
-        all_vulnerabilities = []
-        new_vulnerabilities = []
-        
-        for target in targets:
-            logger.info(f"Scanning {target}")
-            
-            # Determine target type and scan
-            if target.startswith('/'):
-                # Filesystem scan
-                vulns = await self.scanner.scan_filesystem(target)
-            else:
-                # Container image scan
-                vulns = await self.scanner.scan_image(target)
-            
-            # Check for new vulnerabilities
-            for vuln in vulns:
-                existing = self.db.get_vulnerabilities()
-                if not any(v['vuln_id'] == vuln.vuln_id for v in existing):
-                    new_vulnerabilities.append(vuln)
-                    self.db.add_vulnerability(vuln)
-                
-                all_vulnerabilities.append(vuln)
-        
-        # Prioritize vulnerabilities
-        prioritized = await self.prioritizer.prioritize_vulnerabilities(all_vulnerabilities)
-        
-        # Update priorities in database
-        for vuln in prioritized:
-            self.db.add_vulnerability(vuln)  # This will update existing entries
+        # Scan in parallel; each target is merged into the database as it completes
+        results, delta, progress = await self.scheduler.run(targets)
+        severities = sum(results.values(), Counter())
         
         # Record scan history
         duration = (datetime.now() - start_time).seconds
@@ -724,14 +1602,22 @@ class VulnerabilityManagementSystem:
         scan_summary = {
             'scan_id': scan_id,
             'scan_date': start_time.isoformat(),
-            'targets_scanned': len(targets),
-            'total_vulnerabilities': len(all_vulnerabilities),
-            'new_vulnerabilities': len(new_vulnerabilities),
-            'critical_count': sum(1 for v in all_vulnerabilities if v.severity == Severity.CRITICAL),
-            'high_count': sum(1 for v in all_vulnerabilities if v.severity == Severity.HIGH),
+            'targets_scanned': progress.completed,
+            'targets_failed': progress.failed,
+            'scan_retries': progress.retries,
+            'total_vulnerabilities': progress.findings,
+            'new_vulnerabilities': len(delta.new),
+            'changed_vulnerabilities': len(delta.changed),
+            'resolved_vulnerabilities': len(delta.resolved),
+            'critical_count': severities[Severity.CRITICAL.value],
+            'high_count': severities[Severity.HIGH.value],
             'scan_duration': duration
         }
         
+        if self.scanner.cache:
+            scan_summary['cache'] = self.scanner.cache.get_metrics()
+            self.scanner.cache.write_metrics()
+        
         return scan_summary
     
     async def generate_report(self, format: str = 'json') -> str:
@@ -865,7 +1751,7 @@ async def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Vulnerability Management System')
-    parser.add_argument('command', choices=['scan', 'report', 'remediate', 'monitor'],
+    parser.add_argument('command', choices=['scan', 'report', 'remediate', 'monitor', 'search'],
                        help='Command to execute')
     parser.add_argument('--targets', nargs='+', help='Targets to scan')
     parser.add_argument('--format', choices=['json', 'markdown'], default='json',
@@ -874,10 +1760,26 @@ async def main():
                        help='Maximum risk score for auto-remediation')
     parser.add_argument('--dry-run', action='store_true',
                        help='Dry run mode for remediation')
+    parser.add_argument('--max-workers', type=int,
+                       help='Maximum concurrent scans (default: CPU count)')
+    parser.add_argument('--memory-budget', type=int,
+                       help='Memory budget for concurrent scans in MiB (default: available memory)')
+    parser.add_argument('--retries', type=int, default=2,
+                       help='Retries for failed target scans')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Rescan targets even if unchanged since the last scan')
+    parser.add_argument('--query', help='Words to search for in title, description, component or CVE')
+    parser.add_argument('--status', choices=[s.value for s in VulnerabilityStatus],
+                       help='Only vulnerabilities with this status')
+    parser.add_argument('--severity', choices=[s.value for s in Severity],
+                       help='Only vulnerabilities with this severity')
+    parser.add_argument('--limit', type=int, default=50, help='Search results per page')
+    parser.add_argument('--after', help='Cursor of the previous search page')
     
     args = parser.parse_args()
     
-    vms = VulnerabilityManagementSystem()
+    vms = VulnerabilityManagementSystem(args.max_workers, args.memory_budget, args.retries,
+                                        scan_cache=not args.no_cache)
     
     if args.command == 'scan':
         if not args.targets:
@@ -895,6 +1797,16 @@ async def main():
         result = await vms.auto_remediate(args.max_risk, args.dry_run)
         print(json.dumps(result, indent=2))
     
+    elif args.command == 'search':
+        results, cursor = vms.db.search_vulnerabilities(
+            text=args.query,
+            status=VulnerabilityStatus(args.status) if args.status else None,
+            severity=Severity(args.severity) if args.severity else None,
+            limit=args.limit,
+            after=args.after
+        )
+        print(json.dumps({'results': results, 'next_cursor': cursor}, indent=2))
+    
     elif args.command == 'monitor':
         if not args.targets:
             # Default targets
@@ -99,6 +99,7 @@ main() {
     # Vulnerability management
     cp "$SCRIPT_DIR/../security/vulnerability-management-system.py" security/scripts/vuln-check
     chmod +x security/scripts/vuln-check
+    cp "$SCRIPT_DIR/../security/docker_api_client.py" security/scripts/
     echo -e "${GREEN}✓ Installed vuln-check${NC}"
     
     # Compliance
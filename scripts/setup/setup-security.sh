@@ -101,6 +101,11 @@ install_scripts() {
             echo -e "${GREEN}✓ Installed $dst${NC}"
         fi
     done
+    
+    # Modules imported by the Python tools, installed beside them
+    if [[ -f "scripts/security/docker_api_client.py" ]]; then
+        cp scripts/security/docker_api_client.py "$INSTALL_DIR/scripts/"
+    fi
 }
 
 # Install configurations